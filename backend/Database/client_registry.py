@@ -0,0 +1,48 @@
+import threading
+from pymongo import MongoClient
+
+DEFAULT_URI = "mongodb://localhost:27017/"
+
+# Applied to every client the registry creates; tune with configure() before the first get_client()
+DEFAULT_OPTIONS = {
+    'maxPoolSize': 20,
+    'minPoolSize': 0,
+    'maxIdleTimeMS': 60000,
+    'serverSelectionTimeoutMS': 5000,
+    'connectTimeoutMS': 5000,
+    'socketTimeoutMS': 30000,
+    'readPreference': 'primaryPreferred',
+    'appname': 'ecm-backend',
+}
+
+_options = dict(DEFAULT_OPTIONS)
+_clients = {}  # uri -> MongoClient
+_lock = threading.Lock()
+
+
+def configure(**options):
+    """Override client options (pool sizes, timeouts, read preference) for clients created afterwards"""
+    with _lock:
+        if _clients:
+            print(f"Warning: MongoDB clients already exist for {list(_clients)}, new options only apply to new URIs")
+        _options.update(options)
+
+
+def get_client(uri=None):
+    """Return the process-wide MongoClient for uri, creating it on first use"""
+    uri = uri or DEFAULT_URI
+    with _lock:
+        client = _clients.get(uri)
+        if client is None:
+            client = MongoClient(uri, **_options)
+            _clients[uri] = client
+            print(f"Created shared MongoDB client for {uri}")
+        return client
+
+
+def close_all():
+    """Close every shared client; call once on process shutdown"""
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
@@ -1,19 +1,12 @@
-from pymongo import MongoClient
-from datetime import datetime
+# Convert string timestamps in readings to datetime. The work is migration 0001, run through the
+# resumable migration runner (Database/migrations); prefer python -m Database.migrations.runner.
+from Database import client_registry
+from Database.migrations.runner import MigrationRunner
+from Database.migrations.m0001_timestamp_strings import TimestampStrings
 
-client = MongoClient('mongodb://localhost:27017/')
-db = client['sensor_data']
-collection = db['readings']
-
-for doc in collection.find():
-    timestamp_str = doc['timestamp']
-    if isinstance(timestamp_str, str):
-        try:
-            # 根据存储的格式解析时间字符串
-            timestamp_dt = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S')
-            collection.update_one(
-                {'_id': doc['_id']},
-                {'$set': {'timestamp': timestamp_dt}}
-            )
-        except ValueError as e:
-            print(f"Error parsing timestamp for document {doc['_id']}: {e}")
+if __name__ == "__main__":
+    try:
+        db = client_registry.get_client('mongodb://localhost:27017/')['sensor_data']
+        MigrationRunner(db, migrations=[TimestampStrings()]).run()
+    finally:
+        client_registry.close_all()
@@ -1,74 +1,459 @@
 import datetime
+import threading
+import time
+from contextlib import contextmanager
 import pymongo
-from pymongo import MongoClient
+from pymongo import InsertOne, UpdateOne, ReplaceOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from bson.objectid import ObjectId
 from datetime import datetime, timezone
 from bson.codec_options import CodecOptions
 from Database.led_status import LEDStatus
-from server.energy_calculator import EnergyCalculator
+from server.energy_calculator import EnergyCalculator, period_start
+from Database.schema import SchemaManager, TIMESERIES_REWRITE_VERSION
+from Database.client_registry import get_client
+from Database.spool import WriteSpool
+from Database.storage import Storage, LED_STATS_ID, ENERGY_STATS_ID, NUMERIC_READING_FIELDS, ENERGY_GRANULARITIES
 
-class Database:
-    def __init__(self, uri, db_name, collection_name):
-        self.client = MongoClient(uri)
+# Write ids remembered per document by applied_once(); more than one bulk_write batch, so a retried batch is covered
+APPLIED_MARKERS = 1000
+
+
+def applied_once(filter, update):
+    """Upserting UpdateOne that takes effect at most once, however often it is retried.
+
+    The update pushes its own write id into the document's _applied list and only matches documents
+    without it; a retry after the write was applied falls through to the upsert and fails with a
+    duplicate key, which replay treats as success. The filter must address a unique key.
+    """
+    write_id = ObjectId()
+    update = dict(update)
+    update['$push'] = dict(update.get('$push', {}), _applied={'$each': [write_id], '$slice': -APPLIED_MARKERS})
+    return UpdateOne(dict(filter, _applied={'$ne': write_id}), update, upsert=True)
+
+
+class WriteBehindBuffer:
+    """Collects pending writes per collection and flushes them with unordered bulk_write"""
+
+    def __init__(self, db, max_batch=500, max_age=2.0, max_pending=10000, block_timeout=0.5,
+                 spool=None, latency_budget=5.0, replay_interval=5.0):
+        self.db = db
+        self.max_batch = max_batch
+        self.max_age = max_age
+        self.max_pending = max_pending
+        self.block_timeout = block_timeout
+        # Optional WriteSpool: takes batches MongoDB fails or cannot finish within latency_budget seconds,
+        # and writes that would otherwise be dropped; replayed every replay_interval seconds
+        self.spool = spool
+        self.latency_budget = latency_budget
+        self.replay_interval = replay_interval
+        self._degraded = bool(spool is not None and len(spool))
+        self._next_replay = 0.0
+        self._pending = {}  # collection name -> list of pymongo write operations
+        self._first_pending_at = {}  # collection name -> monotonic time of its oldest pending write
+        self._in_flight = 0  # queued plus currently being written, bounded by max_pending
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()  # held while batches are written or replayed, see paused()
+        self._closed = False
+        self.stats = {'submitted': 0, 'written': 0, 'dropped': 0, 'errors': 0, 'flushes': 0, 'last_flush_ms': 0.0,
+                      'spooled': 0, 'replayed': 0}
+        self._thread = threading.Thread(target=self._run, name='db-write-behind', daemon=True)
+        self._thread.start()
+
+    def submit(self, collection_name, operation):
+        """Queue one write; blocks at most block_timeout when the buffer is full, then spools or drops it"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write-behind buffer is closed")
+            deadline = time.monotonic() + self.block_timeout
+            while self._in_flight >= self.max_pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            else:
+                self._assign_id(operation)
+                ops = self._pending.setdefault(collection_name, [])
+                if not ops:
+                    self._first_pending_at[collection_name] = time.monotonic()
+                ops.append(operation)
+                self._in_flight += 1
+                self.stats['submitted'] += 1
+                if len(ops) >= self.max_batch:
+                    self._cond.notify_all()
+                return True
+        if self.spool is not None:
+            self._assign_id(operation)
+            self._spool(collection_name, [operation])
+            return True
+        self.stats['dropped'] += 1
+        print(f"Write buffer full, dropped write to {collection_name}")
+        return False
+
+    @staticmethod
+    def _assign_id(operation):
+        # Fixed before the first attempt, so an insert applied by an attempt that timed out is a duplicate key on replay
+        if isinstance(operation, InsertOne):
+            operation._doc.setdefault('_id', ObjectId())
+
+    def pending(self):
+        with self._cond:
+            return self._in_flight
+
+    def snapshot(self):
+        """Counters plus the current queue and spool depth"""
+        stats = dict(self.stats)
+        stats['pending'] = self.pending()
+        stats['spool_pending'] = len(self.spool) if self.spool is not None else 0
+        return stats
+
+    def flush(self):
+        """Write everything queued so far from the calling thread"""
+        with self._write_lock:
+            with self._cond:
+                batches = self._take(lambda name: True)
+            self._write(batches)
+
+    @contextmanager
+    def paused(self):
+        """Write everything queued so far, then hold back further writes until the block exits, so the
+        block sees every write submitted before it and none that land half-way through"""
+        with self._write_lock:
+            with self._cond:
+                batches = self._take(lambda name: True)
+            self._write(batches)
+            yield
+
+    def close(self):
+        """Stop the flusher thread and write whatever is still queued"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self.flush()
+        if self.spool is not None:
+            if len(self.spool):
+                print(f"{len(self.spool)} writes left in {self.spool.path}, replayed on next start")
+            self.spool.close()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    now = time.monotonic()
+                    due = [name for name, ops in self._pending.items()
+                           if ops and (len(ops) >= self.max_batch or now - self._first_pending_at[name] >= self.max_age)]
+                    replay_due = self._degraded and now >= self._next_replay
+                    if due or replay_due:
+                        break
+                    oldest = min((self._first_pending_at[name] for name, ops in self._pending.items() if ops), default=None)
+                    timeout = self.max_age if oldest is None else max(0.0, oldest + self.max_age - now)
+                    if self._degraded:
+                        timeout = min(timeout, max(0.0, self._next_replay - now))
+                    self._cond.wait(timeout)
+                if self._closed:
+                    return
+            with self._write_lock:
+                with self._cond:
+                    batches = self._take(lambda name: name in due)
+                if replay_due:
+                    self._replay()
+                self._write(batches)
+
+    def _take(self, predicate):
+        # Caller holds self._cond
+        batches = []
+        for name in list(self._pending):
+            ops = self._pending[name]
+            if ops and predicate(name):
+                batches.append((name, ops))
+                self._pending[name] = []
+        return batches
+
+    def _write(self, batches):
+        for name, ops in batches:
+            started = time.perf_counter()
+            offset = 0
+            try:
+                if self._degraded:
+                    # MongoDB is known to be down: keep spooled writes in order and skip the timeout
+                    self._spool(name, ops)
+                    continue
+                with pymongo.timeout(self.latency_budget):
+                    for offset in range(0, len(ops), self.max_batch):
+                        chunk = ops[offset:offset + self.max_batch]
+                        try:
+                            self.db[name].bulk_write(chunk, ordered=False)
+                        except BulkWriteError as e:
+                            # The server rejected individual writes (e.g. duplicate keys); retrying would not
+                            # help, and the unordered chunk and the chunks after it still go through
+                            rejected = e.details.get('writeErrors', [])
+                            self.stats['errors'] += 1
+                            self.stats['written'] += len(chunk) - len(rejected)
+                            print(f"Error flushing {len(chunk)} writes to {name}: {rejected[:3]}")
+                        else:
+                            self.stats['written'] += len(chunk)
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"Error flushing {len(ops)} writes to {name}: {e}")
+                if self.spool is not None:
+                    # Chunks before offset were acknowledged; the rest go to the spool
+                    self._degraded = True
+                    self._next_replay = time.monotonic() + self.replay_interval
+                    self._spool(name, ops[offset:])
+            finally:
+                self.stats['flushes'] += 1
+                self.stats['last_flush_ms'] = round((time.perf_counter() - started) * 1000, 3)
+                with self._cond:
+                    self._in_flight -= len(ops)
+                    self._cond.notify_all()
+
+    def _spool(self, name, ops):
+        try:
+            self.spool.append(name, ops)
+            self.stats['spooled'] += len(ops)
+        except Exception as e:
+            self.stats['dropped'] += len(ops)
+            print(f"Error spooling {len(ops)} writes to {name}, dropped: {e}")
+
+    def _replay(self):
+        """Move spooled writes back into MongoDB oldest first, one bulk_write per run of one collection"""
+        try:
+            while len(self.spool):
+                entries = self.spool.peek(self.max_batch)
+                start = 0
+                while start < len(entries):
+                    name = entries[start][1]
+                    end = start
+                    while end < len(entries) and entries[end][1] == name:
+                        end += 1
+                    ops = [operation for _, _, operation in entries[start:end]]
+                    try:
+                        with pymongo.timeout(self.latency_budget):
+                            self.db[name].bulk_write(ops, ordered=False)
+                    except DuplicateKeyError:
+                        pass
+                    except BulkWriteError as e:
+                        # Inserts keep their _id and updates use applied_once(), so writes applied by an
+                        # interrupted attempt come back as duplicate keys: already done
+                        rejected = [error for error in e.details.get('writeErrors', []) if error.get('code') != 11000]
+                        if rejected:
+                            print(f"Dropped {len(rejected)} spooled writes to {name} rejected by the server: {rejected[:3]}")
+                    self.spool.remove_through(entries[end - 1][0])
+                    self.stats['replayed'] += len(ops)
+                    start = end
+            self._degraded = False
+            print("Write spool drained, writing to MongoDB directly again")
+        except Exception as e:
+            print(f"MongoDB still unavailable, {len(self.spool)} writes remain spooled: {e}")
+        finally:
+            self._next_replay = time.monotonic() + self.replay_interval
+
+
+# Readings storage layouts:
+#   plain      - one document per reading in a regular collection
+#   timeseries - one document per reading in a MongoDB 5.0+ time-series collection
+#                (timeField=timestamp, metaField=device_id); retention and backfill need 7.0+
+#   bucket     - one document per device and hour in <collection>_buckets, readings pushed into an array;
+#                the same storage savings as time-series collections on servers that lack them
+#   auto       - keep whatever layout already exists, otherwise timeseries on MongoDB 7.0+, else bucket
+STORAGE_MODES = ('plain', 'timeseries', 'bucket', 'auto')
+
+# Readings timestamps are naive local times; format them like datetime.isoformat() (no 'Z')
+JSON_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%L'
+JSON_TIMESTAMP = {'$dateToString': {'date': '$timestamp', 'format': JSON_TIMESTAMP_FORMAT}}
+
+
+def _after_filter(after):
+    """Readings past the keyset cursor (timestamp, device_id) in (timestamp, device_id) order;
+    several boards can write readings with the same timestamp, so the timestamp alone is not enough"""
+    timestamp, device_id = after
+    # null sorts before every device id; comparison operators do not cross BSON types
+    later_device = {'$ne': None} if device_id is None else {'$gt': device_id}
+    return {'$or': [{'timestamp': {'$gt': timestamp}}, {'timestamp': timestamp, 'device_id': later_device}]}
+
+
+def _bucket_filter(query):
+    """Bucket-level filter matching the buckets that hold readings matching query"""
+    bucket_filter = {}
+    for key, value in query.items():
+        if key == 'timestamp':
+            bounds = value if isinstance(value, dict) else {'$gte': value, '$lte': value}
+            for op in ('$gte', '$gt'):
+                if op in bounds:
+                    bucket_filter['last'] = {op: bounds[op]}
+            for op in ('$lte', '$lt'):
+                if op in bounds:
+                    bucket_filter['hour'] = {'$lte': bounds[op]}
+        elif key == 'device_id':
+            bucket_filter['device_id'] = value
+        elif key == '$or':
+            bucket_filter['$or'] = [_bucket_filter(clause) for clause in value]
+    return bucket_filter
+
+class Database(Storage):
+    """MongoDB storage backend"""
+
+    def __init__(self, uri, db_name, collection_name, storage_mode='auto', energy_calculator=None, spool_path=None):
+        if storage_mode not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage mode: {storage_mode}")
+        # Borrowed from the process-wide registry, never closed by this object
+        self.client = get_client(uri)
         self.db = self.client[db_name]
         # Use CodecOptions to ensure timestamps are treated as local time
         self.collection = self.db.get_collection(
             collection_name,
             codec_options=CodecOptions(tz_aware=False)
         )
-        
-        # Create LED status collection
+        self.buckets = self.db.get_collection(
+            f"{collection_name}_buckets",
+            codec_options=CodecOptions(tz_aware=False)
+        )
         self.led_collection = self.db.get_collection(
             'led_status',
             codec_options=CodecOptions(tz_aware=False)
         )
-
-        # Ensure led_status collection exists
-        if 'led_status' not in self.db.list_collection_names():
-            self.db.create_collection('led_status')
-            print("Created led_status collection")
-        else:
-            print("led_status collection already exists")
-
-        # Create energy consumption collection
         self.energy_collection = self.db.get_collection(
             'energy_consumption',
             codec_options=CodecOptions(tz_aware=False)
         )
-
-        # Ensure energy_consumption collection exists
-        if 'energy_consumption' not in self.db.list_collection_names():
-            self.db.create_collection('energy_consumption')
-            print("Created energy_consumption collection")
-        else:
-            print("energy_consumption collection already exists")
-
-        # Create heating predictions collection
         self.heating_predictions = self.db.get_collection(
             'heating_predictions',
             codec_options=CodecOptions(tz_aware=False)
         )
+        # Hourly/daily/monthly energy and cost per device
+        self.energy_buckets = self.db.get_collection(
+            'energy_buckets',
+            codec_options=CodecOptions(tz_aware=False)
+        )
+        # Materialized LED/energy totals, one document per statistic
+        self.stats_collection = self.db.get_collection('stats')
+        # Hourly rollups of readings past the raw retention window
+        self.readings_hourly = self.db.get_collection(
+            'readings_hourly',
+            codec_options=CodecOptions(tz_aware=False)
+        )
+        # Closed window aggregates
+        self.aggregates = self.db.get_collection(
+            'aggregates',
+            codec_options=CodecOptions(tz_aware=False)
+        )
 
-        # Ensure heating_predictions collection exists
-        if 'heating_predictions' not in self.db.list_collection_names():
-            self.db.create_collection('heating_predictions')
-            print("Created heating_predictions collection")
-        else:
-            print("heating_predictions collection already exists")
+        # Collections and indexes are created once per process, however many Database objects exist
+        self.schema = SchemaManager(self.db, collection_name, uri)
+        self.storage_mode = self.schema.ensure(storage_mode)
+        print(f"Readings storage mode: {self.storage_mode}")
+
+        self.energy_calculator = energy_calculator or EnergyCalculator()
+
+        # Writes off the hot path (aggregates, LED intervals) are batched here; with spool_path, writes
+        # MongoDB cannot take are kept in a local SQLite file and replayed when it recovers
+        self.writer = WriteBehindBuffer(self.db, spool=WriteSpool(spool_path) if spool_path else None)
+        self._ensure_stats()
+
+    def _ensure_stats(self):
+        """Compute missing totals from the raw history before any LED interval is recorded: the first
+        record_led_status upserts them with its $inc, and _read_stats would then never count the history"""
+        present = self.stats_collection.count_documents({'_id': {'$in': [LED_STATS_ID, ENERGY_STATS_ID]}})
+        if present < 2:
+            print("Computing LED and energy totals from the existing history")
+            self.rebuild_stats()
+
+    def _reading_write(self, data):
+        """The write operation that stores one reading in the current layout"""
+        if self.storage_mode != 'bucket':
+            return InsertOne(data)
+        timestamp = data['timestamp']
+        return applied_once(
+            {'device_id': data.get('device_id', 'default'), 'hour': timestamp.replace(minute=0, second=0, microsecond=0)},
+            {
+                '$push': {'readings': data},
+                '$inc': {'count': 1},
+                '$min': {'first': timestamp},
+                '$max': {'last': timestamp}
+            }
+        )
+
+    def _readings_pipeline(self, query=None, sort=None, limit=None):
+        """(collection, aggregation stages) yielding flat reading documents for the current layout;
+        sort is ('timestamp', 1|-1) or a list of such (field, direction) pairs"""
+        query = query or {}
+        sort_spec = None
+        if sort:
+            sort_spec = dict([sort] if isinstance(sort[0], str) else sort)
+        if self.storage_mode != 'bucket':
+            pipeline = [{'$match': query}] if query else []
+            if sort_spec:
+                pipeline.append({'$sort': sort_spec})
+            if limit:
+                pipeline.append({'$limit': limit})
+            return self.collection, pipeline
+
+        pipeline = []
+        # Prune whole buckets before unwinding: a bucket covers [hour, hour + 1h)
+        bucket_filter = _bucket_filter(query)
+        if bucket_filter:
+            pipeline.append({'$match': bucket_filter})
+        if sort_spec and limit and 'device_id' in query:
+            # One device's buckets cover disjoint hours, so its first `limit` readings always sit in
+            # the first `limit` buckets ordered by last/first (other devices' buckets overlap in time)
+            direction = next(iter(sort_spec.values()))
+            pipeline.append({'$sort': {'last' if direction < 0 else 'first': direction}})
+            pipeline.append({'$limit': limit})
+        pipeline += [
+            {'$unwind': '$readings'},
+            {'$replaceRoot': {'newRoot': '$readings'}}
+        ]
+        if query:
+            pipeline.append({'$match': query})
+        if sort_spec:
+            pipeline.append({'$sort': sort_spec})
+        if limit:
+            pipeline.append({'$limit': limit})
+        return self.buckets, pipeline
 
-        self.energy_calculator = EnergyCalculator()
+    def _find_readings(self, query=None, sort=None, limit=None, projection=None):
+        """Cursor over reading documents regardless of layout; sort is ('timestamp', 1|-1)"""
+        if self.storage_mode != 'bucket':
+            cursor = self.collection.find(query or {}, projection)
+            if sort:
+                cursor = cursor.sort(*sort)
+            if limit:
+                cursor = cursor.limit(limit)
+            return cursor
 
-    def create(self, data):
-        """Insert a new record"""
+        collection, pipeline = self._readings_pipeline(query, sort, limit)
+        if projection:
+            pipeline.append({'$project': projection})
+        return collection.aggregate(pipeline, allowDiskUse=True)
+
+    def explain_hot_queries(self):
+        """explain() report for the dashboard's hot queries, flags collection scans"""
+        return self.schema.explain_hot_queries(self.storage_mode)
+
+    def create(self, data, wait=True):
+        """Insert a new record; with wait=False it is queued on the write-behind buffer"""
         # Ensure timestamp is naive datetime (no timezone info)
         if 'timestamp' in data and isinstance(data['timestamp'], datetime):
             data['timestamp'] = data['timestamp'].replace(tzinfo=None)
+        operation = self._reading_write(data)
+        target = self.buckets if self.storage_mode == 'bucket' else self.collection
+        if not wait:
+            return self.writer.submit(target.name, operation)
+        if self.storage_mode == 'bucket':
+            target.bulk_write([operation])
+            return None
         result = self.collection.insert_one(data)
         return str(result.inserted_id)
 
     def read(self, query):
         """Read records based on query"""
-        return list(self.collection.find(query))
+        return list(self._find_readings(query))
+
+    # The _id based helpers below address single documents, so they only apply to the plain and
+    # timeseries layouts; in the bucket layout individual readings have no _id.
 
     def read_by_id(self, record_id):
         """Read a record by ID"""
@@ -89,42 +474,167 @@ class Database:
 
     def delete_many(self, query):
         """Delete multiple records based on query"""
+        if self.storage_mode == 'bucket':
+            # Pull matching readings out of their buckets, then fix up the bucket counters
+            result = self.buckets.update_many({}, {'$pull': {'readings': query}})
+            self.buckets.update_many({}, [{'$set': {'count': {'$size': '$readings'}}}])
+            self.buckets.delete_many({'count': 0})
+            return result.modified_count
         result = self.collection.delete_many(query)
         return result.deleted_count
 
     def read_all(self):
         """Read all records"""
-        return list(self.collection.find({}, {'_id': False}))
+        return list(self._find_readings(projection={'_id': False}))
+
+    def check_readings_rewritable(self, operation):
+        """Raise before rewriting readings by timestamp when the server cannot do it for this layout"""
+        if self.storage_mode != 'timeseries':
+            return
+        version = self.schema.server_version()
+        if version < TIMESERIES_REWRITE_VERSION:
+            raise RuntimeError(
+                f"{operation} needs MongoDB {'.'.join(map(str, TIMESERIES_REWRITE_VERSION))}+ for the time-series "
+                f"collection {self.collection.name}, the server is {'.'.join(map(str, version))}; "
+                f"upgrade MongoDB or migrate the readings to the bucket layout"
+            )
+
+    def update_readings(self, updates, batch_size=1000):
+        """Patch readings identified by (device_id, timestamp) with unordered bulk writes"""
+        self.check_readings_rewritable('Updating readings')
+        if self.storage_mode == 'bucket':
+            collection = self.buckets
+            ops = [
+                UpdateOne(
+                    {'device_id': device_id or 'default', 'hour': timestamp.replace(minute=0, second=0, microsecond=0)},
+                    {'$set': {f'readings.$[r].{field}': value for field, value in fields.items()}},
+                    array_filters=[{'r.timestamp': timestamp}]
+                )
+                for device_id, timestamp, fields in updates
+            ]
+        else:
+            collection = self.collection
+            # device_id None also matches readings stored before the field existed
+            ops = [UpdateOne({'device_id': device_id, 'timestamp': timestamp}, {'$set': fields})
+                   for device_id, timestamp, fields in updates]
+        modified = 0
+        for offset in range(0, len(ops), batch_size):
+            modified += collection.bulk_write(ops[offset:offset + batch_size], ordered=False).modified_count
+        return modified
+
+    def delete_by_time_range(self, start_time, end_time):
+        """Delete readings with start_time <= timestamp < end_time"""
+        self.check_readings_rewritable('Deleting readings by time range')
+        if self.storage_mode == 'bucket':
+            # Whole hours inside the range go without touching their readings arrays
+            inside = {'first': {'$gte': start_time}, 'last': {'$lt': end_time}}
+            deleted = next(self.buckets.aggregate([{'$match': inside}, {'$group': {'_id': None, 'n': {'$sum': '$count'}}}]), {}).get('n', 0)
+            self.buckets.delete_many(inside)
+            # Buckets straddling a range edge keep their readings outside it
+            overlapping = {'hour': {'$lt': end_time}, 'last': {'$gte': start_time}}
+            self.buckets.update_many(overlapping, [
+                {'$set': {'readings': {'$filter': {
+                    'input': '$readings',
+                    'cond': {'$or': [{'$lt': ['$$this.timestamp', start_time]}, {'$gte': ['$$this.timestamp', end_time]}]}
+                }}}},
+                {'$set': {'count': {'$size': '$readings'}, 'first': {'$min': '$readings.timestamp'},
+                          'last': {'$max': '$readings.timestamp'}}}
+            ])
+            self.buckets.delete_many({'count': 0})
+            return deleted  # readings in whole buckets; compaction ranges are hour-aligned, so that is all of them
+        return self.collection.delete_many({'timestamp': {'$gte': start_time, '$lt': end_time}}).deleted_count
+
+    def write_hourly_rollups(self, rollups):
+        """Insert or replace hourly rollups; rerunning compaction for an hour overwrites its rollup"""
+        if rollups:
+            self.readings_hourly.bulk_write([
+                ReplaceOne({'device_id': rollup['device_id'], 'hour': rollup['hour']}, rollup, upsert=True)
+                for rollup in rollups
+            ], ordered=False)
+
+    def iter_hourly_rollups(self, start_time, end_time, device_id=None):
+        query = {'hour': {'$gte': start_time, '$lt': end_time}}
+        if device_id:
+            query['device_id'] = device_id
+        return self.readings_hourly.find(query, {'_id': 0}).sort('hour', 1)
     
-    def read_by_time_range(self, start_time, end_time):
-        """Read records within a time range"""
-        query = {"timestamp": {"$gte": start_time, "$lte": end_time}}
+    def iter_by_time_range(self, start_time, end_time, fields=None, after=None, limit=None,
+                           resolution_seconds=None, device_id=None, batch_size=1000, raw_timestamps=False):
+        """
+        Cursor over records within a time range, oldest first (ties on timestamp ordered by device_id).
+        fields: only return these fields (plus timestamp)
+        after: keyset cursor, only records after it in the returned order; (timestamp, device_id) of the
+               last raw record of the previous page, or the timestamp of its last downsampled bucket
+        limit: page size
+        resolution_seconds: average numeric fields per bucket of this many seconds on the server
+        batch_size: documents fetched per round trip while iterating
+        raw_timestamps: keep timestamps as datetime instead of JSON-ready strings (raw reads only)
+        """
+        if isinstance(after, tuple) and resolution_seconds:
+            after = after[0]  # downsampled buckets are unique per timestamp
+        if isinstance(after, tuple):
+            query = {"timestamp": {"$gte": after[0], "$lte": end_time}, **_after_filter(after)}
+        else:
+            query = {"timestamp": {"$gt" if after else "$gte": after or start_time, "$lte": end_time}}
+        if device_id:
+            query["device_id"] = device_id
         print(f"Executing query: {query}")  # Add this log
-        records = list(self.collection.find(query, {'_id': False}))
-        print(f"Found {len(records)} records")  # Add this log
-        
-        # Convert datetime objects to strings for JSON serialization
-        for record in records:
-            if isinstance(record.get('timestamp'), datetime):
-                record['timestamp'] = record['timestamp'].isoformat()
-        
-        return records
-
-    def read_latest(self):
-        """Read the latest record"""
+
+        if resolution_seconds:
+            collection, pipeline = self._readings_pipeline(query, sort=None)
+            pipeline += self._downsample_stages(fields or NUMERIC_READING_FIELDS, resolution_seconds)
+            if limit:
+                pipeline.append({'$limit': limit})
+        else:
+            collection, pipeline = self._readings_pipeline(query, sort=[('timestamp', 1), ('device_id', 1)], limit=limit)
+            projection = {'_id': 0, 'timestamp': 1 if raw_timestamps else JSON_TIMESTAMP}
+            if fields:
+                projection.update({field: 1 for field in fields if field != 'timestamp'})
+                pipeline.append({'$project': projection})
+            elif raw_timestamps:
+                pipeline.append({'$project': {'_id': 0}})
+            else:
+                # Timestamps are formatted by the server, no per-record rewrite in Python
+                pipeline += [{'$set': {'timestamp': JSON_TIMESTAMP}}, {'$project': {'_id': 0}}]
+        return collection.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+
+    def _downsample_stages(self, fields, resolution_seconds):
+        """Group readings into resolution_seconds buckets and average the requested fields"""
+        bucket_ms = int(resolution_seconds * 1000)
+        group = {
+            '_id': {'$subtract': ['$timestamp', {'$mod': [{'$toLong': '$timestamp'}, bucket_ms]}]},
+            'count': {'$sum': 1}
+        }
+        for field in fields:
+            if field != 'timestamp':
+                group[field] = {'$avg': f'${field}'}
+        return [
+            {'$group': group},
+            {'$sort': {'_id': 1}},
+            {'$set': {'timestamp': {'$dateToString': {'date': '$_id', 'format': JSON_TIMESTAMP_FORMAT}}}},
+            {'$project': {'_id': 0}}
+        ]
+
+    def read_latest(self, as_json=True):
+        """Read the latest record; as_json=False keeps the timestamp as datetime"""
         try:
-            latest_record = self.collection.find_one({}, sort=[("timestamp", -1)], projection={'_id': False})
-            if latest_record and isinstance(latest_record.get('timestamp'), datetime):
+            latest_record = next(self._find_readings(sort=("timestamp", -1), limit=1, projection={'_id': False}), None)
+            if as_json and latest_record and isinstance(latest_record.get('timestamp'), datetime):
                 latest_record['timestamp'] = latest_record['timestamp'].isoformat()
             return latest_record
         except Exception as e:
             print(f"Error reading latest record: {e}")
             return None
 
+    def create_aggregate(self, aggregate_data):
+        """Queue a closed window aggregate (see server.aggregator)"""
+        return self.writer.submit(self.aggregates.name, InsertOne(aggregate_data))
+
     def create_led_status(self, status_data):
         """Insert a new record in the LED status collection"""
         try:
             result = self.led_collection.insert_one(status_data)
+            self.stats_collection.bulk_write([self._led_stats_update(status_data)])
             print(f"Inserted LED status record: {status_data}")
             return str(result.inserted_id)
         except Exception as e:
@@ -132,24 +642,12 @@ class Database:
             return None
 
     def get_led_stats(self):
-        """Get LED usage statistics"""
-        pipeline = [
-            {
-                '$group': {
-                    '_id': None,
-                    'total_on_time': {'$sum': '$duration'},
-                    'on_count': {'$sum': {'$cond': [{'$eq': ['$status', 'ON']}, 1, 0]}}
-                }
-            }
-        ]
-        result = list(self.led_collection.aggregate(pipeline))
-        if result:
-            stats = result[0]
-            return {
-                'total_on_time': stats.get('total_on_time', 0),
-                'on_count': stats.get('on_count', 0)
-            }
-        return {'total_on_time': 0, 'on_count': 0}
+        """Get LED usage statistics from the materialized totals"""
+        stats = self._read_stats(LED_STATS_ID)
+        return {
+            'total_on_time': stats.get('total_on_time', 0),
+            'on_count': stats.get('on_count', 0)
+        }
 
     def get_led_status_history(self, limit=10):
         """Get recent LED status history"""
@@ -159,38 +657,118 @@ class Database:
     def create_energy_consumption(self, energy_data):
         """Insert a new record in the energy consumption collection"""
         result = self.energy_collection.insert_one(energy_data)
+        self.stats_collection.bulk_write([self._energy_stats_update(energy_data)])
         return str(result.inserted_id)
 
     def get_energy_stats(self):
-        """Get energy consumption statistics"""
-        pipeline = [
-            {
-                '$group': {
-                    '_id': None,
-                    'total_energy': {'$sum': '$energy_kwh'},
-                    'total_cost': {'$sum': '$cost'}
+        """Get energy consumption statistics from the materialized totals"""
+        stats = self._read_stats(ENERGY_STATS_ID)
+        return {
+            'total_energy': stats.get('total_energy', 0),
+            'total_cost': stats.get('total_cost', 0)
+        }
+
+    def _read_stats(self, stats_id):
+        stats = self.stats_collection.find_one({'_id': stats_id})
+        if stats is None:
+            # Normally computed by _ensure_stats at start-up; covers a stats document removed since
+            stats = self.rebuild_stats()[stats_id]
+        return stats
+
+    def _led_stats_update(self, status_data):
+        # Same totals as grouping the whole led_status collection: duration of every record, count of ON records
+        return applied_once(
+            {'_id': LED_STATS_ID},
+            {'$inc': {'total_on_time': status_data['duration'], 'on_count': 1 if status_data['status'] == 'ON' else 0}}
+        )
+
+    def _energy_stats_update(self, energy_data):
+        return applied_once(
+            {'_id': ENERGY_STATS_ID},
+            {'$inc': {'total_energy': energy_data['energy_kwh'], 'total_cost': energy_data['cost']}}
+        )
+
+    def rebuild_stats(self):
+        """Recompute the materialized LED and energy totals from the raw collections; queued writes are
+        flushed first and held back meanwhile, so no raw record and its $inc land on different sides"""
+        with self.writer.paused():
+            led = next(self.led_collection.aggregate([
+                {
+                    '$group': {
+                        '_id': None,
+                        'total_on_time': {'$sum': '$duration'},
+                        'on_count': {'$sum': {'$cond': [{'$eq': ['$status', 'ON']}, 1, 0]}}
+                    }
                 }
+            ]), {})
+            energy = next(self.energy_collection.aggregate([
+                {
+                    '$group': {
+                        '_id': None,
+                        'total_energy': {'$sum': '$energy_kwh'},
+                        'total_cost': {'$sum': '$cost'}
+                    }
+                }
+            ]), {})
+            stats = {
+                LED_STATS_ID: {'total_on_time': led.get('total_on_time', 0), 'on_count': led.get('on_count', 0)},
+                ENERGY_STATS_ID: {'total_energy': energy.get('total_energy', 0), 'total_cost': energy.get('total_cost', 0)}
             }
-        ]
-        result = list(self.energy_collection.aggregate(pipeline))
-        if result:
-            stats = result[0]
-            return {
-                'total_energy': stats.get('total_energy', 0),
-                'total_cost': stats.get('total_cost', 0)
-            }
-        return {'total_energy': 0, 'total_cost': 0}
+            for stats_id, values in stats.items():
+                # $set keeps the applied_once() markers, so a spooled $inc replayed later is not applied twice
+                self.stats_collection.update_one({'_id': stats_id}, {'$set': values}, upsert=True)
+            return stats
 
     def update_energy_consumption(self, led_status):
-        energy_kwh = self.energy_calculator.calculate_energy_consumption(led_status.duration)
-        cost = self.energy_calculator.calculate_cost(energy_kwh)
-        energy_data = {
-            'timestamp': led_status.timestamp,
-            'duration': led_status.duration,
-            'energy_kwh': energy_kwh,
-            'cost': cost
-        }
-        self.create_energy_consumption(energy_data)
+        self.create_energy_consumption(self._energy_document(led_status))
+        updates = self._energy_bucket_updates(led_status)
+        if updates:
+            self.energy_buckets.bulk_write(updates, ordered=False)
+
+    def record_led_status(self, led_status):
+        """Queue a finished LED interval and its energy record without waiting for MongoDB"""
+        status_data = led_status.to_dict()
+        energy_data = self._energy_document(led_status)
+        results = [
+            self.writer.submit(self.led_collection.name, InsertOne(status_data)),
+            self.writer.submit(self.energy_collection.name, InsertOne(energy_data)),
+            self.writer.submit(self.stats_collection.name, self._led_stats_update(status_data)),
+            self.writer.submit(self.stats_collection.name, self._energy_stats_update(energy_data))
+        ]
+        results += [self.writer.submit(self.energy_buckets.name, update) for update in self._energy_bucket_updates(led_status)]
+        return all(results)
+
+    def _energy_bucket_updates(self, led_status):
+        """$inc operations adding one closed LED interval to its hour/day/month buckets"""
+        return [
+            applied_once(
+                {'granularity': granularity, 'device_id': led_status.device_id, 'period_start': start},
+                {'$inc': {'on_seconds': seconds, 'energy_kwh': energy_kwh, 'cost': cost}}
+            )
+            for (granularity, start), (seconds, energy_kwh, cost) in self._energy_bucket_totals(led_status).items()
+        ]
+
+    def get_energy_rollups(self, granularity, start_time, end_time, device_id='default'):
+        """Energy and cost per period in [start_time, end_time), read from the pre-aggregated buckets"""
+        if granularity not in ENERGY_GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        cursor = self.energy_buckets.find(
+            {
+                'granularity': granularity,
+                'device_id': device_id,
+                'period_start': {'$gte': period_start(start_time, granularity), '$lt': end_time}
+            },
+            {'_id': 0, 'granularity': 0, 'device_id': 0}
+        ).sort('period_start', 1)
+        return [
+            {
+                'period_start': bucket['period_start'].isoformat(),
+                'on_seconds': bucket.get('on_seconds', 0),
+                'energy_kwh': bucket.get('energy_kwh', 0),
+                'cost': bucket.get('cost', 0)
+            }
+            for bucket in cursor
+        ]
 
     def create_heating_prediction(self, prediction_data):
         """存储供暖预测记录，包含实际值字段"""
@@ -209,12 +787,27 @@ class Database:
             print(f"Error inserting heating prediction record: {e}")
             return None
 
+    def create_heating_predictions(self, predictions):
+        documents = [dict(prediction, actual_value=0) for prediction in predictions]
+        if not documents:
+            return 0
+        for document in documents:
+            if isinstance(document.get('timestamp'), datetime):
+                document['timestamp'] = document['timestamp'].replace(tzinfo=None)
+        self.heating_predictions.bulk_write([
+            ReplaceOne({'timestamp': document['timestamp'], 'source': document['source']}, document, upsert=True)
+            for document in documents
+        ], ordered=False)
+        print(f"Stored {len(documents)} heating prediction records")
+        return len(documents)
+
     def update_prediction_actual_value(self, timestamp, actual_value):
         """更新预测记录的实际值"""
         try:
             # 查找最接近给定时间戳的预测记录并更新实际值
+            # Live predictions only: batch rows carry a source and historical timestamps
             result = self.heating_predictions.update_one(
-                {"timestamp": {"$lte": timestamp}},
+                {"timestamp": {"$lte": timestamp}, "source": {"$exists": False}},
                 {"$set": {"actual_value": actual_value}},
                 sort=[("timestamp", -1)]
             )
@@ -223,20 +816,13 @@ class Database:
             print(f"Error updating actual value: {e}")
             return 0
 
-    def get_recent_predictions(self, limit=24):
-        """获取最近的预测记录，包含实际值"""
-        try:
-            cursor = self.heating_predictions.find(
-                {},
-                {'_id': 0}  # 不返回 _id 字段
-            ).sort('timestamp', -1).limit(limit)
-            
-            predictions = list(cursor)
-            # 转换时间戳为 ISO 格式字符串
-            for pred in predictions:
-                if isinstance(pred.get('timestamp'), datetime):
-                    pred['timestamp'] = pred['timestamp'].isoformat()
-            return predictions
-        except Exception as e:
-            print(f"Error getting recent predictions: {e}")
-            return []
\ No newline at end of file
+    def iter_recent_predictions(self, limit=24):
+        """Cursor over the most recent predictions; timestamps stay datetime for the JSON encoder"""
+        return self.heating_predictions.find({'source': {'$exists': False}}, {'_id': 0}).sort('timestamp', -1).limit(limit)
+
+    def write_stats(self):
+        return self.writer.snapshot()
+
+    def close(self):
+        """Flush queued writes; the shared client is closed by client_registry.close_all()"""
+        self.writer.close()
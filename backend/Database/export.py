@@ -0,0 +1,140 @@
+# Bulk export of readings into Parquet, Arrow IPC or CSV, streamed in fixed-size batches.
+# CLI (from the backend directory):
+#   python -m Database.export --start 2024-01-01 --end 2025-01-01 --format parquet --out readings.parquet
+import argparse
+import dataclasses
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from Database.sensor_data import SensorData
+
+_ARROW_TYPES = {
+    float: pa.float64(),
+    int: pa.int64(),
+    str: pa.string(),
+    datetime: pa.timestamp('ms'),
+}
+
+# One typed column per SensorData field, timestamp first
+READINGS_SCHEMA = pa.schema(
+    sorted(
+        (pa.field(field.name, _ARROW_TYPES[field.type]) for field in dataclasses.fields(SensorData)),
+        key=lambda field: field.name != 'timestamp'
+    )
+)
+
+EXPORT_FORMATS = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+    'csv': ('text/csv', 'csv'),
+}
+
+
+def iter_record_batches(db, start_time, end_time, batch_size=10000, device_id=None):
+    """Read readings in [start_time, end_time] as Arrow RecordBatches of at most batch_size rows"""
+    names = READINGS_SCHEMA.names
+    cursor = db.iter_by_time_range(start_time, end_time, fields=names, device_id=device_id,
+                                   batch_size=batch_size, raw_timestamps=True)
+    rows = []
+    for row in cursor:
+        rows.append(row)
+        if len(rows) >= batch_size:
+            yield _to_batch(rows, names)
+            rows = []
+    if rows:
+        yield _to_batch(rows, names)
+
+
+def _to_batch(rows, names):
+    columns = {name: [row.get(name) for row in rows] for name in names}
+    return pa.RecordBatch.from_pydict(columns, schema=READINGS_SCHEMA)
+
+
+def _open_writer(fmt, sink):
+    if fmt == 'parquet':
+        return pq.ParquetWriter(sink, READINGS_SCHEMA, compression='zstd')
+    if fmt == 'arrow':
+        return pa.ipc.new_stream(sink, READINGS_SCHEMA)
+    if fmt == 'csv':
+        return pa_csv.CSVWriter(sink, READINGS_SCHEMA)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+def export_readings(db, start_time, end_time, fmt, sink, batch_size=10000, device_id=None):
+    """Write readings to sink (path or writable file object); returns the number of rows written"""
+    writer = _open_writer(fmt, sink)
+    rows = 0
+    try:
+        for batch in iter_record_batches(db, start_time, end_time, batch_size, device_id):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        writer.close()
+    return rows
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_export_chunks(db, start_time, end_time, fmt, batch_size=10000, device_id=None):
+    """Generator of encoded export bytes, one chunk per batch, for streaming HTTP responses"""
+    chunk_sink = _ChunkSink()
+    writer = _open_writer(fmt, pa.PythonFile(chunk_sink, mode='w'))
+    try:
+        for batch in iter_record_batches(db, start_time, end_time, batch_size, device_id):
+            writer.write_batch(batch)
+            data = chunk_sink.take()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield chunk_sink.take()
+
+
+if __name__ == "__main__":
+    from Database.db_operation import Database
+    from Database import client_registry
+
+    parser = argparse.ArgumentParser(description="Export sensor readings for model training")
+    parser.add_argument('--start', required=True, type=datetime.fromisoformat, help="ISO start time (local)")
+    parser.add_argument('--end', required=True, type=datetime.fromisoformat, help="ISO end time (local)")
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='parquet')
+    parser.add_argument('--out', required=True, help="Output file")
+    parser.add_argument('--device-id', default=None)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    db = Database(uri="mongodb://localhost:27017/", db_name="sensor_data", collection_name="readings")
+    started = datetime.now()
+    try:
+        count = export_readings(db, args.start, args.end, args.format, args.out, args.batch_size, args.device_id)
+    finally:
+        db.close()
+        client_registry.close_all()
+    print(f"Exported {count} readings to {args.out} in {(datetime.now() - started).total_seconds():.1f}s")
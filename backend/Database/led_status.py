@@ -1,19 +1,31 @@
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, fields
 from datetime import datetime
+from operator import attrgetter
 
-@dataclass
+@dataclass(slots=True)
 class LEDStatus:
     timestamp: datetime
     status: str
     duration: float
+    device_id: str = "default"
 
     def to_dict(self):
-        return asdict(self)
+        return dict(zip(LED_STATUS_FIELDS, _get_values(self)))
 
     @classmethod
     def from_dict(cls, data):
         return cls(
             timestamp=data['timestamp'],
             status=data['status'],
-            duration=data['duration']
-        )
\ No newline at end of file
+            duration=data['duration'],
+            device_id=data.get('device_id', "default")
+        )
+
+
+LED_STATUS_FIELDS = tuple(field.name for field in fields(LEDStatus))
+_get_values = attrgetter(*LED_STATUS_FIELDS)
+
+
+def encode_led_statuses(records):
+    """Many LEDStatus -> list of BSON/JSON-ready dicts"""
+    return [dict(zip(LED_STATUS_FIELDS, _get_values(record))) for record in records]
@@ -0,0 +1,32 @@
+from abc import ABC, abstractmethod
+
+
+class Migration(ABC):
+    """One versioned data migration over a single collection.
+
+    Subclasses set version/name/collection, narrow the documents with `query`, and turn each
+    document into a pymongo write in `operation` (None to leave it alone). The runner feeds
+    documents in _id order, so a migration must only touch the documents it is given.
+    """
+
+    version = None
+    name = None
+    collection = None
+    query = {}
+    projection = None  # fields `operation` needs; None loads whole documents
+
+    @abstractmethod
+    def operation(self, doc):
+        """pymongo write for one document, or None"""
+
+    def operations(self, docs):
+        """Write operations for one batch of documents"""
+        ops = []
+        for doc in docs:
+            op = self.operation(doc)
+            if op is not None:
+                ops.append(op)
+        return ops
+
+    def __repr__(self):
+        return f"{self.version:04d}_{self.name}"
@@ -0,0 +1,22 @@
+from datetime import datetime
+from pymongo import UpdateOne
+from Database.migrations.base import Migration
+
+
+class TimestampStrings(Migration):
+    """Early readings stored their timestamp as a '%Y-%m-%d %H:%M:%S' string; store a datetime instead"""
+
+    version = 1
+    name = 'timestamp_strings'
+    collection = 'readings'
+    query = {'timestamp': {'$type': 'string'}}
+    projection = {'timestamp': 1}
+
+    def operation(self, doc):
+        try:
+            # 根据存储的格式解析时间字符串
+            timestamp_dt = datetime.strptime(doc['timestamp'], '%Y-%m-%d %H:%M:%S')
+        except ValueError as e:
+            print(f"Error parsing timestamp for document {doc['_id']}: {e}")
+            return None
+        return UpdateOne({'_id': doc['_id']}, {'$set': {'timestamp': timestamp_dt}})
@@ -0,0 +1,151 @@
+# Versioned, resumable data migrations over the MongoDB collections.
+# CLI (from the backend directory):
+#   python -m Database.migrations.runner [--workers 4] [--batch-size 1000] [--only 1] [--dry-run]
+import argparse
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from Database.migrations.m0001_timestamp_strings import TimestampStrings
+
+# Every migration, append new ones with the next version number
+MIGRATIONS = [
+    TimestampStrings(),
+]
+
+# One document per migration version: status, _id checkpoint and counters
+STATE_COLLECTION = 'migrations'
+
+
+def _batches(cursor, batch_size):
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class MigrationRunner:
+    """Applies pending migrations in version order with parallel unordered bulk_write batches.
+
+    Documents are read in _id order; after each batch (and every batch before it) is written, its last
+    _id is stored as the checkpoint, so an interrupted migration resumes there. Batches written after
+    the checkpoint are read again on resume, so operations must be idempotent (a migrated document
+    should no longer match the migration's query).
+    """
+
+    def __init__(self, db, migrations=MIGRATIONS, workers=4, batch_size=1000, report_every=10.0):
+        self.db = db
+        self.migrations = sorted(migrations, key=lambda migration: migration.version)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.report_every = report_every
+        self.state = db[STATE_COLLECTION]
+
+    def pending(self):
+        done = {doc['_id'] for doc in self.state.find({'status': 'done'}, {'_id': 1})}
+        return [migration for migration in self.migrations if migration.version not in done]
+
+    def run(self, only=None, dry_run=False):
+        """Apply every pending migration (or only the listed versions); returns one report per migration"""
+        return [self.apply(migration, dry_run) for migration in self.pending()
+                if only is None or migration.version in only]
+
+    def apply(self, migration, dry_run=False):
+        state = self.state.find_one({'_id': migration.version}) or {}
+        checkpoint = state.get('checkpoint')
+        counters = {'processed': state.get('processed', 0), 'modified': state.get('modified', 0)}
+        if checkpoint is not None:
+            print(f"Resuming migration {migration} after _id {checkpoint}")
+        else:
+            print(f"Starting migration {migration}")
+        if not dry_run:
+            self.state.update_one(
+                {'_id': migration.version},
+                {'$set': {'name': migration.name, 'status': 'running'}, '$setOnInsert': {'started_at': datetime.now()}},
+                upsert=True
+            )
+
+        query = dict(migration.query)
+        if checkpoint is not None:
+            query['_id'] = {'$gt': checkpoint}
+        collection = self.db[migration.collection]
+        cursor = collection.find(query, migration.projection).sort('_id', 1).batch_size(self.batch_size)
+
+        started = time.perf_counter()
+        last_report = started
+        run_processed = 0
+        in_flight = deque()  # (future, last _id of the batch, batch size), oldest first
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"migration-{migration.version}") as pool:
+            def settle(block):
+                # Checkpoints only move past batches whose predecessors are all written
+                nonlocal run_processed, last_report
+                while in_flight and (block or in_flight[0][0].done()):
+                    future, last_id, count = in_flight.popleft()
+                    counters['modified'] += future.result()
+                    counters['processed'] += count
+                    run_processed += count
+                    if not dry_run:
+                        self.state.update_one({'_id': migration.version}, {'$set': dict(counters, checkpoint=last_id)})
+                    now = time.perf_counter()
+                    if now - last_report >= self.report_every:
+                        print(f"{migration}: {counters['processed']} documents, {run_processed / (now - started):.0f} docs/s")
+                        last_report = now
+                    block = block and len(in_flight) >= self.workers * 2
+
+            for batch in _batches(cursor, self.batch_size):
+                in_flight.append((pool.submit(self._write, collection, migration.operations(batch), dry_run),
+                                  batch[-1]['_id'], len(batch)))
+                # At most two batches per worker wait in memory
+                settle(len(in_flight) >= self.workers * 2)
+            while in_flight:
+                settle(True)
+
+        seconds = time.perf_counter() - started
+        if not dry_run:
+            self.state.update_one(
+                {'_id': migration.version},
+                {'$set': dict(counters, status='done', finished_at=datetime.now()), '$unset': {'checkpoint': ''}}
+            )
+        report = {
+            'version': migration.version,
+            'name': migration.name,
+            'processed': counters['processed'],
+            'modified': counters['modified'],
+            'seconds': round(seconds, 3),
+            'docs_per_second': round(run_processed / seconds, 1) if seconds else None,
+            'dry_run': dry_run
+        }
+        print(f"Finished migration {migration}: {report}")
+        return report
+
+    def _write(self, collection, ops, dry_run):
+        if not ops:
+            return 0
+        if dry_run:
+            return len(ops)
+        return collection.bulk_write(ops, ordered=False).modified_count
+
+
+if __name__ == "__main__":
+    from Database import client_registry
+
+    parser = argparse.ArgumentParser(description="Apply pending data migrations")
+    parser.add_argument('--uri', default=client_registry.DEFAULT_URI)
+    parser.add_argument('--db-name', default='sensor_data')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--only', type=int, action='append', help="Apply only this version (repeatable)")
+    parser.add_argument('--dry-run', action='store_true', help="Count the writes without applying them")
+    args = parser.parse_args()
+
+    try:
+        runner = MigrationRunner(client_registry.get_client(args.uri)[args.db_name],
+                                 workers=args.workers, batch_size=args.batch_size)
+        print(f"Pending migrations: {runner.pending()}")
+        runner.run(only=args.only, dry_run=args.dry_run)
+    finally:
+        client_registry.close_all()
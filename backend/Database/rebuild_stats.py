@@ -0,0 +1,14 @@
+# Recompute the materialized LED and energy totals from the raw history.
+# Run from the backend directory while the app is stopped: python -m Database.rebuild_stats
+# (Database.rebuild_stats() flushes its own write-behind queue, not the one of a running app)
+from Database.db_operation import Database
+from Database import client_registry
+
+if __name__ == "__main__":
+    db = Database(uri="mongodb://localhost:27017/", db_name="sensor_data", collection_name="readings")
+    try:
+        stats = db.rebuild_stats()
+        print(f"Rebuilt stats: {stats}")
+    finally:
+        db.close()
+        client_registry.close_all()
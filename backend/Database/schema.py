@@ -0,0 +1,168 @@
+import threading
+from datetime import datetime, timedelta
+from pymongo import IndexModel, ASCENDING, DESCENDING
+
+# Secondary collections and the indexes their read paths need
+COLLECTION_INDEXES = {
+    'led_status': [
+        IndexModel([('timestamp', DESCENDING)], name='timestamp_desc'),
+    ],
+    'energy_consumption': [
+        IndexModel([('timestamp', DESCENDING)], name='timestamp_desc'),
+    ],
+    'heating_predictions': [
+        IndexModel([('timestamp', DESCENDING)], name='timestamp_desc'),
+        # Batch predictions are upserted by (source, timestamp); live predictions have no source
+        IndexModel([('source', ASCENDING), ('timestamp', ASCENDING)], name='source_timestamp', unique=True,
+                   partialFilterExpression={'source': {'$exists': True}}),
+    ],
+    'energy_buckets': [
+        IndexModel([('granularity', ASCENDING), ('device_id', ASCENDING), ('period_start', ASCENDING)],
+                   name='granularity_device_period', unique=True),
+    ],
+    # Materialized totals are looked up by _id only
+    'stats': [],
+    # Hourly rollups of readings that aged out of the raw collection (server.retention)
+    'readings_hourly': [
+        IndexModel([('device_id', ASCENDING), ('hour', ASCENDING)], name='device_hour', unique=True),
+        IndexModel([('hour', ASCENDING)], name='hour_asc'),
+    ],
+    'aggregates': [
+        IndexModel([('window_seconds', ASCENDING), ('device_id', ASCENDING), ('window_start', DESCENDING)],
+                   name='window_device_start'),
+    ],
+}
+
+# Indexes on the readings collection for each storage layout (see Database.STORAGE_MODES)
+READINGS_INDEXES = {
+    'plain': [
+        IndexModel([('timestamp', DESCENDING)], name='timestamp_desc'),
+        # Keyset paging order of iter_by_time_range
+        IndexModel([('timestamp', ASCENDING), ('device_id', ASCENDING)], name='timestamp_device'),
+        IndexModel([('device_id', ASCENDING), ('timestamp', DESCENDING)], name='device_timestamp'),
+    ],
+    'timeseries': [
+        IndexModel([('timestamp', ASCENDING), ('device_id', ASCENDING)], name='timestamp_device'),
+        IndexModel([('device_id', ASCENDING), ('timestamp', DESCENDING)], name='device_timestamp'),
+    ],
+    'bucket': [
+        IndexModel([('device_id', ASCENDING), ('hour', ASCENDING)], name='device_hour', unique=True),
+        IndexModel([('last', DESCENDING)], name='last_desc'),
+        IndexModel([('first', ASCENDING)], name='first_asc'),
+    ],
+}
+
+# Time-series collections accept deletes and updates on fields other than the metaField from this version on;
+# retention and backfill rewrite readings by timestamp, so auto only picks timeseries from here
+TIMESERIES_REWRITE_VERSION = (7, 0)
+
+_ensured = {}  # (uri, db name, readings collection) -> resolved storage mode
+_ensured_lock = threading.Lock()
+
+
+class SchemaManager:
+    """Creates the collections and indexes the backend needs, once per process and database"""
+
+    def __init__(self, db, readings_name, uri=None):
+        self.db = db
+        self.readings_name = readings_name
+        self.buckets_name = f"{readings_name}_buckets"
+        self.key = (uri, db.name, readings_name)
+        self._server_version = None
+
+    def ensure(self, storage_mode):
+        """Create missing collections and indexes in one pass; returns the resolved storage mode"""
+        with _ensured_lock:
+            if self.key in _ensured:
+                return _ensured[self.key]
+            existing = {info['name']: info.get('type', 'collection') for info in self.db.list_collections()}
+            storage_mode = self._resolve_storage_mode(storage_mode, existing)
+
+            readings_name = self.buckets_name if storage_mode == 'bucket' else self.readings_name
+            if storage_mode == 'timeseries' and self.readings_name not in existing:
+                self.db.create_collection(
+                    self.readings_name,
+                    timeseries={'timeField': 'timestamp', 'metaField': 'device_id', 'granularity': 'minutes'}
+                )
+                existing[self.readings_name] = 'timeseries'
+                print(f"Created time-series collection {self.readings_name}")
+            elif storage_mode == 'timeseries' and existing[self.readings_name] != 'timeseries':
+                print(f"Warning: {self.readings_name} is a regular collection, it cannot be converted to time-series in place")
+                storage_mode = 'plain'
+
+            declared = dict(COLLECTION_INDEXES)
+            declared[readings_name] = READINGS_INDEXES[storage_mode]
+            for name, indexes in declared.items():
+                if name not in existing:
+                    self.db.create_collection(name)
+                    print(f"Created {name} collection")
+                self._ensure_indexes(name, indexes)
+
+            _ensured[self.key] = storage_mode
+            return storage_mode
+
+    def _resolve_storage_mode(self, storage_mode, existing):
+        if storage_mode != 'auto':
+            return storage_mode
+        if self.readings_name in existing:
+            return 'timeseries' if existing[self.readings_name] == 'timeseries' else 'plain'
+        if self.buckets_name in existing:
+            return 'bucket'
+        return 'timeseries' if self.server_version() >= TIMESERIES_REWRITE_VERSION else 'bucket'
+
+    def server_version(self):
+        if self._server_version is None:
+            self._server_version = tuple(self.db.client.server_info()['versionArray'][:2])
+        return self._server_version
+
+    def _ensure_indexes(self, name, indexes):
+        present = {index['name'] for index in self.db[name].list_indexes()}
+        missing = [index for index in indexes if index.document['name'] not in present]
+        if missing:
+            created = self.db[name].create_indexes(missing)
+            print(f"Created indexes on {name}: {created}")
+
+    def explain_hot_queries(self, storage_mode):
+        """Run explain() for the queries behind the dashboard endpoints and report their plan stages"""
+        end_time = datetime.now()
+        start_time = end_time - timedelta(minutes=30)
+        if storage_mode == 'bucket':
+            readings = self.db[self.buckets_name]
+            readings_queries = {
+                'readings_latest': readings.find({}).sort('last', DESCENDING).limit(1),
+                'readings_time_range': readings.find({'last': {'$gte': start_time}, 'hour': {'$lte': end_time}}),
+            }
+        else:
+            readings = self.db[self.readings_name]
+            readings_queries = {
+                'readings_latest': readings.find({}).sort('timestamp', DESCENDING).limit(1),
+                'readings_time_range': readings.find({'timestamp': {'$gte': start_time, '$lte': end_time}}),
+            }
+        queries = dict(readings_queries)
+        queries['led_status_history'] = self.db['led_status'].find().sort('timestamp', DESCENDING).limit(10)
+        queries['heating_predictions_recent'] = self.db['heating_predictions'].find().sort('timestamp', DESCENDING).limit(24)
+
+        report = {}
+        for name, cursor in queries.items():
+            plan = cursor.explain().get('queryPlanner', {})
+            stages = _plan_stages(plan.get('winningPlan', plan))
+            report[name] = {
+                'namespace': plan.get('namespace'),
+                'stages': stages,
+                'collection_scan': 'COLLSCAN' in stages
+            }
+        return report
+
+
+def _plan_stages(node):
+    """Flatten every 'stage' found in an explain() plan tree, outermost first"""
+    stages = []
+    if isinstance(node, dict):
+        if 'stage' in node:
+            stages.append(node['stage'])
+        for value in node.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(node, list):
+        for value in node:
+            stages.extend(_plan_stages(value))
+    return stages
@@ -1,7 +1,8 @@
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, fields
 from datetime import datetime
+from operator import attrgetter
 
-@dataclass
+@dataclass(slots=True)
 class SensorData:
     temperature: float
     humidity: float
@@ -11,6 +12,7 @@ class SensorData:
     ac_status: str = "OFF"
     sound_state: int = 0
     person_count: int = 0
+    device_id: str = "default"
     
     # OpenWeather 数据字段
     ow_temperature: float = 0.0
@@ -23,7 +25,28 @@ class SensorData:
     ow_sun_duration: float = 0.0
 
     def to_dict(self):
-        data = asdict(self)
+        data = dict(zip(SENSOR_FIELDS, _get_values(self)))
         if isinstance(data['timestamp'], datetime):
             data['timestamp'] = data['timestamp'].replace(tzinfo=None)
         return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build from a reading dict, ignoring keys that are not SensorData fields (e.g. _id, stats)"""
+        return cls(**{name: data[name] for name in SENSOR_FIELDS if name in data})
+
+
+SENSOR_FIELDS = tuple(field.name for field in fields(SensorData))
+# Fetches every field in one C-level call instead of one getattr per field
+_get_values = attrgetter(*SENSOR_FIELDS)
+
+
+def encode_sensor_data(records):
+    """Many SensorData -> list of BSON/JSON-ready dicts"""
+    encoded = []
+    for record in records:
+        data = dict(zip(SENSOR_FIELDS, _get_values(record)))
+        if isinstance(data['timestamp'], datetime):
+            data['timestamp'] = data['timestamp'].replace(tzinfo=None)
+        encoded.append(data)
+    return encoded
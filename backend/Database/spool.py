@@ -0,0 +1,76 @@
+import sqlite3
+import threading
+import bson
+from bson.codec_options import CodecOptions
+from pymongo import InsertOne, UpdateOne
+
+# Naive datetimes come back naive, like the readings collection's codec options
+_CODEC_OPTIONS = CodecOptions(tz_aware=False)
+
+
+def encode_operation(operation):
+    """pymongo write operation -> BSON bytes; only the operation types Database queues are supported"""
+    # pymongo keeps the operation arguments in these private slots (stable across 3.x and 4.x)
+    if isinstance(operation, InsertOne):
+        doc = {'op': 'insert', 'document': operation._doc}
+    elif isinstance(operation, UpdateOne):
+        doc = {'op': 'update', 'filter': operation._filter, 'update': operation._doc, 'upsert': bool(operation._upsert)}
+    else:
+        raise TypeError(f"Cannot spool {type(operation).__name__}")
+    return bson.encode(doc, codec_options=_CODEC_OPTIONS)
+
+
+def decode_operation(data):
+    doc = bson.decode(data, codec_options=_CODEC_OPTIONS)
+    if doc['op'] == 'insert':
+        return InsertOne(doc['document'])
+    return UpdateOne(doc['filter'], doc['update'], upsert=doc['upsert'])
+
+
+class WriteSpool:
+    """Append-only SQLite spool for writes MongoDB could not take; one fsync per appended batch"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: a committed batch survives a power cut, not only a process crash
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, collection TEXT NOT NULL, operation BLOB NOT NULL)"
+        )
+        self._pending = self._conn.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+        if self._pending:
+            print(f"Write spool {path} holds {self._pending} writes from a previous run")
+
+    def append(self, collection_name, operations):
+        """Persist operations for one collection in a single transaction"""
+        rows = [(collection_name, encode_operation(operation)) for operation in operations]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany("INSERT INTO spool (collection, operation) VALUES (?, ?)", rows)
+            self._pending += len(rows)
+
+    def peek(self, limit):
+        """Oldest spooled writes as [(id, collection name, operation), ...]"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, collection, operation FROM spool ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        return [(row_id, name, decode_operation(data)) for row_id, name, data in rows]
+
+    def remove_through(self, last_id):
+        """Forget every spooled write up to and including last_id once it is in MongoDB"""
+        with self._lock:
+            with self._conn:
+                removed = self._conn.execute("DELETE FROM spool WHERE id <= ?", (last_id,)).rowcount
+            self._pending -= removed
+
+    def __len__(self):
+        return self._pending
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,534 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from Database.led_status import LEDStatus
+from Database.sensor_data import SensorData
+from Database.storage import Storage, LED_STATS_ID, ENERGY_STATS_ID, NUMERIC_READING_FIELDS, ENERGY_GRANULARITIES
+from server.energy_calculator import EnergyCalculator, period_start
+
+_SQL_TYPES = {float: 'REAL', int: 'INTEGER', str: 'TEXT'}
+
+# One column per SensorData field; any other keys of a reading (window_seconds, stats) go to `extra` as JSON
+READING_COLUMNS = [name for name in SensorData.__annotations__ if name != 'timestamp']
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS readings (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    {', '.join(f'{name} {_SQL_TYPES[SensorData.__annotations__[name]]}' for name in READING_COLUMNS)},
+    extra TEXT
+);
+DROP INDEX IF EXISTS readings_timestamp;
+CREATE INDEX IF NOT EXISTS readings_timestamp_device ON readings (timestamp, device_id);
+CREATE INDEX IF NOT EXISTS readings_device_timestamp ON readings (device_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS led_status (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration REAL NOT NULL,
+    device_id TEXT NOT NULL DEFAULT 'default'
+);
+CREATE INDEX IF NOT EXISTS led_status_timestamp ON led_status (timestamp);
+
+CREATE TABLE IF NOT EXISTS energy_consumption (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    duration REAL NOT NULL,
+    energy_kwh REAL NOT NULL,
+    cost REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS energy_consumption_timestamp ON energy_consumption (timestamp);
+
+CREATE TABLE IF NOT EXISTS energy_buckets (
+    granularity TEXT NOT NULL,
+    device_id TEXT NOT NULL,
+    period_start TEXT NOT NULL,
+    on_seconds REAL NOT NULL DEFAULT 0,
+    energy_kwh REAL NOT NULL DEFAULT 0,
+    cost REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularity, device_id, period_start)
+);
+
+-- Materialized LED/energy totals, one row; updated in the transaction of every led_status/energy_consumption insert
+CREATE TABLE IF NOT EXISTS stats (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total_on_time REAL NOT NULL DEFAULT 0,
+    on_count INTEGER NOT NULL DEFAULT 0,
+    total_energy REAL NOT NULL DEFAULT 0,
+    total_cost REAL NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS heating_predictions (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    actual_value REAL NOT NULL DEFAULT 0,
+    document TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS heating_predictions_timestamp ON heating_predictions (timestamp);
+
+CREATE TABLE IF NOT EXISTS readings_hourly (
+    device_id TEXT NOT NULL,
+    hour TEXT NOT NULL,
+    document TEXT NOT NULL,
+    PRIMARY KEY (device_id, hour)
+);
+CREATE INDEX IF NOT EXISTS readings_hourly_hour ON readings_hourly (hour);
+
+CREATE TABLE IF NOT EXISTS aggregates (
+    id INTEGER PRIMARY KEY,
+    window_seconds INTEGER NOT NULL,
+    device_id TEXT NOT NULL,
+    window_start TEXT NOT NULL,
+    document TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS aggregates_window_device_start ON aggregates (window_seconds, device_id, window_start);
+"""
+
+# Milliseconds since 1970-01-01 of a stored timestamp, the same epoch MongoDB uses for naive datetimes
+_EPOCH_MS = "CAST(ROUND((julianday(timestamp) - 2440587.5) * 86400000) AS INTEGER)"
+_EPOCH = datetime(1970, 1, 1)
+# Batch predictions carry a source in their document; live ones do not
+_PREDICTION_SOURCE = "json_extract(document, '$.source')"
+
+_INSERT_READING = (
+    f"INSERT INTO readings (timestamp, {', '.join(READING_COLUMNS)}, extra) "
+    f"VALUES (?, {', '.join('?' for _ in READING_COLUMNS)}, ?)"
+)
+_ENERGY_BUCKET_UPSERT = """
+INSERT INTO energy_buckets (granularity, device_id, period_start, on_seconds, energy_kwh, cost) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (granularity, device_id, period_start) DO UPDATE SET
+    on_seconds = on_seconds + excluded.on_seconds,
+    energy_kwh = energy_kwh + excluded.energy_kwh,
+    cost = cost + excluded.cost
+"""
+
+
+def _ts(timestamp):
+    """Naive datetime -> fixed-width ISO text, so string order is time order"""
+    return timestamp.replace(tzinfo=None).isoformat(timespec='microseconds')
+
+
+def _json_ts(text):
+    # Millisecond precision, like the MongoDB backend's JSON timestamps
+    return text[:23]
+
+
+class SQLiteStorage(Storage):
+    """Single-file storage backend for small sites without a MongoDB server; range and
+    aggregate queries run in-process"""
+
+    def __init__(self, path, energy_calculator=None):
+        self.path = path
+        self.energy_calculator = energy_calculator or EnergyCalculator()
+        # One connection per thread: WAL lets readers run while another thread writes
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._conn().executescript(SCHEMA)
+        if self._conn().execute("SELECT 1 FROM stats").fetchone() is None:
+            # New file, or one written before the totals were materialized
+            self.rebuild_stats()
+        print(f"Using SQLite storage at {path}")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    # Readings
+
+    def _reading_row(self, data):
+        timestamp = data['timestamp']
+        if isinstance(timestamp, datetime):
+            # Millisecond precision like MongoDB dates, so a page cursor taken from the JSON timestamp matches
+            timestamp = _ts(timestamp.replace(microsecond=timestamp.microsecond // 1000 * 1000))
+        extra = {key: value for key, value in data.items() if key not in SensorData.__annotations__ and key != '_id'}
+        return (timestamp, *(data.get(name) for name in READING_COLUMNS),
+                json.dumps(extra, default=str) if extra else None)
+
+    def _reading_document(self, row, raw_timestamps=True):
+        doc = dict(row)
+        doc.pop('id', None)
+        extra = doc.pop('extra', None)
+        if extra:
+            doc.update(json.loads(extra))
+        doc['timestamp'] = datetime.fromisoformat(doc['timestamp']) if raw_timestamps else _json_ts(doc['timestamp'])
+        return doc
+
+    def create(self, data, wait=True):
+        """Insert a new record; local writes are cheap, so wait is ignored"""
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute(_INSERT_READING, self._reading_row(data))
+        return str(cursor.lastrowid)
+
+    def create_many(self, records):
+        """Insert many readings in one transaction"""
+        conn = self._conn()
+        with conn:
+            conn.executemany(_INSERT_READING, [self._reading_row(data) for data in records])
+        return len(records)
+
+    def read_by_id(self, record_id):
+        row = self._conn().execute("SELECT * FROM readings WHERE id = ?", (int(record_id),)).fetchone()
+        return self._reading_document(row) if row else None
+
+    def update(self, record_id, update_data):
+        columns = [name for name in update_data if name in READING_COLUMNS or name == 'timestamp']
+        if not columns:
+            return 0
+        values = [_ts(update_data[name]) if name == 'timestamp' else update_data[name] for name in columns]
+        conn = self._conn()
+        with conn:
+            cursor = conn.execute(
+                f"UPDATE readings SET {', '.join(f'{name} = ?' for name in columns)} WHERE id = ?",
+                (*values, int(record_id))
+            )
+        return cursor.rowcount
+
+    def delete(self, record_id):
+        conn = self._conn()
+        with conn:
+            return conn.execute("DELETE FROM readings WHERE id = ?", (int(record_id),)).rowcount
+
+    def read_all(self):
+        rows = self._conn().execute("SELECT * FROM readings ORDER BY timestamp")
+        return [self._reading_document(row) for row in rows]
+
+    def read_latest(self, as_json=True):
+        """Read the latest record; as_json=False keeps the timestamp as datetime"""
+        try:
+            row = self._conn().execute("SELECT * FROM readings ORDER BY timestamp DESC LIMIT 1").fetchone()
+            if row is None:
+                return None
+            latest_record = self._reading_document(row)
+            if as_json:
+                latest_record['timestamp'] = latest_record['timestamp'].isoformat()
+            return latest_record
+        except Exception as e:
+            print(f"Error reading latest record: {e}")
+            return None
+
+    def iter_by_time_range(self, start_time, end_time, fields=None, after=None, limit=None,
+                           resolution_seconds=None, device_id=None, batch_size=1000, raw_timestamps=False):
+        if isinstance(after, tuple) and resolution_seconds:
+            after = after[0]  # downsampled buckets are unique per timestamp
+        if isinstance(after, tuple):
+            # Keyset cursor in (timestamp, device_id) order; NULL device ids sort first
+            timestamp, cursor_device = after
+            later_device = "device_id IS NOT NULL" if cursor_device is None else "device_id > ?"
+            where = [f"(timestamp > ? OR (timestamp = ? AND {later_device}))", "timestamp <= ?"]
+            params = [_ts(timestamp), _ts(timestamp)] + ([] if cursor_device is None else [cursor_device]) + [_ts(end_time)]
+        else:
+            where = [f"timestamp {'>' if after else '>='} ?", "timestamp <= ?"]
+            params = [_ts(after or start_time), _ts(end_time)]
+        if device_id:
+            where.append("device_id = ?")
+            params.append(device_id)
+        # Field names come from request arguments, only known columns reach the SQL text
+        columns = [name for name in fields if name in READING_COLUMNS] if fields else None
+
+        if resolution_seconds:
+            averaged = [name for name in columns or NUMERIC_READING_FIELDS if name in NUMERIC_READING_FIELDS]
+            sql = (
+                f"SELECT bucket, COUNT(*) AS count{''.join(f', AVG({name}) AS {name}' for name in averaged)} "
+                f"FROM (SELECT *, {_EPOCH_MS} - {_EPOCH_MS} % ? AS bucket FROM readings WHERE {' AND '.join(where)}) "
+                f"GROUP BY bucket ORDER BY bucket"
+            )
+            params.insert(0, int(resolution_seconds * 1000))
+        else:
+            selected = f"timestamp, {', '.join(columns)}" if columns else "*"
+            sql = f"SELECT {selected} FROM readings WHERE {' AND '.join(where)} ORDER BY timestamp, device_id"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        print(f"Executing query: {sql} {params}")
+
+        cursor = self._conn().execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                if resolution_seconds:
+                    doc = dict(row)
+                    bucket = doc.pop('bucket')
+                    doc['timestamp'] = (_EPOCH + timedelta(milliseconds=bucket)).isoformat(timespec='milliseconds')
+                    yield doc
+                elif columns:
+                    doc = dict(row)
+                    doc['timestamp'] = datetime.fromisoformat(doc['timestamp']) if raw_timestamps else _json_ts(doc['timestamp'])
+                    yield doc
+                else:
+                    yield self._reading_document(row, raw_timestamps)
+
+    def update_readings(self, updates):
+        modified = 0
+        conn = self._conn()
+        with conn:
+            for device_id, timestamp, fields in updates:
+                columns = [name for name in fields if name in READING_COLUMNS]
+                if columns:
+                    modified += conn.execute(
+                        f"UPDATE readings SET {', '.join(f'{name} = ?' for name in columns)} "
+                        "WHERE timestamp = ? AND device_id IS ?",
+                        (*(fields[name] for name in columns), _ts(timestamp), device_id)
+                    ).rowcount
+        return modified
+
+    def delete_by_time_range(self, start_time, end_time):
+        conn = self._conn()
+        with conn:
+            return conn.execute(
+                "DELETE FROM readings WHERE timestamp >= ? AND timestamp < ?", (_ts(start_time), _ts(end_time))
+            ).rowcount
+
+    def write_hourly_rollups(self, rollups):
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO readings_hourly (device_id, hour, document) VALUES (?, ?, ?)",
+                [(rollup['device_id'], _ts(rollup['hour']), json.dumps(rollup, default=str)) for rollup in rollups]
+            )
+
+    def iter_hourly_rollups(self, start_time, end_time, device_id=None):
+        sql = "SELECT document FROM readings_hourly WHERE hour >= ? AND hour < ?"
+        params = [_ts(start_time), _ts(end_time)]
+        if device_id:
+            sql += " AND device_id = ?"
+            params.append(device_id)
+        for row in self._conn().execute(sql + " ORDER BY hour", params):
+            rollup = json.loads(row['document'])
+            for key in ('hour', 'first', 'last'):
+                rollup[key] = datetime.fromisoformat(rollup[key])
+            yield rollup
+
+    def create_aggregate(self, aggregate_data):
+        document = {key: value for key, value in aggregate_data.items()
+                    if key not in ('window_seconds', 'device_id', 'window_start')}
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO aggregates (window_seconds, device_id, window_start, document) VALUES (?, ?, ?, ?)",
+                (aggregate_data['window_seconds'], aggregate_data['device_id'], _ts(aggregate_data['window_start']),
+                 json.dumps(document, default=str))
+            )
+        return True
+
+    def explain_hot_queries(self):
+        """EXPLAIN QUERY PLAN for the queries behind the dashboard endpoints, flags full table scans"""
+        end_time = datetime.now()
+        start_time = end_time - timedelta(minutes=30)
+        queries = {
+            'readings_latest': ("SELECT * FROM readings ORDER BY timestamp DESC LIMIT 1", ()),
+            'readings_time_range': ("SELECT * FROM readings WHERE timestamp >= ? AND timestamp <= ? ORDER BY timestamp",
+                                    (_ts(start_time), _ts(end_time))),
+            'led_status_history': ("SELECT * FROM led_status ORDER BY timestamp DESC LIMIT 10", ()),
+            'heating_predictions_recent': ("SELECT * FROM heating_predictions ORDER BY timestamp DESC LIMIT 24", ()),
+        }
+        report = {}
+        for name, (sql, params) in queries.items():
+            stages = [row['detail'] for row in self._conn().execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+            report[name] = {
+                'namespace': f"{self.path}.{sql.split(' FROM ')[1].split()[0]}",
+                'stages': stages,
+                'collection_scan': any(stage.startswith('SCAN') and 'INDEX' not in stage for stage in stages)
+            }
+        return report
+
+    # LED status and energy
+
+    def _insert_led_status(self, conn, status_data):
+        row_id = conn.execute(
+            "INSERT INTO led_status (timestamp, status, duration, device_id) VALUES (?, ?, ?, ?)",
+            (_ts(status_data['timestamp']), status_data['status'], status_data['duration'],
+             status_data.get('device_id', 'default'))
+        ).lastrowid
+        conn.execute("UPDATE stats SET total_on_time = total_on_time + ?, on_count = on_count + ?",
+                     (status_data['duration'], 1 if status_data['status'] == 'ON' else 0))
+        return row_id
+
+    def _insert_energy(self, conn, energy_data):
+        row_id = conn.execute(
+            "INSERT INTO energy_consumption (timestamp, duration, energy_kwh, cost) VALUES (?, ?, ?, ?)",
+            (_ts(energy_data['timestamp']), energy_data['duration'], energy_data['energy_kwh'], energy_data['cost'])
+        ).lastrowid
+        conn.execute("UPDATE stats SET total_energy = total_energy + ?, total_cost = total_cost + ?",
+                     (energy_data['energy_kwh'], energy_data['cost']))
+        return row_id
+
+    def _add_energy_buckets(self, conn, led_status):
+        conn.executemany(_ENERGY_BUCKET_UPSERT, [
+            (granularity, led_status.device_id, _ts(start), seconds, energy_kwh, cost)
+            for (granularity, start), (seconds, energy_kwh, cost) in self._energy_bucket_totals(led_status).items()
+        ])
+
+    def create_led_status(self, status_data):
+        """Insert a new record in the LED status table"""
+        try:
+            conn = self._conn()
+            with conn:
+                row_id = self._insert_led_status(conn, status_data)
+            print(f"Inserted LED status record: {status_data}")
+            return str(row_id)
+        except Exception as e:
+            print(f"Error inserting LED status record: {e}")
+            return None
+
+    def record_led_status(self, led_status):
+        """Store a finished LED interval, its energy record and rollups in one transaction"""
+        try:
+            conn = self._conn()
+            with conn:
+                self._insert_led_status(conn, led_status.to_dict())
+                self._insert_energy(conn, self._energy_document(led_status))
+                self._add_energy_buckets(conn, led_status)
+            return True
+        except Exception as e:
+            print(f"Error recording LED status: {e}")
+            return False
+
+    def get_led_status_history(self, limit=10):
+        """Get recent LED status history"""
+        rows = self._conn().execute(
+            "SELECT timestamp, status, duration, device_id FROM led_status ORDER BY timestamp DESC LIMIT ?", (limit,)
+        )
+        return [LEDStatus(timestamp=datetime.fromisoformat(row['timestamp']), status=row['status'],
+                          duration=row['duration'], device_id=row['device_id']) for row in rows]
+
+    def get_led_stats(self):
+        """Same totals as the MongoDB backend: duration of every record, count of ON records"""
+        return self._read_stats()[LED_STATS_ID]
+
+    def create_energy_consumption(self, energy_data):
+        conn = self._conn()
+        with conn:
+            return str(self._insert_energy(conn, energy_data))
+
+    def update_energy_consumption(self, led_status):
+        conn = self._conn()
+        with conn:
+            self._insert_energy(conn, self._energy_document(led_status))
+            self._add_energy_buckets(conn, led_status)
+
+    def get_energy_stats(self):
+        return self._read_stats()[ENERGY_STATS_ID]
+
+    def _read_stats(self):
+        row = self._conn().execute("SELECT total_on_time, on_count, total_energy, total_cost FROM stats").fetchone()
+        return {
+            LED_STATS_ID: {'total_on_time': row[0], 'on_count': row[1]},
+            ENERGY_STATS_ID: {'total_energy': row[2], 'total_cost': row[3]}
+        }
+
+    def rebuild_stats(self):
+        """Recompute the materialized totals from the raw tables"""
+        conn = self._conn()
+        with conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO stats (id, total_on_time, on_count, total_energy, total_cost)
+                SELECT 1, led.total_on_time, led.on_count, energy.total_energy, energy.total_cost
+                FROM (SELECT COALESCE(SUM(duration), 0) AS total_on_time, COALESCE(SUM(status = 'ON'), 0) AS on_count
+                      FROM led_status) AS led,
+                     (SELECT COALESCE(SUM(energy_kwh), 0) AS total_energy, COALESCE(SUM(cost), 0) AS total_cost
+                      FROM energy_consumption) AS energy
+            """)
+        return self._read_stats()
+
+    def get_energy_rollups(self, granularity, start_time, end_time, device_id='default'):
+        """Energy and cost per period in [start_time, end_time), read from the pre-aggregated buckets"""
+        if granularity not in ENERGY_GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        rows = self._conn().execute(
+            "SELECT period_start, on_seconds, energy_kwh, cost FROM energy_buckets "
+            "WHERE granularity = ? AND device_id = ? AND period_start >= ? AND period_start < ? ORDER BY period_start",
+            (granularity, device_id, _ts(period_start(start_time, granularity)), _ts(end_time))
+        )
+        return [
+            {
+                'period_start': datetime.fromisoformat(row['period_start']).isoformat(),
+                'on_seconds': row['on_seconds'],
+                'energy_kwh': row['energy_kwh'],
+                'cost': row['cost']
+            }
+            for row in rows
+        ]
+
+    # Heating predictions
+
+    def create_heating_prediction(self, prediction_data):
+        """存储供暖预测记录，包含实际值字段"""
+        try:
+            timestamp = prediction_data['timestamp']
+            # 添加 actual_value 字段，默认值为 0
+            prediction_data['actual_value'] = 0
+            document = {key: value for key, value in prediction_data.items() if key not in ('timestamp', 'actual_value')}
+            conn = self._conn()
+            with conn:
+                row_id = conn.execute(
+                    "INSERT INTO heating_predictions (timestamp, actual_value, document) VALUES (?, 0, ?)",
+                    (_ts(timestamp), json.dumps(document, default=str))
+                ).lastrowid
+            print(f"Inserted heating prediction record: {prediction_data}")
+            return str(row_id)
+        except Exception as e:
+            print(f"Error inserting heating prediction record: {e}")
+            return None
+
+    def create_heating_predictions(self, predictions):
+        rows = [
+            (_ts(prediction['timestamp']),
+             json.dumps({key: value for key, value in prediction.items() if key not in ('timestamp', 'actual_value')},
+                        default=str))
+            for prediction in predictions
+        ]
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                f"DELETE FROM heating_predictions WHERE timestamp = ? AND {_PREDICTION_SOURCE} = ?",
+                [(_ts(prediction['timestamp']), prediction['source']) for prediction in predictions]
+            )
+            conn.executemany("INSERT INTO heating_predictions (timestamp, actual_value, document) VALUES (?, 0, ?)", rows)
+        print(f"Stored {len(rows)} heating prediction records")
+        return len(rows)
+
+    def update_prediction_actual_value(self, timestamp, actual_value):
+        """更新预测记录的实际值"""
+        try:
+            conn = self._conn()
+            with conn:
+                return conn.execute(
+                    "UPDATE heating_predictions SET actual_value = ? WHERE id = "
+                    f"(SELECT id FROM heating_predictions WHERE timestamp <= ? AND {_PREDICTION_SOURCE} IS NULL "
+                    "ORDER BY timestamp DESC LIMIT 1)",
+                    (actual_value, _ts(timestamp))
+                ).rowcount
+        except Exception as e:
+            print(f"Error updating actual value: {e}")
+            return 0
+
+    def iter_recent_predictions(self, limit=24):
+        rows = self._conn().execute(
+            f"SELECT timestamp, actual_value, document FROM heating_predictions WHERE {_PREDICTION_SOURCE} IS NULL "
+            "ORDER BY timestamp DESC LIMIT ?", (limit,)
+        )
+        for row in rows:
+            prediction = json.loads(row['document'])
+            prediction['timestamp'] = datetime.fromisoformat(row['timestamp'])
+            prediction['actual_value'] = row['actual_value']
+            yield prediction
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
@@ -0,0 +1,221 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from Database.sensor_data import SensorData
+from server.energy_calculator import period_start
+
+# Storage backends open_storage() can create:
+#   mongo  - Database (db_operation.py), a MongoDB server
+#   sqlite - SQLiteStorage (sqlite_storage.py), one local file, no server
+STORAGE_BACKENDS = ('mongo', 'sqlite')
+
+# Keys of the LED and energy totals returned by rebuild_stats()
+LED_STATS_ID = 'led_status'
+ENERGY_STATS_ID = 'energy_consumption'
+
+# Fields averaged when history is downsampled
+NUMERIC_READING_FIELDS = [name for name, field_type in SensorData.__annotations__.items() if field_type in (int, float)]
+
+# Energy rollup periods kept per device
+ENERGY_GRANULARITIES = ('hour', 'day', 'month')
+
+
+class Storage(ABC):
+    """Operations the backend needs from a store of readings, LED intervals, energy and predictions"""
+
+    energy_calculator = None
+
+    # Readings
+
+    @abstractmethod
+    def create(self, data, wait=True):
+        """Insert one reading; with wait=False the backend may queue it"""
+
+    @abstractmethod
+    def read_by_id(self, record_id):
+        """Read a reading by ID"""
+
+    @abstractmethod
+    def update(self, record_id, update_data):
+        """Set fields on a reading by ID, returns the number of modified readings"""
+
+    @abstractmethod
+    def delete(self, record_id):
+        """Delete a reading by ID, returns the number of deleted readings"""
+
+    @abstractmethod
+    def read_all(self):
+        """Every reading, timestamps as datetime"""
+
+    @abstractmethod
+    def read_latest(self, as_json=True):
+        """The newest reading; as_json=False keeps the timestamp as datetime"""
+
+    @abstractmethod
+    def iter_by_time_range(self, start_time, end_time, fields=None, after=None, limit=None,
+                           resolution_seconds=None, device_id=None, batch_size=1000, raw_timestamps=False):
+        """
+        Iterate readings within a time range, oldest first (ties on timestamp ordered by device_id).
+        fields: only return these fields (plus timestamp)
+        after: keyset cursor, only records after it in the returned order; (timestamp, device_id) of the
+               last raw record of the previous page, or the timestamp of its last downsampled bucket
+        limit: page size
+        resolution_seconds: average numeric fields per bucket of this many seconds
+        batch_size: records fetched per round trip while iterating
+        raw_timestamps: keep timestamps as datetime instead of JSON-ready strings (raw reads only)
+        """
+
+    def read_by_time_range(self, start_time, end_time, **options):
+        """Read records within a time range, oldest first (see iter_by_time_range for options)"""
+        records = list(self.iter_by_time_range(start_time, end_time, **options))
+        print(f"Found {len(records)} records")  # Add this log
+        return records
+
+    def check_readings_rewritable(self, operation):
+        """Raise RuntimeError if update_readings/delete_by_time_range cannot work on this store"""
+
+    @abstractmethod
+    def update_readings(self, updates):
+        """Batch-patch readings: updates is [(device_id, timestamp, {field: value}), ...], device_id None for
+        readings stored without one; returns the number of readings modified"""
+
+    @abstractmethod
+    def delete_by_time_range(self, start_time, end_time):
+        """Delete readings with start_time <= timestamp < end_time, returns how many"""
+
+    @abstractmethod
+    def write_hourly_rollups(self, rollups):
+        """Insert or replace hourly rollup documents, keyed by (device_id, hour)"""
+
+    @abstractmethod
+    def iter_hourly_rollups(self, start_time, end_time, device_id=None):
+        """Hourly rollups with start_time <= hour < end_time, oldest first"""
+
+    @abstractmethod
+    def create_aggregate(self, aggregate_data):
+        """Store a closed window aggregate (see server.aggregator)"""
+
+    @abstractmethod
+    def explain_hot_queries(self):
+        """Query plans for the dashboard's hot queries, flags full scans"""
+
+    # LED status and energy
+
+    @abstractmethod
+    def create_led_status(self, status_data):
+        """Insert one LED status record"""
+
+    @abstractmethod
+    def record_led_status(self, led_status):
+        """Store a finished LED interval with its energy record and rollups"""
+
+    @abstractmethod
+    def get_led_status_history(self, limit=10):
+        """Most recent LED intervals as LEDStatus, newest first"""
+
+    @abstractmethod
+    def get_led_stats(self):
+        """{'total_on_time', 'on_count'}"""
+
+    @abstractmethod
+    def create_energy_consumption(self, energy_data):
+        """Insert one energy consumption record"""
+
+    @abstractmethod
+    def update_energy_consumption(self, led_status):
+        """Store the energy record and rollups of one LED interval"""
+
+    @abstractmethod
+    def get_energy_stats(self):
+        """{'total_energy', 'total_cost'}"""
+
+    @abstractmethod
+    def rebuild_stats(self):
+        """Recompute the LED and energy totals from the raw records"""
+
+    @abstractmethod
+    def get_energy_rollups(self, granularity, start_time, end_time, device_id='default'):
+        """Energy and cost per hour/day/month period in [start_time, end_time)"""
+
+    def _energy_document(self, led_status):
+        """Energy record of one closed LED interval; same tariff and per-device wattage as the buckets"""
+        energy_kwh = cost = 0.0
+        if led_status.status == 'ON':
+            usage = self.energy_calculator.hourly_usage(led_status.timestamp, led_status.duration, led_status.device_id)
+            for _, _, hour_kwh, hour_cost in usage:
+                energy_kwh += hour_kwh
+                cost += hour_cost
+        return {
+            'timestamp': led_status.timestamp,
+            'device_id': led_status.device_id,
+            'duration': led_status.duration,
+            'energy_kwh': energy_kwh,
+            'cost': cost
+        }
+
+    def _energy_bucket_totals(self, led_status):
+        """{(granularity, period_start): [on_seconds, energy_kwh, cost]} added by one closed LED interval"""
+        if led_status.status != 'ON':
+            # The LED draws nothing while off
+            return {}
+        totals = {}
+        usage = self.energy_calculator.hourly_usage(led_status.timestamp, led_status.duration, led_status.device_id)
+        for hour_start, seconds, energy_kwh, cost in usage:
+            for granularity in ENERGY_GRANULARITIES:
+                key = (granularity, period_start(hour_start, granularity))
+                total = totals.setdefault(key, [0.0, 0.0, 0.0])
+                total[0] += seconds
+                total[1] += energy_kwh
+                total[2] += cost
+        return totals
+
+    # Heating predictions
+
+    @abstractmethod
+    def create_heating_prediction(self, prediction_data):
+        """存储供暖预测记录，包含实际值字段"""
+
+    @abstractmethod
+    def create_heating_predictions(self, predictions):
+        """Store batch prediction records, replacing earlier ones with the same (timestamp, source);
+        actual_value starts at 0. Rows with a source are left out of update_prediction_actual_value
+        and iter_recent_predictions, which only see live predictions. Returns how many were stored"""
+
+    @abstractmethod
+    def update_prediction_actual_value(self, timestamp, actual_value):
+        """更新最接近给定时间戳的预测记录的实际值"""
+
+    @abstractmethod
+    def iter_recent_predictions(self, limit=24):
+        """Most recent predictions, newest first; timestamps stay datetime for the JSON encoder"""
+
+    def get_recent_predictions(self, limit=24):
+        """获取最近的预测记录，包含实际值"""
+        try:
+            predictions = list(self.iter_recent_predictions(limit))
+            # 转换时间戳为 ISO 格式字符串
+            for pred in predictions:
+                if isinstance(pred.get('timestamp'), datetime):
+                    pred['timestamp'] = pred['timestamp'].isoformat()
+            return predictions
+        except Exception as e:
+            print(f"Error getting recent predictions: {e}")
+            return []
+
+    def write_stats(self):
+        """Counters of the backend's write path, if it queues writes"""
+        return {}
+
+    @abstractmethod
+    def close(self):
+        """Flush pending writes and release the backend's resources"""
+
+
+def open_storage(backend, energy_calculator=None, **options):
+    """Create the storage backend named in STORAGE_BACKENDS; options go to its constructor"""
+    if backend == 'mongo':
+        from Database.db_operation import Database
+        return Database(energy_calculator=energy_calculator, **options)
+    if backend == 'sqlite':
+        from Database.sqlite_storage import SQLiteStorage
+        return SQLiteStorage(energy_calculator=energy_calculator, **options)
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,82 @@
+# Per-call latency of feature building and one-row prediction, DataFrame path vs FeatureBuilder rows.
+# From the backend directory: python -m Models.benchmark_features [--number 2000]
+import argparse
+import os
+import timeit
+from datetime import datetime
+import holidays
+import joblib
+import pandas as pd
+from Models.features import FEATURE_COLUMNS, FeatureBuilder
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'SVR', 'svr_15min_heating.pkl')
+
+SAMPLE = {
+    'timestamp': datetime(2024, 3, 20, 14, 30),
+    'temperature': 22.5,
+    'ow_temperature': 18.3,
+    'ow_humidity': 65,
+    'ow_dewpoint': 12.1,
+    'ow_sun_duration': 45,
+    'ow_precipitation': 0.0,
+    'ow_wind_speed': 3.5,
+    'ow_wind_direction': 180,
+    'person_count': 3
+}
+
+
+def dataframe_features(data, de_holidays):
+    """The previous _prepare_features: a feature dict per call, wrapped in a one-row DataFrame"""
+    timestamp = data['timestamp']
+    features = {
+        'is_holiday': 1 if timestamp.date() in de_holidays else 0,
+        'day_of_week': timestamp.weekday() + 1,
+        'hour_of_day': timestamp.hour,
+        'is_working_hour': 1 if 9 <= timestamp.hour < 17 else 0,
+        'number_of_people': data['person_count'],
+        'Temperature': data['ow_temperature'],
+        'Humidity': data['ow_humidity'],
+        'Dewpoint': data['ow_dewpoint'],
+        'Sun Duration': data['ow_sun_duration'],
+        'Precipitation Height': data['ow_precipitation'],
+        'Wind Speed': data['ow_wind_speed'],
+        'Wind Direction': data['ow_wind_direction'],
+        'indoor_temperature': data['temperature'],
+        'temperature_difference': data['temperature'] - data['ow_temperature']
+    }
+    return pd.DataFrame([features])[FEATURE_COLUMNS]
+
+
+def per_call_us(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark heating prediction feature building")
+    parser.add_argument('--number', type=int, default=2000, help="Calls per timing run")
+    args = parser.parse_args()
+
+    model = joblib.load(MODEL_PATH)
+    de_holidays = holidays.DE()
+    builder = FeatureBuilder(de_holidays)
+
+    def old_predict():
+        features = dataframe_features(SAMPLE, de_holidays)
+        model.predict(features)
+        return features.to_dict(orient='records')[0]
+
+    def new_predict():
+        row = builder.row(SAMPLE)
+        model.predict(row)
+        return builder.named(row)
+
+    assert old_predict() == new_predict()
+    results = {
+        'features dataframe': per_call_us(lambda: dataframe_features(SAMPLE, de_holidays), args.number),
+        'features row': per_call_us(lambda: builder.row(SAMPLE), args.number),
+        'predict dataframe': per_call_us(old_predict, args.number),
+        'predict row': per_call_us(new_predict, args.number),
+    }
+    for name, us in results.items():
+        print(f"{name:>20}: {us:8.1f} us/call")
+    print(f"Prediction speedup: {results['predict dataframe'] / results['predict row']:.1f}x")
@@ -0,0 +1,112 @@
+# features.py builds the SVR heating model's input rows straight into NumPy, without a DataFrame per call.
+
+import threading
+import warnings
+from datetime import datetime
+import numpy as np
+
+# Column order the model was fitted with (model.feature_names_in_)
+FEATURE_COLUMNS = [
+    'is_holiday', 'day_of_week', 'hour_of_day', 'is_working_hour',
+    'number_of_people', 'Temperature', 'Humidity', 'Dewpoint',
+    'Sun Duration', 'Precipitation Height', 'Wind Speed', 'Wind Direction',
+    'indoor_temperature', 'temperature_difference'
+]
+
+# Features that are integers, kept as int (rounded, for averaged slots) in the named feature dict
+INT_FEATURES = {'is_holiday', 'day_of_week', 'hour_of_day', 'is_working_hour', 'number_of_people'}
+
+# Readings fields copied into the row as-is, by column position
+_READING_COLUMNS = [
+    (FEATURE_COLUMNS.index(column), field) for column, field in (
+        ('number_of_people', 'person_count'),
+        ('Temperature', 'ow_temperature'),
+        ('Humidity', 'ow_humidity'),
+        ('Dewpoint', 'ow_dewpoint'),
+        ('Sun Duration', 'ow_sun_duration'),
+        ('Precipitation Height', 'ow_precipitation'),
+        ('Wind Speed', 'ow_wind_speed'),
+        ('Wind Direction', 'ow_wind_direction'),
+        ('indoor_temperature', 'temperature'),
+    )
+]
+
+# Readings fields the features are computed from
+READING_FIELDS = ['temperature'] + [field for _, field in _READING_COLUMNS if field != 'temperature']
+
+# 工作时间（9:00-17:00），按小时预先算好
+WORKING_HOURS = tuple(1 if 9 <= hour < 17 else 0 for hour in range(24))
+
+
+def ignore_feature_names_warning():
+    """The model gets plain rows in FEATURE_COLUMNS order (checked against model.feature_names_in_ at load);
+    one process-wide filter for just this sklearn warning, as warnings.catch_warnings() per call is not thread-safe"""
+    warnings.filterwarnings('ignore', message='X does not have valid feature names', category=UserWarning,
+                            module='sklearn')
+
+
+ignore_feature_names_warning()
+
+
+def parse_timestamp(timestamp):
+    """Readings timestamp as datetime; downsampled rows carry ISO strings"""
+    if isinstance(timestamp, str):
+        return datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    return timestamp
+
+
+class FeatureBuilder:
+    """Fills model rows in FEATURE_COLUMNS order; holiday and weekday are looked up once per date"""
+
+    def __init__(self, holiday_calendar):
+        self.holiday_calendar = holiday_calendar
+        self._days = {}  # date -> (is_holiday, day_of_week)
+        self._local = threading.local()  # one preallocated row per request thread
+
+    def _day(self, date):
+        day = self._days.get(date)
+        if day is None:
+            day = self._days[date] = (1 if date in self.holiday_calendar else 0, date.weekday() + 1)
+        return day
+
+    def fill(self, data, out):
+        """Write the features of one readings record into the 1-D array out"""
+        timestamp = parse_timestamp(data['timestamp'])
+        out[0], out[1] = self._day(timestamp.date())
+        out[2] = timestamp.hour
+        out[3] = WORKING_HOURS[timestamp.hour]
+        for i, field in _READING_COLUMNS:
+            out[i] = data[field]
+        # 室内外温差
+        out[13] = data['temperature'] - data['ow_temperature']
+        return out
+
+    def row(self, data):
+        """One-row (1, n_features) matrix for model.predict; the thread's next call reuses it, copy it to keep it"""
+        row = getattr(self._local, 'row', None)
+        if row is None:
+            row = self._local.row = np.empty((1, len(FEATURE_COLUMNS)), dtype=np.float64)
+        self.fill(data, row[0])
+        return row
+
+    def matrix(self, records):
+        """(len(records), n_features) matrix built column by column; missing values become NaN"""
+        out = np.empty((len(records), len(FEATURE_COLUMNS)), dtype=np.float64)
+        if not records:
+            return out
+        timestamps = [parse_timestamp(record['timestamp']) for record in records]
+        out[:, 0:2] = [self._day(timestamp.date()) for timestamp in timestamps]
+        hours = np.array([timestamp.hour for timestamp in timestamps])
+        out[:, 2] = hours
+        out[:, 3] = np.take(WORKING_HOURS, hours)
+        for i, field in _READING_COLUMNS:
+            out[:, i] = np.array([record.get(field) for record in records], dtype=np.float64)
+        # 室内外温差
+        out[:, 13] = out[:, 12] - out[:, 5]
+        return out
+
+    @staticmethod
+    def named(row):
+        """{feature name: value} of one row, as stored with a prediction"""
+        return {name: round(value) if name in INT_FEATURES else value
+                for name, value in zip(FEATURE_COLUMNS, np.ravel(row).tolist())}
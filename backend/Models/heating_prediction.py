@@ -1,23 +1,28 @@
 import joblib
 import holidays
-from datetime import datetime
+from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
-from pymongo import MongoClient
 import os
+import threading
 from Database.db_operation import Database
+from Models.features import FEATURE_COLUMNS, READING_FIELDS, FeatureBuilder, parse_timestamp
 
 class HeatingPrediction:
     def __init__(self, model_path=None, 
                  uri="mongodb://localhost:27017/", 
                  db_name="sensor_data", 
-                 collection_name="readings"):
+                 collection_name="readings",
+                 db=None,
+                 slot_seconds=900):
         """
         初始化预测类
         model_path: SVR模型文件路径
         uri: MongoDB连接URI
         db_name: 数据库名称
         collection_name: 集合名称
+        db: 已有的 Database 实例，传入时复用它而不再新建
+        slot_seconds: 预测缓存的时段长度（模型按15分钟训练）
         """
         if model_path is None:
             # 获取当前文件所在目录
@@ -29,105 +34,136 @@ class HeatingPrediction:
             self.model = joblib.load(model_path)
         except Exception as e:
             raise Exception(f"无法加载模型文件 {model_path}: {str(e)}")
+        fitted_columns = getattr(self.model, 'feature_names_in_', None)
+        if fitted_columns is not None and list(fitted_columns) != FEATURE_COLUMNS:
+            raise Exception(f"模型特征列与 FEATURE_COLUMNS 不一致: {list(fitted_columns)}")
             
         self.de_holidays = holidays.DE()  # 德国节假日
+        self.features = FeatureBuilder(self.de_holidays)
+
+        # 当前时段的预测缓存: (slot_start, prediction_result)
+        self.slot = timedelta(seconds=slot_seconds)
+        self._cache_lock = threading.Lock()
+        self._cached = None
+        self.cache_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
         
         # 连接MongoDB
-        self.db = Database(uri, db_name, collection_name)
+        self._owns_db = db is None
+        self.db = db if db is not None else Database(uri, db_name, collection_name)
 
     def _get_latest_data(self):
         """获取MongoDB中最新的一条数据"""
-        return self.db.collection.find_one(sort=[('timestamp', -1)])
-
-    def _is_working_hour(self, hour):
-        """判断是否是工作时间（9:00-17:00）"""
-        return 9 <= hour < 17
+        return self.db.read_latest(as_json=False)
 
     def _prepare_features(self, data):
-        """准备模型所需的特征"""
-        timestamp = data['timestamp']
-        if isinstance(timestamp, str):
-            timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-
-        # 计算时间相关特征
-        is_holiday = timestamp.date() in self.de_holidays
-        day_of_week = timestamp.weekday() + 1
-        hour_of_day = timestamp.hour
-        is_working_hour = self._is_working_hour(hour_of_day)
-
-        # 计算室内外温差
-        indoor_temp = data['temperature']
-        outdoor_temp = data['ow_temperature']
-        temp_difference = indoor_temp - outdoor_temp
-
-        # 创建特征字典
-        features = {
-            'is_holiday': 1 if is_holiday else 0,
-            'day_of_week': day_of_week,
-            'hour_of_day': hour_of_day,
-            'is_working_hour': 1 if is_working_hour else 0,
-            'number_of_people': data['person_count'],
-            'Temperature': data['ow_temperature'],
-            'Humidity': data['ow_humidity'],
-            'Dewpoint': data['ow_dewpoint'],
-            'Sun Duration': data['ow_sun_duration'],
-            'Precipitation Height': data['ow_precipitation'],
-            'Wind Speed': data['ow_wind_speed'],
-            'Wind Direction': data['ow_wind_direction'],
-            'indoor_temperature': indoor_temp,
-            'temperature_difference': temp_difference
-        }
+        """准备模型所需的特征（DataFrame，列顺序与模型一致）"""
+        return pd.DataFrame(self.features.row(data).copy(), columns=FEATURE_COLUMNS)
 
-        # 转换为DataFrame并确保列顺序正确
-        feature_df = pd.DataFrame([features])
-        expected_columns = [
-            'is_holiday', 'day_of_week', 'hour_of_day', 'is_working_hour',
-            'number_of_people', 'Temperature', 'Humidity', 'Dewpoint',
-            'Sun Duration', 'Precipitation Height', 'Wind Speed', 'Wind Direction',
-            'indoor_temperature', 'temperature_difference'
-        ]
-        return feature_df[expected_columns]
+    def _slot_start(self, when):
+        return datetime.min + (when - datetime.min) // self.slot * self.slot
 
-    def predict(self):
+    def predict(self, latest_data=None):
         """
         获取最新数据并进行预测，同时存储预测结果
-        返回：预测的能源消耗值
+        latest_data: 最新一条 readings 记录（例如来自 state_cache），不传时从数据库读取
+        返回：预测的能源消耗值；同一15分钟时段内返回缓存结果，不再写库（模型按15分钟聚合，每分钟的新记录不触发重新预测）
         """
         try:
             # 获取最新数据
-            latest_data = self._get_latest_data()
+            if latest_data is None:
+                latest_data = self._get_latest_data()
             if not latest_data:
                 raise ValueError("Unable to get latest data")
 
-            # 准备特征
-            features = self._prepare_features(latest_data)
-
-            # 进行预测
-            prediction = self.model.predict(features)
-            
-            current_time = datetime.now()
-            
-            # 准备预测结果数据
-            prediction_result = {
-                'prediction': float(prediction[0]),
-                'timestamp': current_time,
-                'features_used': features.to_dict(orient='records')[0]
-            }
-
-            # 存储预测结果
-            self.db.create_heating_prediction({
-                'timestamp': current_time,
-                'prediction_value': prediction_result['prediction'],
-                'input_features': prediction_result['features_used']
-                # actual_value 将由 create_heating_prediction 方法自动添加
-            })
-
-            return prediction_result
+            key = self._slot_start(datetime.now())
+            # Held while predicting, so concurrent requests for a new slot store one prediction
+            with self._cache_lock:
+                if self._cached is not None and self._cached[0] == key:
+                    self.cache_stats['hits'] += 1
+                    return self._cached[1]
+                self.cache_stats['misses'] += 1
+                prediction_result = self._predict_and_store(latest_data)
+                self._cached = (key, prediction_result)
+                return prediction_result
 
         except Exception as e:
             print(f"Error during prediction: {str(e)}")
             return None
 
+    def invalidate_cache(self):
+        """丢弃缓存的预测（例如更换模型后），下次请求重新预测"""
+        with self._cache_lock:
+            if self._cached is not None:
+                self._cached = None
+                self.cache_stats['invalidations'] += 1
+
+    def _predict_and_store(self, latest_data):
+        """预测一条记录并存储结果"""
+        # 准备特征
+        features = self.features.row(latest_data)
+
+        # 进行预测
+        prediction = self.model.predict(features)
+        
+        current_time = datetime.now()
+        
+        # 准备预测结果数据
+        prediction_result = {
+            'prediction': float(prediction[0]),
+            'timestamp': current_time,
+            'features_used': self.features.named(features)
+        }
+
+        # 存储预测结果
+        self.db.create_heating_prediction({
+            'timestamp': current_time,
+            'prediction_value': prediction_result['prediction'],
+            'input_features': prediction_result['features_used']
+            # actual_value 将由 create_heating_prediction 方法自动添加
+        })
+
+        return prediction_result
+
+    def predict_batch(self, records, store=False, source='batch'):
+        """
+        一次性预测多条记录（一次 model.predict 调用）
+        records: readings 记录（原始或降采样后的），每条预测的 timestamp 取自记录本身
+        store: 为 True 时按 (timestamp, source) 写入 heating_predictions，重复运行覆盖旧结果；
+               带 source 的记录不参与实际值更新和预测历史
+        返回：预测记录列表；缺少特征值的记录被跳过
+        """
+        records = list(records)
+        matrix = self.features.matrix(records)
+        complete = ~np.isnan(matrix).any(axis=1)
+        if not complete.all():
+            print(f"Skipping {int((~complete).sum())} records with missing features")
+            matrix = matrix[complete]
+            records = [record for record, ok in zip(records, complete) if ok]
+        if not records:
+            return []
+
+        values = self.model.predict(matrix).tolist()
+        predicted_at = datetime.now()
+        predictions = [
+            {
+                'timestamp': parse_timestamp(record['timestamp']),
+                'source': source,
+                'prediction_value': value,
+                'input_features': self.features.named(row),
+                'predicted_at': predicted_at
+            }
+            for record, value, row in zip(records, values, matrix)
+        ]
+        if store:
+            self.db.create_heating_predictions(predictions)
+        return predictions
+
+    def predict_range(self, start_time, end_time, slot_seconds=900, device_id=None, store=False):
+        """按 slot_seconds（默认15分钟，与模型训练粒度一致）降采样后预测整个时间范围，记录标记为 source='range'"""
+        slots = self.db.iter_by_time_range(start_time, end_time, fields=READING_FIELDS,
+                                           resolution_seconds=slot_seconds, device_id=device_id)
+        return self.predict_batch(slots, store=store, source='range')
+
     def update_actual_value(self, timestamp, actual_value):
         """更新指定时间戳预测记录的实际值"""
         return self.db.update_prediction_actual_value(timestamp, actual_value)
@@ -136,6 +172,11 @@ class HeatingPrediction:
         """获取预测历史记录"""
         return self.db.get_recent_predictions(limit)
 
+    def iter_prediction_history(self, limit=24):
+        """逐条返回预测历史记录（时间戳保持 datetime，用于流式输出）"""
+        return self.db.iter_recent_predictions(limit)
+
     def close(self):
-        """关闭数据库连接"""
-        self.db.client.close()
\ No newline at end of file
+        """关闭数据库连接（共享的 Database 由创建者关闭）"""
+        if self._owns_db:
+            self.db.close()
\ No newline at end of file
@@ -1,20 +1,31 @@
 import signal
 import sys
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response, stream_with_context
 from flask_socketio import SocketIO
 from flask_cors import CORS
 from concurrent.futures import ThreadPoolExecutor
-from queue import Queue
 from threading import Event, Lock
-from Database.db_operation import Database
+from Database.storage import open_storage
+from Database import client_registry
+from server.energy_calculator import EnergyCalculator, TariffSchedule
 from server.dth111 import DTH111
+from server.multi_port import MultiPortIngest, SerialDevice
+from server.ring_buffer import RingBuffer, LatestValue
+from server.aggregator import WindowAggregator
+from server.json_stream import stream_json_array
+from server.state_cache import StateCache
+from server.timeseries_store import RecentReadingsStore
+from server.retention import RetentionJob
+from server.request_args import format_cursor, parse_client_time, parse_cursor, parse_resolution
+from server.heating_api import heating_range_blueprint
+from Database.export import EXPORT_FORMATS, iter_export_chunks
 from yolo.video_detection import VideoDetection
 from yolo.video_stream import VideoStream
 from Database.sensor_data import SensorData
+from Database.led_status import encode_led_statuses
 from open_weather.weather import OpenWeather
 import time
 from datetime import datetime, timedelta
-import queue
 from Agents.led_agent import LEDAgent
 import asyncio
 import uuid
@@ -23,26 +34,70 @@ import traceback
 from Models.heating_prediction import HeatingPrediction
 
 app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "*"}},supports_credentials=True)
+CORS(app, resources={r"/*": {"origins": "*"}},supports_credentials=True, expose_headers=["X-Next-Cursor", "ETag"])
 socketio = SocketIO(app, cors_allowed_origins="*")
 
-data_queue = Queue()
+# Readings from the serial boards; bounded so a stalled database thread cannot grow memory
+data_queue = RingBuffer(capacity=4096)
+# Latest person count from the video loop, merged into the aggregate by database_thread
+occupancy = LatestValue(0)
+
+# Window sizes (seconds) aggregated incrementally; the READINGS_WINDOW_SECONDS window feeds the
+# readings collection and LED control, the others are stored in the aggregates collection.
+AGGREGATION_WINDOWS = (10, 60, 900)
+READINGS_WINDOW_SECONDS = 60
+AGGREGATION_POLL_SECONDS = 1
+aggregator = WindowAggregator(window_sizes=AGGREGATION_WINDOWS)
 stop_event = Event()
 lock = Lock()
 
-executor = ThreadPoolExecutor(max_workers=3)
-
-# Initialize the database
-db = Database(uri="mongodb://localhost:27017/", db_name="sensor_data", collection_name="readings")
-dth111 = DTH111(data_queue=data_queue, lock=lock, db=db)
-open_weather = OpenWeather('fa3005c77c9d4631ef729307d175661f', 'Darmstadt')
+executor = ThreadPoolExecutor(max_workers=4)
+
+# Initialize the database; every component borrows the one pooled client from client_registry
+MONGO_URI = "mongodb://localhost:27017/"
+client_registry.configure(maxPoolSize=20, serverSelectionTimeoutMS=5000, readPreference='primaryPreferred')
+# LED wattage per board and the electricity tariff used for the energy buckets, e.g.
+# TariffSchedule([(0, 6, 0.3), (22, 24, 0.3)], default_price=0.5) for a cheaper night rate
+energy_calculator = EnergyCalculator(led_power_watts=10, tariff=TariffSchedule(default_price=0.5), device_watts={})
+# Writes MongoDB cannot take (down or slower than the latency budget) wait here and are replayed on recovery
+WRITE_SPOOL_PATH = "write_spool.db"
+# "mongo" needs a MongoDB server; "sqlite" keeps everything in one local file for single-room installs
+STORAGE_BACKEND = "mongo"
+STORAGE_OPTIONS = {
+    'mongo': dict(uri=MONGO_URI, db_name="sensor_data", collection_name="readings", spool_path=WRITE_SPOOL_PATH),
+    'sqlite': dict(path="sensor_data.db"),
+}
+db = open_storage(STORAGE_BACKEND, energy_calculator=energy_calculator, **STORAGE_OPTIONS[STORAGE_BACKEND])
+# Current readings/LED state written by the ingest and aggregation paths, read by the status endpoints
+state_cache = StateCache()
+# Extra boards read concurrently by one asyncio loop, e.g. SerialDevice('room-2', '/dev/ttyACM1').
+# When set, the listed ports replace the single-port DTH111 reader; DTH111 keeps its port for LED commands.
+SERIAL_DEVICES = []
+# device_id of the board on DTH111's port: its readings drive the realtime state, LED automation,
+# latest_reading and the heating prediction cache. With SERIAL_DEVICES set it must be one of their ids.
+PRIMARY_DEVICE_ID = "default"
+if SERIAL_DEVICES and PRIMARY_DEVICE_ID not in {device.device_id for device in SERIAL_DEVICES}:
+    raise ValueError(f"PRIMARY_DEVICE_ID {PRIMARY_DEVICE_ID!r} is not one of SERIAL_DEVICES, set it to the board on DTH111's port")
+dth111 = DTH111(data_queue=data_queue, lock=lock, db=db, device_id=PRIMARY_DEVICE_ID, state_cache=state_cache)
+# Last day of readings rows for the primary board (one per READINGS_WINDOW_SECONDS), answers recent /data/history in memory
+RECENT_READINGS_CAPACITY = 24 * 3600 // READINGS_WINDOW_SECONDS
+recent_readings = RecentReadingsStore(capacity=RECENT_READINGS_CAPACITY)
+# Raw readings older than RETENTION_DAYS are folded into hourly rollups (readings_hourly) and deleted;
+# with RETENTION_ARCHIVE_DIR set, they are first written there as gzip JSON lines
+RETENTION_DAYS = 30
+RETENTION_ARCHIVE_DIR = None
+retention_job = RetentionJob(db, raw_days=RETENTION_DAYS, archive_dir=RETENTION_ARCHIVE_DIR)
+
+multi_port_ingest = MultiPortIngest(SERIAL_DEVICES, on_reading=dth111.accept_reading) if SERIAL_DEVICES else None
+# Conditions change about every 10 minutes: cache that long, serve up to an hour stale while refreshing
+open_weather = OpenWeather('fa3005c77c9d4631ef729307d175661f', 'Darmstadt', ttl=600, max_stale=3600)
 video_detection = VideoDetection(model_path='yolo/weights/yolov8n.pt')
-video_stream = VideoStream(socketio, video_detection, data_queue, stop_event, lock)
+video_stream = VideoStream(socketio, video_detection, occupancy, stop_event)
 
 led_agent = LEDAgent()
 
 # Initialize HeatingPrediction
-heating_predictor = HeatingPrediction()
+heating_predictor = HeatingPrediction(db=db)
 
 def load_sensor_data():
     # Sensor data thread
@@ -54,69 +109,83 @@ def database_thread():
     print("Starting database thread")
     while not stop_event.is_set():
         try:
-            time.sleep(60)
-            data_points = []
-            try:
-                while True:
-                    data_point = data_queue.get_nowait()
-                    if isinstance(data_point, dict):
-                        # Remove fields not defined in SensorData
-                        data_point = {k: v for k, v in data_point.items() if k in SensorData.__annotations__}
-                        data_points.append(SensorData(**data_point))
-                    elif isinstance(data_point, SensorData):
-                        data_points.append(data_point)
-                    else:
-                        print(f"Unexpected data type in queue: {type(data_point)}")
-            except queue.Empty:
-                pass
-
-            if data_points:
-                print(f"Processing {len(data_points)} data points")
-                avg_temperature = sum(dp.temperature for dp in data_points) / len(data_points)
-                avg_humidity = sum(dp.humidity for dp in data_points) / len(data_points)
-                avg_light = sum(dp.light for dp in data_points) / len(data_points)
-                timestamp = datetime.now()
-
-                if not lock.acquire(timeout=5):
-                    print("Unable to acquire lock, skipping this data processing")
+            stop_event.wait(AGGREGATION_POLL_SECONDS)
+            for data_point in data_queue.drain():
+                if isinstance(data_point, dict):
+                    data_point = SensorData.from_dict(data_point)
+                elif not isinstance(data_point, SensorData):
+                    print(f"Unexpected data type in queue: {type(data_point)}")
                     continue
+                aggregator.add(data_point)
 
+            for window in aggregator.collect():
+                # collect() already removed every closed window: a failure must only lose its own
                 try:
-                    dth111.control_led(avg_light)
-                finally:
-                    lock.release()
-
-                avg_data_point = SensorData(
-                    timestamp=timestamp,
-                    temperature=avg_temperature,
-                    humidity=avg_humidity,
-                    light=avg_light,
-                    light_status=dth111.led_status,
-                    ac_status=dth111.ac_status,
-                    sound_state=data_points[-1].sound_state,
-                    person_count=data_points[-1].person_count
-                )
-
-                weather_data = open_weather.get_weather_data()
-                avg_data_point.ow_temperature = weather_data['ow_temperature']
-                avg_data_point.ow_humidity = weather_data['ow_humidity']
-                avg_data_point.ow_weather_desc = weather_data['ow_weather_desc']
-                avg_data_point.ow_dewpoint = weather_data['ow_dewpoint']
-                avg_data_point.ow_wind_speed = weather_data['ow_wind_speed']
-                avg_data_point.ow_wind_direction = weather_data['ow_wind_direction']
-                avg_data_point.ow_precipitation = weather_data['ow_precipitation']
-                avg_data_point.ow_sun_duration = weather_data['ow_sun_duration']
-
-                print(f"Inserting data into database: {avg_data_point.to_dict()}")
-                db.create(avg_data_point.to_dict())
-                print("Data inserted successfully")
-            else:
-                print("No data points to process")
+                    if window.window_seconds == READINGS_WINDOW_SECONDS:
+                        store_reading_window(window)
+                    else:
+                        db.create_aggregate(window.to_dict())
+                except Exception as e:
+                    print(f"Error storing {window.window_seconds}s window of {window.device_id}: {e}")
         except Exception as e:
             print(f"Error in database thread: {e}")
             import traceback
             traceback.print_exc()
 
+def store_reading_window(window):
+    """Turn a closed READINGS_WINDOW_SECONDS window into the readings row the rest of the app expects"""
+    print(f"Processing {window.count} data points for {window.device_id}")
+    avg_light = window.mean('light')
+    last = window.last
+
+    if window.device_id == dth111.device_id:
+        if not lock.acquire(timeout=5):
+            print("Unable to acquire lock, skipping this data processing")
+            return
+
+        try:
+            dth111.control_led(avg_light)
+        finally:
+            lock.release()
+        light_status, ac_status = dth111.led_status, dth111.ac_status
+    else:
+        light_status, ac_status = last.light_status, last.ac_status
+
+    avg_data_point = SensorData(
+        timestamp=datetime.fromtimestamp(window.end),
+        temperature=window.mean('temperature'),
+        humidity=window.mean('humidity'),
+        light=avg_light,
+        light_status=light_status,
+        ac_status=ac_status,
+        sound_state=last.sound_state,
+        person_count=occupancy.get(),
+        device_id=window.device_id
+    )
+
+    # Cached weather only; the first window after start-up keeps the zero defaults while the cache fills
+    weather_data = open_weather.get_cached_weather_data()
+    if weather_data:
+        avg_data_point.ow_temperature = weather_data['ow_temperature']
+        avg_data_point.ow_humidity = weather_data['ow_humidity']
+        avg_data_point.ow_weather_desc = weather_data['ow_weather_desc']
+        avg_data_point.ow_dewpoint = weather_data['ow_dewpoint']
+        avg_data_point.ow_wind_speed = weather_data['ow_wind_speed']
+        avg_data_point.ow_wind_direction = weather_data['ow_wind_direction']
+        avg_data_point.ow_precipitation = weather_data['ow_precipitation']
+        avg_data_point.ow_sun_duration = weather_data['ow_sun_duration']
+
+    record = avg_data_point.to_dict()
+    # Keep the full window statistics next to the means
+    record['window_seconds'] = window.window_seconds
+    record['stats'] = window.stats_dict()
+    print(f"Inserting data into database: {record}")
+    db.create(record, wait=False)
+    if window.device_id == dth111.device_id:
+        state_cache.set('latest_reading', record)
+        recent_readings.append(record)
+    print("Data queued for insertion")
+
 def video_frames_thread():
     # Video stream processing thread
     print("Starting video frames thread")
@@ -130,12 +199,21 @@ def video_frames_thread():
 # Start YOLO detection
 video_detection.start_detection()
 
+def cached_response(etag, build):
+    """jsonify(build()) with an ETag (from state_cache.etag); answers 304 when the client already has this version"""
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status=304, headers={'ETag': etag})
+    response = jsonify(build())
+    response.headers['ETag'] = etag
+    return response
+
 @app.route('/data/ac_state', methods=['GET'])
 def get_current_data():
     try:
-        latest_data_point = db.read_latest()
+        # Served from memory; MongoDB is only read once on a cold start
+        latest_data_point, version = state_cache.get_or_load('latest_reading', lambda: db.read_latest(as_json=False))
         if latest_data_point:
-            return jsonify({
+            return cached_response(state_cache.etag("ac", version), lambda: {
                 'ac_state': latest_data_point.get('ac_state', False),
                 'window_state': latest_data_point.get('window_state', False)
             })
@@ -147,10 +225,10 @@ def get_current_data():
 @app.route('/data/realtime', methods=['GET'])
 def get_realtime_data():
     try:
-        data = dth111.latest_data
-        print(f"Realtime data: {data}")
+        data, version = state_cache.get('realtime')
         if data:
-            return jsonify({
+            person_count = occupancy.get()
+            return cached_response(state_cache.etag("realtime", version, person_count), lambda: {
                 'temperature': data.temperature,
                 'humidity': data.humidity,
                 'light': data.light,
@@ -158,7 +236,7 @@ def get_realtime_data():
                 'light_status': data.light_status,
                 'ac_status': data.ac_status,
                 'sound_state': data.sound_state,
-                'person_count': data.person_count,
+                'person_count': person_count,
                 'ow_temperature': data.ow_temperature,
                 'ow_humidity': data.ow_humidity,
                 'ow_weather_desc': data.ow_weather_desc,
@@ -174,18 +252,104 @@ def get_realtime_data():
         print(f"Error in get_realtime_data: {e}")
         return jsonify({'error': str(e)}), 500
 
+HISTORY_MAX_LIMIT = 10000
+
 @app.route('/data/history', methods=['GET'])
 def get_data_history():
-    end_time = datetime.now()
-    start_time = end_time - timedelta(minutes=30)
-    
+    # /data/history?start_time=...&end_time=...&fields=light,temperature&resolution=5m&limit=500&after=...
+    try:
+        end_time = parse_client_time(request.args['end_time']) if 'end_time' in request.args else datetime.now()
+        start_time = parse_client_time(request.args['start_time']) if 'start_time' in request.args else end_time - timedelta(minutes=30)
+        after = parse_cursor(request.args['after']) if 'after' in request.args else None
+        fields = [f for f in request.args.get('fields', '').split(',') if f] or None
+        limit = min(int(request.args.get('limit', HISTORY_MAX_LIMIT)), HISTORY_MAX_LIMIT)
+        resolution = parse_resolution(request.args['resolution']) if 'resolution' in request.args else None
+        if resolution is None and 'max_points' in request.args:
+            max_points = int(request.args['max_points'])
+            if max_points < 1:
+                raise ValueError("max_points must be at least 1")
+            # Let the server pick the coarsest resolution that keeps the response under max_points
+            span = (end_time - start_time).total_seconds()
+            resolution = max(span / max_points, 1)
+        if resolution is not None and resolution < 0.001:
+            raise ValueError("resolution must be at least 1ms")
+    except (ValueError, KeyError) as e:
+        return jsonify({'error': f'Invalid query parameter: {e}'}), 400
+
     print(f"Querying data from {start_time} to {end_time}")
-    data = db.read_by_time_range(start_time, end_time)
-    return jsonify(data)
+    paged = 'limit' in request.args or 'after' in request.args
+    if paged and fields and not resolution and 'device_id' not in fields:
+        fields.append('device_id')  # the next-page cursor needs the device id of the last reading
+    query = dict(fields=fields, resolution_seconds=resolution, device_id=request.args.get('device_id'))
+    if serve_from_memory(start_time, query['device_id']):
+        data = recent_readings.query(start_time, end_time, fields=fields, resolution_seconds=resolution,
+                                     after=after, limit=limit if paged else None)
+        return history_response(data, limit if paged else None, resolution, dth111.device_id)
+    if not paged:
+        # Unpaged: stream straight from the cursor so memory stays flat however long the range is
+        records = db.iter_by_time_range(start_time, end_time, **query)
+        return Response(stream_with_context(stream_json_array(records)), mimetype='application/json')
+
+    data = db.read_by_time_range(start_time, end_time, after=after, limit=limit, **query)
+    return history_response(data, limit, resolution)
+
+def serve_from_memory(start_time, device_id):
+    """Recent ranges for the primary board are answered from recent_readings without a DB round trip"""
+    if device_id is None and SERIAL_DEVICES:
+        return False  # an unfiltered query would have to include the other boards
+    if device_id not in (None, dth111.device_id):
+        return False
+    return recent_readings.covers(start_time)
+
+def history_response(data, limit, resolution, device_id=None):
+    response = jsonify(data)
+    if limit and data and len(data) == limit:
+        # Full page: pass this back as ?after= to get the next one
+        last = data[-1]
+        next_cursor = parse_client_time(last['timestamp'])
+        if resolution:
+            next_cursor += timedelta(seconds=resolution) - timedelta(milliseconds=1)
+        # Raw readings of several boards can share a timestamp, so their cursor also carries the device id
+        response.headers['X-Next-Cursor'] = format_cursor(next_cursor, last.get('device_id', device_id),
+                                                          compound=not resolution)
+    return response
+
+@app.route('/data/export', methods=['GET'])
+def export_data():
+    # /data/export?format=parquet|arrow|csv&start_time=...&end_time=...
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unknown export format: {fmt}'}), 400
+    try:
+        end_time = parse_client_time(request.args['end_time']) if 'end_time' in request.args else datetime.now()
+        start_time = parse_client_time(request.args['start_time']) if 'start_time' in request.args else end_time - timedelta(days=1)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query parameter: {e}'}), 400
+
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    filename = f"readings_{start_time:%Y%m%d%H%M}_{end_time:%Y%m%d%H%M}.{extension}"
+    chunks = iter_export_chunks(db, start_time, end_time, fmt, device_id=request.args.get('device_id'))
+    return Response(stream_with_context(chunks), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
 
 @app.route('/data/led_status', methods=['GET'])
 def get_led_status():
-    return jsonify({'led_status': dth111.led_status})
+    led_status, version = state_cache.get('led_status')
+    return cached_response(state_cache.etag("led", version), lambda: {'led_status': led_status})
+
+@app.route('/data/ingest_stats', methods=['GET'])
+def get_ingest_stats():
+    stats = multi_port_ingest.get_stats() if multi_port_ingest else dth111.get_ingest_stats()
+    stats['write_behind'] = db.write_stats()
+    return jsonify(stats)
+
+@app.route('/data/db/explain', methods=['GET'])
+def get_query_plans():
+    try:
+        return jsonify(db.explain_hot_queries())
+    except Exception as e:
+        logging.error(f"Error explaining queries: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/data/led_stats', methods=['GET'])
 def get_led_stats():
@@ -199,8 +363,9 @@ def get_led_stats():
 @app.route('/data/led_history', methods=['GET'])
 def get_led_history():
     history = db.get_led_status_history()
-    print(f"LED history: {[status.to_dict() for status in history]}")  # Add this log
-    return jsonify([status.to_dict() for status in history])
+    records = encode_led_statuses(history)
+    print(f"LED history: {records}")  # Add this log
+    return jsonify(records)
 
 @app.route('/data/led_analysis', methods=['GET'])
 def get_led_analysis():
@@ -257,6 +422,33 @@ def get_energy_stats():
     stats = db.get_energy_stats()
     return jsonify(stats)
 
+@app.route('/data/energy/rollup', methods=['GET'])
+def get_energy_rollup():
+    # e.g. /data/energy/rollup?granularity=day&days=90
+    try:
+        granularity = request.args.get('granularity', 'day')
+        days = int(request.args.get('days', 90))
+        device_id = request.args.get('device_id', dth111.device_id)
+        end_time = datetime.now()
+        start_time = end_time - timedelta(days=days)
+        return jsonify(db.get_energy_rollups(granularity, start_time, end_time, device_id))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error getting energy rollup: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/data/history/hourly', methods=['GET'])
+def get_hourly_history():
+    # Hourly rollups, the only history left for ranges older than RETENTION_DAYS
+    try:
+        end_time = parse_client_time(request.args['end_time']) if 'end_time' in request.args else datetime.now()
+        start_time = parse_client_time(request.args['start_time']) if 'start_time' in request.args else end_time - timedelta(days=RETENTION_DAYS * 2)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query parameter: {e}'}), 400
+    rollups = db.iter_hourly_rollups(start_time, end_time, device_id=request.args.get('device_id'))
+    return Response(stream_with_context(stream_json_array(rollups)), mimetype='application/json')
+
 @app.route('/data/weather', methods=['GET'])
 def get_weather_data():
     try:
@@ -266,18 +458,24 @@ def get_weather_data():
         logging.error(f"Error getting weather data: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+# 供暖成本估算（每千瓦时0.3欧元）
+HEATING_COST_PER_KWH = 0.3
+
+# Longest range /data/heating-prediction/range scores in one request
+PREDICTION_RANGE_MAX_DAYS = 92
+
 @app.route('/data/heating-prediction', methods=['GET'])
 def get_heating_prediction():
     try:
-        # 获取当前预测
-        prediction_result = heating_predictor.predict()
+        # 获取当前预测（同一时段内重复请求直接返回缓存结果）
+        latest_data, _ = state_cache.get_or_load('latest_reading', lambda: db.read_latest(as_json=False))
+        prediction_result = heating_predictor.predict(latest_data)
         if not prediction_result:
             return jsonify({'error': 'Unable to generate prediction'}), 500
 
-        # 计算估算成本 (假设每千瓦时0.3欧元)
-        COST_PER_KWH = 0.3
+        # 计算估算成本
         estimated_usage = prediction_result['prediction']
-        estimated_cost = estimated_usage * COST_PER_KWH
+        estimated_cost = estimated_usage * HEATING_COST_PER_KWH
 
         # 根据预测值生成节能建议
         tips = []
@@ -317,11 +515,14 @@ def get_heating_prediction():
         print(f"Error getting heating prediction: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+app.register_blueprint(heating_range_blueprint(heating_predictor, HEATING_COST_PER_KWH, PREDICTION_RANGE_MAX_DAYS))
+
 @app.route('/data/heating-history', methods=['GET'])
 def get_heating_history():
     try:
-        history = heating_predictor.get_prediction_history()
-        return jsonify(history)
+        limit = int(request.args.get('limit', 24))
+        history = heating_predictor.iter_prediction_history(limit)
+        return Response(stream_with_context(stream_json_array(history)), mimetype='application/json')
     except Exception as e:
         print(f"Error getting heating history: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -329,11 +530,16 @@ def get_heating_history():
 def signal_handler(sig, frame):
     print('Terminating...')
     stop_event.set()
+    if multi_port_ingest:
+        multi_port_ingest.stop()
     video_detection.stop_detection()
     if "executor" in globals():
         executor.shutdown(wait=True)
     dth111.close()
+    open_weather.close()
     heating_predictor.close()  # 关闭预测器连接
+    db.close()  # 写出缓冲中的数据
+    client_registry.close_all()
     sys.exit(0)
 
 signal.signal(signal.SIGINT, signal_handler)
@@ -355,18 +561,27 @@ if __name__ == '__main__':
             print("Unable to initialize serial, program exiting")
             sys.exit(1)
 
+        open_weather.get_cached_weather_data()  # start filling the weather cache in the background
         video_detection.start_detection()
-        executor.submit(load_sensor_data)
+        if multi_port_ingest:
+            executor.submit(multi_port_ingest.run)
+        else:
+            executor.submit(load_sensor_data)
         executor.submit(database_thread)
         executor.submit(video_frames_thread)
+        executor.submit(retention_job.run, stop_event)
 
         socketio.run(app, debug=True, host='0.0.0.0', port=5000,use_reloader=False)
     except Exception as e:
         print(f"Error occurred during program execution: {e}")
     finally:
         stop_event.set()
+        if multi_port_ingest:
+            multi_port_ingest.stop()
         dth111.close()
         if "executor" in globals():
             executor.shutdown(wait=True)
         video_detection.stop_detection()
+        db.close()
+        client_registry.close_all()
         logging.info("Program execution completed")
\ No newline at end of file
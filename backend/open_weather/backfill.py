@@ -0,0 +1,167 @@
+# backend/open_weather/backfill.py
+# Fill in the ow_* fields of readings stored while the weather API was unreachable, from historical
+# observations in a local file or a local stand-in weather service. CLI (from the backend directory):
+#   python -m open_weather.backfill --start 2024-01-01 --end 2024-04-01 --file darmstadt_2024.json
+#   python -m open_weather.backfill --start 2024-01-01 --end 2024-04-01 --url http://localhost:8080/history
+import argparse
+import json
+from datetime import datetime
+import numpy as np
+import requests
+
+# Fields written by the backfill, in the order OpenWeather.get_weather_data returns them
+WEATHER_FIELDS = ('ow_temperature', 'ow_humidity', 'ow_weather_desc', 'ow_dewpoint', 'ow_wind_speed',
+                  'ow_wind_direction', 'ow_precipitation', 'ow_sun_duration')
+
+
+def load_observations(path):
+    """Observations from a JSON array or JSON-lines file, each shaped like an OpenWeather
+    current-weather or history-bulk record ('dt', 'main', 'wind', 'weather', optional 'rain'/'sys')"""
+    with open(path, encoding='utf-8') as f:
+        text = f.read().strip()
+    if text.startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def fetch_observations(url, start_time, end_time, timeout=(3.05, 30)):
+    """Observations in [start_time, end_time] from a local service answering GET url?start=<unix>&end=<unix>"""
+    response = requests.get(url, params={'start': int(start_time.timestamp()), 'end': int(end_time.timestamp())},
+                            timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def observation_arrays(observations, lat=None, lon=None):
+    """Column arrays sorted by observation time; sunrise/sunset are computed from lat/lon when missing"""
+    observations = sorted(observations, key=lambda obs: obs['dt'])
+    columns = {
+        'dt': np.array([obs['dt'] for obs in observations], dtype=np.float64),
+        'temp': np.array([obs['main']['temp'] for obs in observations], dtype=np.float64),
+        'humidity': np.array([obs['main']['humidity'] for obs in observations], dtype=np.float64),
+        'wind_speed': np.array([obs.get('wind', {}).get('speed', 0) for obs in observations], dtype=np.float64),
+        'wind_deg': np.array([obs.get('wind', {}).get('deg', 0) for obs in observations], dtype=np.float64),
+        'rain': np.array([obs.get('rain', {}).get('1h', 0) for obs in observations], dtype=np.float64),
+        'desc': np.array([obs['weather'][0]['description'] if obs.get('weather') else '' for obs in observations],
+                         dtype=object),
+    }
+    if observations and all('sunrise' in obs.get('sys', {}) for obs in observations):
+        columns['sunrise'] = np.array([obs['sys']['sunrise'] for obs in observations], dtype=np.float64)
+        columns['sunset'] = np.array([obs['sys']['sunset'] for obs in observations], dtype=np.float64)
+    elif lat is not None and lon is not None:
+        columns['sunrise'], columns['sunset'] = solar_times(columns['dt'], lat, lon)
+    else:
+        raise ValueError("Observations have no sys.sunrise/sunset, pass lat and lon to compute them")
+    return columns
+
+
+def dewpoint(temperature, humidity):
+    """Magnus formula over arrays, same constants as OpenWeather._calculate_dewpoint"""
+    a = 17.27
+    b = 237.7
+    alpha = (a * temperature) / (b + temperature) + np.log(humidity / 100.0)
+    return (b * alpha) / (a - alpha)
+
+
+def sun_minutes(hour_start, sunrise, sunset):
+    """Minutes of [hour_start, hour_start + 1h) between sunrise and sunset (0-60), all unix seconds"""
+    overlap = np.minimum(hour_start + 3600, sunset) - np.maximum(hour_start, sunrise)
+    return np.round(np.clip(overlap / 60, 0.0, 60.0), 2)
+
+
+def solar_times(dt, lat, lon):
+    """Approximate sunrise/sunset (unix seconds) of the UTC day of each dt, to within a few minutes"""
+    day_start = np.floor(dt / 86400) * 86400
+    day_of_year = ((day_start / 86400 + 4) % 365.2425) + 1  # 1970-01-01 was day 1
+    declination = np.radians(23.44) * np.sin(2 * np.pi * (284 + day_of_year) / 365)
+    b = 2 * np.pi * (day_of_year - 81) / 364
+    equation_of_time = 9.87 * np.sin(2 * b) - 7.53 * np.cos(b) - 1.5 * np.sin(b)  # minutes
+    cos_hour_angle = np.clip(-np.tan(np.radians(lat)) * np.tan(declination), -1.0, 1.0)
+    half_day = np.degrees(np.arccos(cos_hour_angle)) / 15 * 3600
+    solar_noon = day_start + (12 - lon / 15) * 3600 - equation_of_time * 60
+    return solar_noon - half_day, solar_noon + half_day
+
+
+def backfill(db, observations, start_time, end_time, lat=None, lon=None, max_gap=7200, device_id=None,
+             dry_run=False):
+    """Patch readings in [start_time, end_time] whose weather was never filled in (ow_temperature and
+    ow_humidity both 0) from the latest observation at most max_gap seconds older than the reading.
+    Readings whose timestamp is still a string (see migration 0001) are skipped and counted as 'legacy'."""
+    if not dry_run:
+        # Fail before reading anything when the store cannot rewrite readings (time-series before 7.0)
+        db.check_readings_rewritable('Weather backfill')
+    obs = observation_arrays(observations, lat, lon)
+    readings = list(db.iter_by_time_range(start_time, end_time, fields=['device_id', 'ow_temperature', 'ow_humidity'],
+                                          device_id=device_id, raw_timestamps=True))
+    dated = [r for r in readings if isinstance(r['timestamp'], datetime)]
+    report = {'readings': len(readings), 'legacy': len(readings) - len(dated), 'missing': 0, 'matched': 0,
+              'modified': 0}
+    readings = dated
+    if not readings or not len(obs['dt']):
+        return report
+
+    ow_temperature = np.array([r.get('ow_temperature') or 0 for r in readings], dtype=np.float64)
+    ow_humidity = np.array([r.get('ow_humidity') or 0 for r in readings], dtype=np.float64)
+    missing = np.flatnonzero((ow_temperature == 0) & (ow_humidity == 0))
+    report['missing'] = len(missing)
+    # Readings are naive local time, like datetime.fromtimestamp() in the live path
+    when = np.array([readings[i]['timestamp'].timestamp() for i in missing], dtype=np.float64)
+    # Local hour of each reading, the hour the live path measures sunshine over
+    hour_start = np.array([readings[i]['timestamp'].replace(minute=0, second=0, microsecond=0).timestamp()
+                           for i in missing], dtype=np.float64)
+
+    idx = np.searchsorted(obs['dt'], when, side='right') - 1
+    usable = idx >= 0
+    usable[usable] &= when[usable] - obs['dt'][idx[usable]] <= max_gap
+    missing, hour_start, idx = missing[usable], hour_start[usable], idx[usable]
+    report['matched'] = len(missing)
+
+    temp = obs['temp'][idx]
+    humidity = obs['humidity'][idx]
+    values = {
+        'ow_temperature': temp,
+        'ow_humidity': humidity,
+        'ow_weather_desc': obs['desc'][idx],
+        'ow_dewpoint': np.round(dewpoint(temp, humidity), 2),
+        'ow_wind_speed': obs['wind_speed'][idx],
+        'ow_wind_direction': obs['wind_deg'][idx],
+        'ow_precipitation': obs['rain'][idx],
+        'ow_sun_duration': sun_minutes(hour_start, obs['sunrise'][idx], obs['sunset'][idx]),
+    }
+    columns = {field: values[field].tolist() for field in WEATHER_FIELDS}
+    updates = [
+        (readings[i].get('device_id'), readings[i]['timestamp'], {field: columns[field][n] for field in WEATHER_FIELDS})
+        for n, i in enumerate(missing.tolist())
+    ]
+    if updates and not dry_run:
+        report['modified'] = db.update_readings(updates)
+    return report
+
+
+if __name__ == "__main__":
+    from Database.db_operation import Database
+    from Database import client_registry
+
+    parser = argparse.ArgumentParser(description="Backfill OpenWeather fields of readings from historical observations")
+    parser.add_argument('--start', required=True, type=datetime.fromisoformat, help="ISO start time (local)")
+    parser.add_argument('--end', required=True, type=datetime.fromisoformat, help="ISO end time (local)")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--file', help="JSON or JSON-lines observations")
+    source.add_argument('--url', help="Local weather service returning observations for ?start=&end=")
+    parser.add_argument('--lat', type=float, help="Latitude, when observations carry no sunrise/sunset")
+    parser.add_argument('--lon', type=float, help="Longitude, when observations carry no sunrise/sunset")
+    parser.add_argument('--max-gap', type=float, default=7200, help="Max seconds between observation and reading")
+    parser.add_argument('--device-id', default=None)
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    observations = load_observations(args.file) if args.file else fetch_observations(args.url, args.start, args.end)
+    db = Database(uri="mongodb://localhost:27017/", db_name="sensor_data", collection_name="readings")
+    started = datetime.now()
+    try:
+        report = backfill(db, observations, args.start, args.end, args.lat, args.lon, args.max_gap,
+                          args.device_id, args.dry_run)
+    finally:
+        db.close()
+        client_registry.close_all()
+    print(f"Backfill {report} in {(datetime.now() - started).total_seconds():.1f}s")
@@ -1,42 +1,141 @@
 # backend/open_weather/weather.py
 import requests
+from requests.adapters import HTTPAdapter
 import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import time
 
+API_URL = "http://api.openweathermap.org/data/2.5/weather"
+
 class OpenWeather:
-    def __init__(self, api_key, city):
+    def __init__(self, api_key, city, ttl=600, max_stale=3600, timeout=(3.05, 10), session=None, retry_after=60):
+        """
+        ttl: 缓存多少秒内视为新鲜（OpenWeather 约 10 分钟更新一次）
+        max_stale: 过期但不超过这个秒数的数据仍可返回，同时在后台刷新
+        timeout: requests 的 (连接, 读取) 超时
+        retry_after: 请求失败后，这么多秒内不再发起后台刷新
+        """
         self.api_key = api_key
         self.city = city
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.timeout = timeout
+        self.retry_after = retry_after
+        if session is None:
+            # One pooled keep-alive connection is plenty for a few cities
+            session = requests.Session()
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session = session
+        self._cache = {}  # city -> (monotonic fetch time, raw API response)
+        self._inflight = {}  # city -> Future of the fetch every caller for that city waits on
+        self._failed_at = {}  # city -> monotonic time of the last failed fetch, cleared by a successful one
+        self._lock = threading.Lock()  # guards the dicts above and stats
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='weather-refresh')
+        self.stats = {'fetches': 0, 'errors': 0, 'hits': 0, 'stale_hits': 0}
 
-    def get_weather_data(self):
-        url = f"http://api.openweathermap.org/data/2.5/weather?q={self.city}&appid={self.api_key}&units=metric"
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            
-            temp = data["main"]["temp"]
-            humidity = data["main"]["humidity"]
-            dewpoint = self._calculate_dewpoint(temp, humidity)
-            
-            # 计算当前小时的日照时长
-            sun_duration = self._calculate_sun_duration(
-                data["sys"]["sunrise"],
-                data["sys"]["sunset"]
+    def get_weather_data(self, city=None):
+        """Weather for city (default self.city); waits for a fetch only when there is no usable cached data"""
+        city = city or self.city
+        raw = self._cached(city)
+        if raw is None:
+            # Cold or expired cache: share the fetch with any concurrent caller for this city
+            raw = self._fetch_shared(city).result()
+        return self._to_weather_data(raw)
+
+    def get_cached_weather_data(self, city=None):
+        """Never blocks on HTTP: cached weather (refreshed in the background when stale), None while nothing is cached"""
+        city = city or self.city
+        raw = self._cached(city)
+        if raw is None:
+            self._refresh(city)
+            return None
+        return self._to_weather_data(raw)
+
+    def _cached(self, city):
+        with self._lock:
+            entry = self._cache.get(city)
+            if entry is None:
+                return None
+            age = time.monotonic() - entry[0]
+            if age < self.ttl:
+                self.stats['hits'] += 1
+                return entry[1]
+            if age >= self.ttl + self.max_stale:
+                return None
+            self.stats['stale_hits'] += 1
+        # Stale-while-revalidate: answer now, refresh for the next caller
+        self._refresh(city)
+        return entry[1]
+
+    def _refresh(self, city):
+        """Background fetch, unless the last fetch for city failed less than retry_after seconds ago"""
+        with self._lock:
+            failed_at = self._failed_at.get(city)
+            if failed_at is not None and time.monotonic() - failed_at < self.retry_after:
+                return None
+        return self._fetch_shared(city)
+
+    def _fetch_shared(self, city):
+        with self._lock:
+            future = self._inflight.get(city)
+            if future is None:
+                future = self._refresher.submit(self._fetch, city)
+                self._inflight[city] = future
+            return future
+
+    def _fetch(self, city):
+        try:
+            with self._lock:
+                self.stats['fetches'] += 1
+            response = self.session.get(
+                API_URL,
+                params={'q': city, 'appid': self.api_key, 'units': 'metric'},
+                timeout=self.timeout
             )
-            
-            return {
-                "ow_temperature": temp,
-                "ow_humidity": humidity,
-                "ow_weather_desc": data["weather"][0]["description"],
-                "ow_dewpoint": round(dewpoint, 2),
-                "ow_wind_speed": data["wind"]["speed"],  # 米/秒
-                "ow_wind_direction": data["wind"].get("deg", 0),  # 角度
-                "ow_precipitation": data.get("rain", {}).get("1h", 0),  # 最近1小时降水量(mm)
-                "ow_sun_duration": sun_duration  # 当前小时的日照分钟数（0-60）
-            }
-        else:
             response.raise_for_status()
+            data = response.json()
+            with self._lock:
+                self._cache[city] = (time.monotonic(), data)
+                self._failed_at.pop(city, None)
+            return data
+        except Exception as e:
+            with self._lock:
+                self.stats['errors'] += 1
+                self._failed_at[city] = time.monotonic()
+            print(f"Error fetching weather for {city}: {e}")
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(city, None)
+
+    def _to_weather_data(self, data):
+        temp = data["main"]["temp"]
+        humidity = data["main"]["humidity"]
+        dewpoint = self._calculate_dewpoint(temp, humidity)
+
+        # 计算当前小时的日照时长（每次读取时按当前时间计算，缓存的是原始响应）
+        sun_duration = self._calculate_sun_duration(
+            data["sys"]["sunrise"],
+            data["sys"]["sunset"]
+        )
+
+        return {
+            "ow_temperature": temp,
+            "ow_humidity": humidity,
+            "ow_weather_desc": data["weather"][0]["description"],
+            "ow_dewpoint": round(dewpoint, 2),
+            "ow_wind_speed": data["wind"]["speed"],  # 米/秒
+            "ow_wind_direction": data["wind"].get("deg", 0),  # 角度
+            "ow_precipitation": data.get("rain", {}).get("1h", 0),  # 最近1小时降水量(mm)
+            "ow_sun_duration": sun_duration  # 当前小时的日照分钟数（0-60）
+        }
+
+    def close(self):
+        self._refresher.shutdown(wait=False)
+        self.session.close()
 
     def _calculate_dewpoint(self, temperature, humidity):
         """
@@ -0,0 +1,135 @@
+# aggregator.py incremental, fixed-memory windowed statistics over the sensor readings.
+
+import math
+from datetime import datetime
+
+DEFAULT_FIELDS = ('temperature', 'humidity', 'light')
+
+
+class FieldStats:
+    """Running count/sum/min/max/variance for one field (Welford's algorithm)"""
+
+    __slots__ = ('count', 'sum', 'min', 'max', 'mean', '_m2')
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        """Population variance of the values seen so far"""
+        return self._m2 / self.count if self.count else 0.0
+
+    def to_dict(self):
+        if not self.count:
+            return {'count': 0, 'sum': 0.0, 'mean': None, 'min': None, 'max': None, 'variance': None, 'std': None}
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.mean,
+            'min': self.min,
+            'max': self.max,
+            'variance': self.variance,
+            'std': math.sqrt(self.variance)
+        }
+
+
+class WindowAggregate:
+    """One tumbling window for one device; holds a FieldStats per field and the newest reading"""
+
+    __slots__ = ('window_seconds', 'device_id', 'start', 'end', 'count', 'stats', 'last')
+
+    def __init__(self, window_seconds, device_id, start, fields):
+        self.window_seconds = window_seconds
+        self.device_id = device_id
+        self.start = start
+        self.end = start + window_seconds
+        self.count = 0
+        self.stats = {field: FieldStats() for field in fields}
+        self.last = None
+
+    def add(self, reading):
+        self.count += 1
+        for field, stats in self.stats.items():
+            value = getattr(reading, field)
+            if value is not None:
+                stats.add(value)
+        self.last = reading
+
+    def mean(self, field):
+        return self.stats[field].mean
+
+    def to_dict(self):
+        return {
+            'window_seconds': self.window_seconds,
+            'device_id': self.device_id,
+            'window_start': datetime.fromtimestamp(self.start),
+            'window_end': datetime.fromtimestamp(self.end),
+            'count': self.count,
+            'stats': self.stats_dict()
+        }
+
+    def stats_dict(self):
+        return {field: stats.to_dict() for field, stats in self.stats.items()}
+
+
+class WindowAggregator:
+    """Feeds every reading into one open window per (window size, device) and emits them as they close"""
+
+    def __init__(self, window_sizes=(10, 60, 900), fields=DEFAULT_FIELDS):
+        self.window_sizes = tuple(window_sizes)
+        self.fields = tuple(fields)
+        self._open = {}
+        self._emitted = {}  # (size, device) -> end of the last window handed out
+        self._closed = []
+        self.late_readings = 0
+
+    def add(self, reading):
+        ts = reading.timestamp.timestamp()
+        device_id = getattr(reading, 'device_id', 'default')
+        for size in self.window_sizes:
+            key = (size, device_id)
+            start = ts - ts % size
+            watermark = self._emitted.get(key)
+            if watermark is not None and start < watermark:
+                # Its window was already emitted; count it in the next one instead
+                start = watermark
+                self.late_readings += 1
+            window = self._open.get(key)
+            if window is not None and start >= window.end:
+                self._close(key, window)
+                window = None
+            if window is None:
+                window = WindowAggregate(size, device_id, start, self.fields)
+                self._open[key] = window
+            window.add(reading)
+
+    def collect(self, now=None):
+        """Close every window whose end has passed and return all closed windows, oldest first"""
+        now = (now or datetime.now()).timestamp()
+        for key, window in list(self._open.items()):
+            if window.end <= now:
+                self._close(key, window)
+        closed, self._closed = self._closed, []
+        closed.sort(key=lambda window: (window.end, window.window_seconds))
+        return closed
+
+    def _close(self, key, window):
+        del self._open[key]
+        self._emitted[key] = window.end
+        self._closed.append(window)
@@ -6,12 +6,17 @@ from datetime import datetime, timezone, timedelta
 import platform
 import serial
 from threading import Lock
-from Database.sensor_data import SensorData
 from Database.led_status import LEDStatus
+from server.serial_ingest import LineBuffer, IngestStats, parse_sensor_line
+from server.state_cache import StateCache
 
 class DTH111:
-    def __init__(self, data_queue, lock, db):
+    def __init__(self, data_queue, lock, db, device_id="default", state_cache=None):
         self.data_queue = data_queue
+        self.device_id = device_id
+        # Current readings and LED state for the HTTP handlers
+        self.state_cache = state_cache or StateCache()
+        self._led_status = None
         self.lock = threading.RLock()
         self.db = db
         self.db_lock = threading.RLock()  # Add a lock specifically for database operations
@@ -22,8 +27,20 @@ class DTH111:
         self.led_on_time = None
         self.led_usage_times = []
         self.last_led_change_time = None
+        self.line_buffer = LineBuffer()
+        self.ingest_stats = IngestStats()
         self.init_serial()
 
+    @property
+    def led_status(self):
+        return self._led_status
+
+    @led_status.setter
+    def led_status(self, value):
+        if value != self._led_status:
+            self._led_status = value
+            self.state_cache.set('led_status', value)
+
     def detect_os(self):
         os_type = platform.system()
         if os_type == "Windows":
@@ -51,7 +68,9 @@ class DTH111:
             baud_rate = 9600
 
             try:
+                # The timeout only bounds how long read() waits for the first byte
                 self.ser = serial.Serial(port, baud_rate, timeout=1)
+                self.line_buffer.clear()
                 print(f"Successfully connected to port: {port}, baud rate: {baud_rate}")
                 return True
             except serial.SerialException as e:
@@ -74,18 +93,21 @@ class DTH111:
                         time.sleep(5)
                         continue
 
-                line = self.ser.readline().decode().strip(",")
-                print(f"Raw data: {line}")
-
-                data = self.parse_sensor_data(line)
-                if data:
-                    print(f"Parsed data: {data}")
-                    self.data_queue.put(data)
-                    self.latest_data = data
-                    self.led_status = data.light_status
-                    self.ac_status = data.ac_status
-
-                time.sleep(2)
+                # Wait for at least one byte, then take everything already buffered by the driver
+                chunk = self.ser.read(self.ser.in_waiting or 1)
+                if not chunk:
+                    continue
+                arrival = time.perf_counter()
+                self.ingest_stats.record_bytes(len(chunk))
+
+                for line in self.line_buffer.feed(chunk):
+                    self.ingest_stats.record_line()
+                    data = self.parse_sensor_data(line)
+                    if data is None:
+                        self.ingest_stats.record_parse_error()
+                        continue
+                    self.accept_reading(data)
+                    self.ingest_stats.record_reading(time.perf_counter() - arrival)
             except serial.SerialException as e:
                 print(f"Serial read error: {e}")
                 self.ser = None  # Mark serial as disconnected
@@ -98,21 +120,25 @@ class DTH111:
 
     def parse_sensor_data(self, line):
         try:
-            # Data format: "temperature,humidity,light,sound,LED_state"
-            temp, hum, light, sound, led_state = map(float, line.split(','))
-            return SensorData(
-                temperature=temp,
-                humidity=hum,
-                light=light,
-                sound_state=int(sound),
-                timestamp=datetime.now(),
-                light_status="ON" if int(led_state) == 1 else "OFF",
-                ac_status=self.ac_status
-            )
+            return parse_sensor_line(line, ac_status=self.ac_status, device_id=self.device_id)
         except ValueError as e:
             print(f"Data parsing error: {e}")
             return None
 
+    def accept_reading(self, data):
+        """Push a parsed reading into the pipeline; only this board's readings drive its LED state"""
+        self.data_queue.put(data)
+        if data.device_id == self.device_id:
+            self.latest_data = data
+            self.state_cache.set('realtime', data)
+            self.led_status = data.light_status
+            self.ac_status = data.ac_status
+
+    def get_ingest_stats(self):
+        stats = self.ingest_stats.snapshot()
+        stats['buffer_overflows'] = self.line_buffer.overflows
+        return stats
+
     def get_latest_data(self):
         if self.latest_data is None:
             # If no latest data, return default values
@@ -180,20 +206,14 @@ class DTH111:
             led_status = LEDStatus(
                 timestamp=self.last_led_change_time,
                 status=self.led_status,
-                duration=duration
+                duration=duration,
+                device_id=self.device_id
             )
-            if not self.db_lock.acquire(timeout=5):
-                print("Unable to acquire database lock, skipping LED status recording")
-                return
-            try:
-                result = self.db.create_led_status(led_status.to_dict())
-                print(f"LED status record result: {result}")
-                self.db.update_energy_consumption(led_status)
-                print(f"Recorded LED status change and energy consumption: {led_status.to_dict()}")
-            except Exception as e:
-                print(f"Error recording LED status: {e}")
-            finally:
-                self.db_lock.release()
+            # Queued on the write-behind buffer, so a slow database never stalls LED control
+            if self.db.record_led_status(led_status):
+                print(f"Queued LED status change and energy consumption: {led_status.to_dict()}")
+            else:
+                print("Unable to queue LED status record")
         else:
             print("This is the first LED status change, not recording duration")
         self.last_led_change_time = timestamp
@@ -1,15 +1,67 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+
+class TariffSchedule:
+    def __init__(self, periods=None, default_price=0.5):
+        """
+        分时电价
+        periods: [(start_hour, end_hour, price_per_kwh), ...]，按整点划分，end_hour 不含
+        default_price: 不在任何时段内时的电价
+        """
+        self.default_price = default_price
+        self._hourly = [default_price] * 24
+        for start_hour, end_hour, price in periods or []:
+            for hour in range(start_hour, end_hour):
+                self._hourly[hour] = price
+
+    def price_at(self, timestamp):
+        return self._hourly[timestamp.hour]
+
 
 class EnergyCalculator:
-    def __init__(self, led_power_watts=10):  # 假设LED功率为10瓦
+    def __init__(self, led_power_watts=10, tariff=None, device_watts=None):  # 假设LED功率为10瓦
         self.led_power_watts = led_power_watts
+        self.tariff = tariff or TariffSchedule()
+        self.device_watts = device_watts or {}  # device_id -> 功率（瓦）
 
-    def calculate_energy_consumption(self, duration_seconds):
+    def calculate_energy_consumption(self, duration_seconds, device_id=None):
         # 将秒转换为小时
         duration_hours = duration_seconds / 3600
         # 计算千瓦时 (kWh)
-        energy_kwh = (self.led_power_watts * duration_hours) / 1000
+        energy_kwh = (self.device_watts.get(device_id, self.led_power_watts) * duration_hours) / 1000
         return energy_kwh
 
     def calculate_cost(self, energy_kwh, price_per_kwh=0.5):  # 假设电价为0.5元/kWh
-        return energy_kwh * price_per_kwh
\ No newline at end of file
+        return energy_kwh * price_per_kwh
+
+    def split_by_hour(self, start, duration_seconds):
+        """把一个时间段按整点切开，返回 [(hour_start, seconds), ...]"""
+        pieces = []
+        end = start + timedelta(seconds=duration_seconds)
+        hour_start = start.replace(minute=0, second=0, microsecond=0)
+        cursor = start
+        while cursor < end:
+            hour_end = hour_start + timedelta(hours=1)
+            piece_end = min(end, hour_end)
+            pieces.append((hour_start, (piece_end - cursor).total_seconds()))
+            cursor = piece_end
+            hour_start = hour_end
+        return pieces
+
+    def hourly_usage(self, start, duration_seconds, device_id=None):
+        """按小时计算能耗和分时电费，返回 [(hour_start, seconds, energy_kwh, cost), ...]"""
+        usage = []
+        for hour_start, seconds in self.split_by_hour(start, duration_seconds):
+            energy_kwh = self.calculate_energy_consumption(seconds, device_id)
+            usage.append((hour_start, seconds, energy_kwh, energy_kwh * self.tariff.price_at(hour_start)))
+        return usage
+
+
+def period_start(timestamp, granularity):
+    """hour/day/month 桶的起始时间"""
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == 'month':
+        return timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown granularity: {granularity}")
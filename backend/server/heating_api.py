@@ -0,0 +1,45 @@
+# heating_api.py serves batch heating predictions over a time range.
+
+from datetime import datetime, timedelta
+from flask import Blueprint, jsonify, request
+from server.request_args import parse_client_time
+
+
+def heating_range_blueprint(predictor, cost_per_kwh, max_days):
+    """/data/heating-prediction/range for predictor (a HeatingPrediction)"""
+    blueprint = Blueprint('heating_range', __name__)
+
+    @blueprint.route('/data/heating-prediction/range', methods=['GET'])
+    def get_heating_prediction_range():
+        # /data/heating-prediction/range?start_time=...&end_time=...&device_id=...&store=true
+        # Scores without storing by default; store=true upserts the slots as 'range' rows, a rerun replaces them
+        try:
+            end_time = parse_client_time(request.args['end_time']) if 'end_time' in request.args else datetime.now()
+            start_time = parse_client_time(request.args['start_time']) if 'start_time' in request.args else end_time - timedelta(days=1)
+            if end_time <= start_time:
+                raise ValueError("end_time must be after start_time")
+            if end_time - start_time > timedelta(days=max_days):
+                raise ValueError(f"range longer than {max_days} days")
+            store = request.args.get('store', 'false').lower() == 'true'
+        except (ValueError, KeyError) as e:
+            return jsonify({'error': f'Invalid query parameter: {e}'}), 400
+
+        try:
+            predictions = predictor.predict_range(start_time, end_time, device_id=request.args.get('device_id'),
+                                                  store=store)
+            total_usage = sum(prediction['prediction_value'] for prediction in predictions)
+            return jsonify({
+                'count': len(predictions),
+                'stored': store,
+                'total_usage': round(total_usage, 2),
+                'estimated_cost': round(total_usage * cost_per_kwh, 2),
+                'predictions': [
+                    {'timestamp': prediction['timestamp'].isoformat(), 'prediction_value': prediction['prediction_value']}
+                    for prediction in predictions
+                ]
+            })
+        except Exception as e:
+            print(f"Error predicting heating range: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
+    return blueprint
@@ -0,0 +1,26 @@
+# json_stream.py streams large query results as a JSON array without building the whole body in memory.
+
+import orjson
+
+def _default(value):
+    # ObjectId and anything else orjson does not know natively
+    return str(value)
+
+def dumps(value):
+    """orjson encoding; naive datetimes come out like datetime.isoformat()"""
+    return orjson.dumps(value, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+def stream_json_array(records, chunk_size=200):
+    """Yield a JSON array in chunks of chunk_size encoded records"""
+    yield b'['
+    chunk = []
+    first = True
+    for record in records:
+        chunk.append(dumps(record))
+        if len(chunk) >= chunk_size:
+            yield (b'' if first else b',') + b','.join(chunk)
+            first = False
+            chunk = []
+    if chunk:
+        yield (b'' if first else b',') + b','.join(chunk)
+    yield b']'
@@ -0,0 +1,101 @@
+# multi_port.py reads several Arduino boards concurrently from one asyncio event loop.
+
+import asyncio
+import time
+from dataclasses import dataclass
+import serial_asyncio
+from server.serial_ingest import LineBuffer, IngestStats, parse_sensor_line
+
+
+@dataclass
+class SerialDevice:
+    device_id: str
+    port: str
+    baud_rate: int = 9600
+
+
+class _SensorLineProtocol(asyncio.Protocol):
+    """Feeds bytes from one serial transport through a LineBuffer and emits tagged readings"""
+
+    def __init__(self, device, on_reading, stats):
+        self.device = device
+        self.on_reading = on_reading
+        self.stats = stats
+        self.line_buffer = LineBuffer()
+        self.closed = asyncio.get_running_loop().create_future()
+
+    def connection_made(self, transport):
+        print(f"[{self.device.device_id}] Connected to port: {self.device.port}, baud rate: {self.device.baud_rate}")
+
+    def data_received(self, data):
+        arrival = time.perf_counter()
+        self.stats.record_bytes(len(data))
+        for line in self.line_buffer.feed(data):
+            self.stats.record_line()
+            try:
+                reading = parse_sensor_line(line, device_id=self.device.device_id)
+            except ValueError:
+                self.stats.record_parse_error()
+                continue
+            self.on_reading(reading)
+            self.stats.record_reading(time.perf_counter() - arrival)
+
+    def connection_lost(self, exc):
+        if not self.closed.done():
+            self.closed.set_result(exc)
+
+
+class MultiPortIngest:
+    """Runs one reader task per configured serial device inside a single event loop"""
+
+    def __init__(self, devices, on_reading, reconnect_delay=5):
+        self.devices = list(devices)
+        self.on_reading = on_reading
+        self.reconnect_delay = reconnect_delay
+        self.stats = {device.device_id: IngestStats() for device in self.devices}
+        self._loop = None
+        self._stop = None
+
+    def run(self):
+        """Block the calling thread until stop() is called"""
+        asyncio.run(self._main())
+
+    def stop(self):
+        if self._loop and self._stop:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    def get_stats(self):
+        return {device_id: stats.snapshot() for device_id, stats in self.stats.items()}
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        tasks = [asyncio.create_task(self._read_device(device), name=device.device_id) for device in self.devices]
+        print(f"Started multi-port ingest for {len(tasks)} devices")
+        await self._stop.wait()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        print("Multi-port ingest stopped")
+
+    async def _read_device(self, device):
+        loop = asyncio.get_running_loop()
+        stats = self.stats[device.device_id]
+        while True:
+            transport = None
+            try:
+                transport, protocol = await serial_asyncio.create_serial_connection(
+                    loop,
+                    lambda: _SensorLineProtocol(device, self.on_reading, stats),
+                    device.port,
+                    baudrate=device.baud_rate
+                )
+                exc = await protocol.closed
+                print(f"[{device.device_id}] Serial connection lost: {exc}")
+            except asyncio.CancelledError:
+                if transport:
+                    transport.close()
+                raise
+            except Exception as e:
+                print(f"[{device.device_id}] Failed to connect to {device.port}: {e}")
+            await asyncio.sleep(self.reconnect_delay)
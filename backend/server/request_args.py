@@ -0,0 +1,34 @@
+# request_args.py parses the query parameters shared by the HTTP endpoints.
+
+from datetime import datetime
+
+
+def parse_client_time(value):
+    """ISO time from the frontend (usually UTC with 'Z') -> naive server-local time like the stored readings"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def parse_resolution(value):
+    """'300', '30s', '5m', '1h' or '1d' -> seconds"""
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    if value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+def parse_cursor(value):
+    """?after= cursor, 'time' or 'time|device_id' as sent in X-Next-Cursor -> time or (time, device_id)"""
+    timestamp, separator, device_id = value.partition('|')
+    if not separator:
+        return parse_client_time(timestamp)
+    return parse_client_time(timestamp), device_id or None
+
+
+def format_cursor(timestamp, device_id=None, compound=True):
+    """X-Next-Cursor value for parse_cursor; compound cursors carry the device id of the last reading"""
+    if not compound:
+        return timestamp.isoformat()
+    return f"{timestamp.isoformat()}|{device_id or ''}"
@@ -0,0 +1,139 @@
+# retention.py folds raw readings past the retention window into hourly rollups, archives and deletes them.
+
+import gzip
+import os
+from datetime import datetime, timedelta
+from server.aggregator import FieldStats
+from server.json_stream import dumps
+from Database.storage import NUMERIC_READING_FIELDS
+
+# Far enough back to find the oldest raw reading
+_BEGINNING = datetime(1970, 1, 1)
+
+
+class HourlyRollup:
+    """FieldStats per numeric field for one device and hour"""
+
+    __slots__ = ('device_id', 'hour', 'count', 'first', 'last', 'stats')
+
+    def __init__(self, device_id, hour, fields):
+        self.device_id = device_id
+        self.hour = hour
+        self.count = 0
+        self.first = None
+        self.last = None
+        self.stats = {field: FieldStats() for field in fields}
+
+    def add(self, reading):
+        self.count += 1
+        timestamp = reading['timestamp']
+        if self.first is None or timestamp < self.first:
+            self.first = timestamp
+        if self.last is None or timestamp > self.last:
+            self.last = timestamp
+        for field, stats in self.stats.items():
+            value = reading.get(field)
+            if value is not None:
+                stats.add(value)
+
+    def to_dict(self):
+        doc = {'device_id': self.device_id, 'hour': self.hour, 'count': self.count,
+               'first': self.first, 'last': self.last}
+        # Hourly means at the top level, so a rollup charts like a downsampled reading
+        doc.update({field: stats.mean if stats.count else None for field, stats in self.stats.items()})
+        doc['stats'] = {field: stats.to_dict() for field, stats in self.stats.items()}
+        return doc
+
+
+class RetentionJob:
+    """Keeps raw_days of raw readings; older days are rolled up per device and hour, optionally archived
+    as gzip JSON lines under archive_dir, then deleted"""
+
+    def __init__(self, db, raw_days=30, archive_dir=None, interval_seconds=3600, fields=NUMERIC_READING_FIELDS):
+        self.db = db
+        self.raw_days = raw_days
+        self.archive_dir = archive_dir
+        self.interval_seconds = interval_seconds
+        self.fields = fields
+        self.stats = {'runs': 0, 'compacted': 0, 'rollups': 0, 'archived': 0, 'last_run': None}
+        if archive_dir:
+            os.makedirs(archive_dir, exist_ok=True)
+
+    def cutoff(self, now=None):
+        # Hour-aligned, so an hour is never split between its rollup and raw readings
+        cutoff = (now or datetime.now()) - timedelta(days=self.raw_days)
+        return cutoff.replace(minute=0, second=0, microsecond=0)
+
+    def run(self, stop_event):
+        """Background loop: compact once per interval_seconds until stop_event is set"""
+        try:
+            self.db.check_readings_rewritable('Retention')
+        except RuntimeError as e:
+            # Every run would roll up the same hours and then fail on the delete
+            print(f"Retention job disabled: {e}")
+            return
+        print(f"Starting retention job, keeping {self.raw_days} days of raw readings")
+        while not stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error in retention job: {e}")
+                import traceback
+                traceback.print_exc()
+            stop_event.wait(self.interval_seconds)
+
+    def run_once(self, now=None):
+        """Compact every day older than the cutoff, oldest first; safe to rerun after a failure"""
+        self.db.check_readings_rewritable('Retention')
+        cutoff = self.cutoff(now)
+        oldest = next(iter(self.db.iter_by_time_range(_BEGINNING, cutoff, limit=1, raw_timestamps=True)), None)
+        day = oldest['timestamp'].replace(hour=0, minute=0, second=0, microsecond=0) if oldest else cutoff
+        while day < cutoff:
+            end = min(day + timedelta(days=1), cutoff)
+            self.compact(day, end)
+            day = end
+        self.stats['runs'] += 1
+        self.stats['last_run'] = datetime.now().isoformat()
+
+    def compact(self, start_time, end_time):
+        """Roll up, archive, then delete the raw readings in [start_time, end_time)"""
+        rollups = {}
+        archive = self._open_archive(start_time, end_time) if self.archive_dir else None
+        count = 0
+        try:
+            # iter_by_time_range includes end_time, stop just before it
+            for reading in self.db.iter_by_time_range(start_time, end_time - timedelta(microseconds=1), raw_timestamps=True):
+                hour = reading['timestamp'].replace(minute=0, second=0, microsecond=0)
+                device_id = reading.get('device_id', 'default')
+                rollup = rollups.get((device_id, hour))
+                if rollup is None:
+                    rollup = rollups[(device_id, hour)] = HourlyRollup(device_id, hour, self.fields)
+                rollup.add(reading)
+                if archive:
+                    archive.write(dumps(reading) + b'\n')
+                count += 1
+        finally:
+            if archive:
+                archive.close()
+        if archive:
+            # Written under a temporary name so a crash never leaves a truncated segment behind
+            if count:
+                os.replace(archive.name, archive.name[:-len('.tmp')])
+                self.stats['archived'] += count
+            else:
+                os.remove(archive.name)
+        if not count:
+            return 0
+
+        self.db.write_hourly_rollups([rollup.to_dict() for rollup in rollups.values()])
+        deleted = self.db.delete_by_time_range(start_time, end_time)
+        self.stats['compacted'] += count
+        self.stats['rollups'] += len(rollups)
+        print(f"Compacted {count} readings from {start_time} to {end_time} into {len(rollups)} hourly rollups, "
+              f"deleted {deleted}")
+        return count
+
+    def _open_archive(self, start_time, end_time):
+        # One segment per compacted range; ranges never overlap, so segments are never overwritten
+        name = f"readings-{start_time:%Y%m%dT%H%M}-{end_time:%Y%m%dT%H%M}.jsonl.gz.tmp"
+        return gzip.open(os.path.join(self.archive_dir, name), 'wb')
@@ -0,0 +1,81 @@
+# ring_buffer.py bounded hand-off structures between the ingest, video and database threads.
+
+import threading
+import time
+from typing import Generic, List, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class RingBuffer(Generic[T]):
+    """Preallocated, bounded FIFO; when full the oldest item is overwritten"""
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._items: List[Optional[T]] = [None] * capacity
+        self._head = 0  # index of the oldest item
+        self._size = 0
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def put(self, item: T):
+        with self._lock:
+            tail = (self._head + self._size) % self.capacity
+            self._items[tail] = item
+            if self._size == self.capacity:
+                # Overwrote the oldest item
+                self._head = (self._head + 1) % self.capacity
+                self.dropped += 1
+            else:
+                self._size += 1
+
+    def latest(self) -> Optional[T]:
+        """Return the newest item without removing it, in O(1)"""
+        with self._lock:
+            if not self._size:
+                return None
+            return self._items[(self._head + self._size - 1) % self.capacity]
+
+    def drain(self, max_items: Optional[int] = None) -> List[T]:
+        """Remove and return up to max_items items, oldest first"""
+        with self._lock:
+            count = self._size if max_items is None else min(max_items, self._size)
+            end = self._head + count
+            if end <= self.capacity:
+                batch = self._items[self._head:end]
+                self._items[self._head:end] = [None] * count
+            else:
+                end -= self.capacity
+                batch = self._items[self._head:] + self._items[:end]
+                self._items[self._head:] = [None] * (self.capacity - self._head)
+                self._items[:end] = [None] * end
+            self._head = end % self.capacity
+            self._size -= count
+            return batch
+
+    def __len__(self):
+        return self._size
+
+
+class LatestValue(Generic[T]):
+    """Single-slot channel: writers overwrite, readers always see the most recent value"""
+
+    def __init__(self, default: Optional[T] = None):
+        self._lock = threading.Lock()
+        self._value = default
+        self._updated_at = None
+
+    def set(self, value: T):
+        with self._lock:
+            self._value = value
+            self._updated_at = time.time()
+
+    def get(self) -> Optional[T]:
+        with self._lock:
+            return self._value
+
+    @property
+    def updated_at(self):
+        return self._updated_at
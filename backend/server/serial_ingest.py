@@ -0,0 +1,122 @@
+# serial_ingest.py splits the raw serial byte stream into lines and keeps ingest counters.
+
+import threading
+import time
+from datetime import datetime
+from Database.sensor_data import SensorData
+
+
+def parse_sensor_line(line, ac_status="OFF", device_id="default"):
+    """Parse one "temperature,humidity,light,sound,LED_state" line; raises ValueError when malformed"""
+    temp, hum, light, sound, led_state = map(float, line.split(','))
+    return SensorData(
+        temperature=temp,
+        humidity=hum,
+        light=light,
+        sound_state=int(sound),
+        timestamp=datetime.now(),
+        light_status="ON" if int(led_state) == 1 else "OFF",
+        ac_status=ac_status,
+        device_id=device_id
+    )
+
+
+class LineBuffer:
+    """Reusable byte buffer that turns arbitrary serial chunks into complete lines"""
+
+    def __init__(self, max_line_length=256):
+        self.max_line_length = max_line_length
+        self._buf = bytearray()
+        self.overflows = 0
+
+    def feed(self, chunk):
+        """Append a chunk and return every complete line it finished (decoded, stripped)"""
+        self._buf += chunk
+        lines = []
+        start = 0
+        while True:
+            end = self._buf.find(b'\n', start)
+            if end == -1:
+                break
+            line = self._buf[start:end].decode('utf-8', errors='replace').strip().strip(',')
+            if line:
+                lines.append(line)
+            start = end + 1
+        if start:
+            # Deleting from the front of a bytearray does not reallocate
+            del self._buf[:start]
+        if len(self._buf) > self.max_line_length:
+            # No newline in sight, the board is sending garbage; drop the partial line
+            self.overflows += 1
+            self._buf.clear()
+        return lines
+
+    def clear(self):
+        self._buf.clear()
+
+
+class IngestStats:
+    """Thread-safe counters describing how fast the sensor feed is being consumed"""
+
+    def __init__(self, rate_window=1.0):
+        self._lock = threading.Lock()
+        self.rate_window = rate_window
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.bytes_read = 0
+            self.lines = 0
+            self.readings = 0
+            self.parse_errors = 0
+            self.latency_total = 0.0
+            self.latency_max = 0.0
+            self.latency_last = 0.0
+            self.readings_per_second = 0.0
+            self._window_start = time.monotonic()
+            self._window_count = 0
+
+    def record_bytes(self, count):
+        with self._lock:
+            self.bytes_read += count
+
+    def record_line(self):
+        with self._lock:
+            self.lines += 1
+
+    def record_parse_error(self):
+        with self._lock:
+            self.parse_errors += 1
+
+    def record_reading(self, latency):
+        """Count one enqueued reading; latency is seconds from byte arrival to enqueue"""
+        with self._lock:
+            self.readings += 1
+            self.latency_total += latency
+            self.latency_last = latency
+            if latency > self.latency_max:
+                self.latency_max = latency
+            self._window_count += 1
+            self._roll_window(time.monotonic())
+
+    def _roll_window(self, now):
+        elapsed = now - self._window_start
+        if elapsed >= self.rate_window:
+            self.readings_per_second = self._window_count / elapsed
+            self._window_start = now
+            self._window_count = 0
+
+    def snapshot(self):
+        with self._lock:
+            # Rolling here also decays the rate to 0 when the feed goes quiet
+            self._roll_window(time.monotonic())
+            return {
+                'bytes_read': self.bytes_read,
+                'lines': self.lines,
+                'readings': self.readings,
+                'parse_errors': self.parse_errors,
+                'readings_per_second': round(self.readings_per_second, 3),
+                'latency_avg_ms': round(self.latency_total / self.readings * 1000, 3) if self.readings else 0.0,
+                'latency_max_ms': round(self.latency_max * 1000, 3),
+                'latency_last_ms': round(self.latency_last * 1000, 3),
+            }
@@ -0,0 +1,56 @@
+# state_cache.py versioned in-memory "current state" shared by the ingest/aggregation threads and the HTTP handlers.
+
+import threading
+import time
+import uuid
+
+
+class StateCache:
+    """Key -> latest value, each write bumps the key's version"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (value, version, updated_at)
+        self._load_locks = {}
+        # Versions restart at 1 in every process, so ETags also name the cache instance they came from
+        self.boot_id = uuid.uuid4().hex[:12]
+
+    def set(self, key, value):
+        with self._lock:
+            version = self._entries[key][1] + 1 if key in self._entries else 1
+            self._entries[key] = (value, version, time.time())
+            return version
+
+    def get(self, key):
+        """Return (value, version); (None, 0) when the key was never written"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None, 0
+        return entry[0], entry[1]
+
+    def get_or_load(self, key, loader):
+        """Like get(), but fills a missing key from loader() once (e.g. from the database on a cold start)"""
+        value, version = self.get(key)
+        if version:
+            return value, version
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            # Another request may have loaded it while we waited
+            value, version = self.get(key)
+            if version:
+                return value, version
+            value = loader()
+            if value is None:
+                return None, 0
+            return value, self.set(key, value)
+
+    def updated_at(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[2] if entry else None
+
+    def etag(self, *parts):
+        """Quoted ETag for a response built from cached versions, e.g. etag('led', version)"""
+        return '"' + '-'.join([self.boot_id, *map(str, parts)]) + '"'
@@ -0,0 +1,121 @@
+# timeseries_store.py fixed-capacity, array-backed store of the most recent readings rows.
+
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from Database.sensor_data import SensorData
+from Database.storage import NUMERIC_READING_FIELDS
+
+# Same epoch MongoDB uses for the naive timestamps we store, so downsampling buckets line up with the DB
+_EPOCH = datetime(1970, 1, 1)
+
+INT_FIELDS = [name for name, field_type in SensorData.__annotations__.items() if field_type is int]
+TEXT_FIELDS = [name for name, field_type in SensorData.__annotations__.items() if field_type is str]
+
+
+def _to_seconds(timestamp):
+    return (timestamp - _EPOCH).total_seconds()
+
+
+def _format_seconds(seconds):
+    return (_EPOCH + timedelta(seconds=float(seconds))).isoformat(timespec='milliseconds')
+
+
+class RecentReadingsStore:
+    """Ring of the last `capacity` readings rows, one NumPy column per SensorData field"""
+
+    def __init__(self, capacity=1440):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._numeric = {field: np.full(capacity, np.nan) for field in NUMERIC_READING_FIELDS}
+        self._text = {field: np.empty(capacity, dtype=object) for field in TEXT_FIELDS}
+        self._head = 0  # next slot to write
+        self._size = 0
+
+    def append(self, record):
+        """Add one readings row (a SensorData.to_dict() style dict); rows must arrive in time order"""
+        with self._lock:
+            i = self._head
+            self._timestamps[i] = _to_seconds(record['timestamp'])
+            for field, column in self._numeric.items():
+                value = record.get(field)
+                column[i] = np.nan if value is None else value
+            for field, column in self._text.items():
+                column[i] = record.get(field)
+            self._head = (i + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def __len__(self):
+        return self._size
+
+    def oldest(self):
+        with self._lock:
+            if not self._size:
+                return None
+            start = (self._head - self._size) % self.capacity
+            return _EPOCH + timedelta(seconds=float(self._timestamps[start]))
+
+    def covers(self, start_time):
+        """True when every row from start_time onwards is held in memory"""
+        oldest = self.oldest()
+        return oldest is not None and start_time >= oldest
+
+    def _ordered(self, column):
+        # Caller holds self._lock; oldest row first
+        if self._size < self.capacity:
+            return column[:self._size].copy()
+        return np.concatenate((column[self._head:], column[:self._head]))
+
+    def query(self, start_time, end_time, fields=None, resolution_seconds=None, after=None, limit=None):
+        """Rows in [start_time, end_time] shaped like Database.read_by_time_range results"""
+        if isinstance(after, tuple):
+            after = after[0]  # one board's rows, so the timestamp alone orders them
+        fields = list(fields) if fields else NUMERIC_READING_FIELDS + TEXT_FIELDS
+        numeric = [f for f in fields if f in self._numeric]
+        text = [f for f in fields if f in self._text]
+        with self._lock:
+            timestamps = self._ordered(self._timestamps)
+            columns = {f: self._ordered(self._numeric[f]) for f in numeric}
+            if not resolution_seconds:
+                columns.update({f: self._ordered(self._text[f]) for f in text})
+
+        lo = np.searchsorted(timestamps, _to_seconds(after or start_time), side='right' if after else 'left')
+        hi = np.searchsorted(timestamps, _to_seconds(end_time), side='right')
+        timestamps = timestamps[lo:hi]
+        columns = {f: column[lo:hi] for f, column in columns.items()}
+
+        if resolution_seconds:
+            return self._downsample(timestamps, columns, resolution_seconds, limit)
+
+        if limit:
+            timestamps = timestamps[:limit]
+        rows = [{'timestamp': _format_seconds(ts)} for ts in timestamps]
+        for field, column in columns.items():
+            values = column[:len(rows)].tolist()
+            if field in INT_FIELDS:
+                values = [None if v != v else int(v) for v in values]
+            elif field in self._numeric:
+                values = [None if v != v else v for v in values]
+            for row, value in zip(rows, values):
+                row[field] = value
+        return rows
+
+    def _downsample(self, timestamps, columns, resolution_seconds, limit):
+        if not len(timestamps):
+            return []
+        buckets = timestamps - np.mod(timestamps, resolution_seconds)
+        # Rows are time ordered, so each bucket is one contiguous run
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        counts = np.diff(np.r_[starts, len(timestamps)])
+        if limit:
+            starts, counts = starts[:limit], counts[:limit]
+        rows = [{'count': int(count), 'timestamp': _format_seconds(bucket)}
+                for bucket, count in zip(buckets[starts], counts)]
+        for field, column in columns.items():
+            present = ~np.isnan(column)
+            sums = np.add.reduceat(np.where(present, column, 0.0), starts) if len(starts) else []
+            seen = np.add.reduceat(present.astype(np.int64), starts) if len(starts) else []
+            for row, total, n in zip(rows, sums[:len(rows)], seen[:len(rows)]):
+                row[field] = float(total / n) if n else None
+        return rows
@@ -0,0 +1,62 @@
+# backend/test/test_aggregator.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from datetime import datetime, timedelta
+from Database.sensor_data import SensorData
+from server.aggregator import FieldStats, WindowAggregator
+
+def reading(ts, temperature, device_id="default"):
+    return SensorData(temperature=temperature, humidity=40.0, light=100.0, timestamp=ts, device_id=device_id)
+
+class TestFieldStats(unittest.TestCase):
+    def test_running_statistics(self):
+        stats = FieldStats()
+        for value in [2.0, 4.0, 4.0, 4.0, 5.0, 5.0, 7.0, 9.0]:
+            stats.add(value)
+        result = stats.to_dict()
+        self.assertEqual(result['count'], 8)
+        self.assertEqual(result['sum'], 40.0)
+        self.assertEqual(result['min'], 2.0)
+        self.assertEqual(result['max'], 9.0)
+        self.assertAlmostEqual(result['mean'], 5.0)
+        self.assertAlmostEqual(result['std'], 2.0)
+
+class TestWindowAggregator(unittest.TestCase):
+    def test_emits_each_window_size(self):
+        base = datetime(2024, 3, 20, 14, 0, 0)
+        aggregator = WindowAggregator(window_sizes=(10, 60))
+        for second in range(0, 60, 2):
+            aggregator.add(reading(base + timedelta(seconds=second), 20.0 + second % 10))
+
+        windows = aggregator.collect(base + timedelta(seconds=60))
+        self.assertEqual([w.window_seconds for w in windows], [10] * 6 + [60])
+        minute = windows[-1]
+        self.assertEqual(minute.count, 30)
+        self.assertAlmostEqual(minute.mean('temperature'), 24.0)
+        self.assertEqual(minute.stats['temperature'].max, 28.0)
+        self.assertEqual(aggregator.collect(base + timedelta(seconds=120)), [])
+
+    def test_windows_are_per_device(self):
+        base = datetime(2024, 3, 20, 14, 0, 0)
+        aggregator = WindowAggregator(window_sizes=(60,))
+        aggregator.add(reading(base, 20.0, "room-1"))
+        aggregator.add(reading(base, 30.0, "room-2"))
+        windows = aggregator.collect(base + timedelta(minutes=1))
+        self.assertEqual(sorted((w.device_id, w.mean('temperature')) for w in windows),
+                         [("room-1", 20.0), ("room-2", 30.0)])
+
+    def test_late_reading_goes_to_next_window(self):
+        base = datetime(2024, 3, 20, 14, 0, 0)
+        aggregator = WindowAggregator(window_sizes=(60,))
+        aggregator.add(reading(base, 20.0))
+        self.assertEqual(len(aggregator.collect(base + timedelta(minutes=1))), 1)
+        aggregator.add(reading(base + timedelta(seconds=59), 22.0))
+        self.assertEqual(aggregator.late_readings, 1)
+        windows = aggregator.collect(base + timedelta(minutes=2))
+        self.assertEqual(windows[0].start, (base + timedelta(minutes=1)).timestamp())
+
+if __name__ == '__main__':
+    unittest.main()
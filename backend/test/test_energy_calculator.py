@@ -0,0 +1,36 @@
+# backend/test/test_energy_calculator.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from datetime import datetime
+from server.energy_calculator import EnergyCalculator, TariffSchedule, period_start
+
+class TestEnergyCalculator(unittest.TestCase):
+    def test_split_by_hour(self):
+        calculator = EnergyCalculator()
+        pieces = calculator.split_by_hour(datetime(2024, 3, 20, 13, 45), 2 * 3600)
+        self.assertEqual(pieces, [
+            (datetime(2024, 3, 20, 13, 0), 900.0),
+            (datetime(2024, 3, 20, 14, 0), 3600.0),
+            (datetime(2024, 3, 20, 15, 0), 2700.0),
+        ])
+
+    def test_time_of_use_cost_and_device_wattage(self):
+        tariff = TariffSchedule([(0, 6, 0.2)], default_price=0.5)
+        calculator = EnergyCalculator(led_power_watts=10, tariff=tariff, device_watts={'room-2': 20})
+        usage = calculator.hourly_usage(datetime(2024, 3, 20, 5, 30), 3600, 'room-2')
+        self.assertEqual(len(usage), 2)
+        self.assertAlmostEqual(usage[0][2], 0.01)
+        self.assertAlmostEqual(usage[0][3], 0.01 * 0.2)
+        self.assertAlmostEqual(usage[1][3], 0.01 * 0.5)
+
+    def test_period_start(self):
+        ts = datetime(2024, 3, 20, 13, 45, 12)
+        self.assertEqual(period_start(ts, 'hour'), datetime(2024, 3, 20, 13))
+        self.assertEqual(period_start(ts, 'day'), datetime(2024, 3, 20))
+        self.assertEqual(period_start(ts, 'month'), datetime(2024, 3, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# backend/test/test_export.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import io
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from Database.sensor_data import SensorData
+from Database.storage import open_storage
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from Database.export import READINGS_SCHEMA, export_readings, iter_export_chunks
+except ImportError:
+    pa = None
+
+START = datetime(2024, 5, 1, 12, 0, 0)
+READINGS = 25
+
+
+@unittest.skipUnless(pa, "pyarrow is not installed")
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.db = open_storage('sqlite', path=os.path.join(self.dir, 'sensor_data.db'))
+        self.db.create_many([
+            SensorData(temperature=20.0 + minute, humidity=50.0, light=10.0, person_count=minute % 3,
+                       timestamp=START + timedelta(minutes=minute, milliseconds=250)).to_dict()
+            for minute in range(READINGS)
+        ])
+        self.end = START + timedelta(hours=1)
+
+    def tearDown(self):
+        self.db.close()
+
+    def check_table(self, table):
+        self.assertEqual(table.schema, READINGS_SCHEMA)
+        self.assertEqual(table.schema.names[0], 'timestamp')
+        self.assertEqual(table.schema.field('timestamp').type, pa.timestamp('ms'))
+        self.assertEqual(table.num_rows, READINGS)
+        self.assertEqual(table.column('timestamp')[1].as_py(), START + timedelta(minutes=1, milliseconds=250))
+        self.assertEqual(table.column('temperature').to_pylist(), [20.0 + minute for minute in range(READINGS)])
+        self.assertEqual(table.column('person_count').to_pylist()[:4], [0, 1, 2, 0])
+
+    def test_parquet_file_round_trip(self):
+        path = os.path.join(self.dir, 'readings.parquet')
+        self.assertEqual(export_readings(self.db, START, self.end, 'parquet', path, batch_size=10), READINGS)
+        self.check_table(pq.read_table(path))
+        # One row group per batch
+        self.assertEqual(pq.ParquetFile(path).metadata.num_row_groups, 3)
+
+    def test_arrow_stream_chunks(self):
+        chunks = list(iter_export_chunks(self.db, START, self.end, 'arrow', batch_size=10))
+        # Schema and first batch, two more batches, then the end-of-stream marker
+        self.assertEqual(len(chunks), 4)
+        reader = pa.ipc.open_stream(io.BytesIO(b''.join(chunks)))
+        self.assertEqual([batch.num_rows for batch in reader], [10, 10, 5])
+        self.check_table(pa.ipc.open_stream(io.BytesIO(b''.join(chunks))).read_all())
+
+
+if __name__ == '__main__':
+    unittest.main()
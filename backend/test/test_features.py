@@ -0,0 +1,63 @@
+# backend/test/test_features.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import warnings
+from datetime import date, datetime
+import numpy as np
+from Models.features import FEATURE_COLUMNS, FeatureBuilder, ignore_feature_names_warning
+
+READING = {
+    'timestamp': datetime(2024, 12, 25, 9, 30),
+    'temperature': 23.5,
+    'ow_temperature': 5.5,
+    'ow_humidity': 80,
+    'ow_dewpoint': 2.1,
+    'ow_sun_duration': 15,
+    'ow_precipitation': 1.5,
+    'ow_wind_speed': 5.2,
+    'ow_wind_direction': 270,
+    'person_count': 4
+}
+
+
+class TestFeatureBuilder(unittest.TestCase):
+    def setUp(self):
+        self.builder = FeatureBuilder({date(2024, 12, 25)})
+
+    def test_named_row(self):
+        features = self.builder.named(self.builder.row(READING))
+        self.assertEqual(list(features), FEATURE_COLUMNS)
+        self.assertEqual(features, {
+            'is_holiday': 1, 'day_of_week': 3, 'hour_of_day': 9, 'is_working_hour': 1,
+            'number_of_people': 4, 'Temperature': 5.5, 'Humidity': 80.0, 'Dewpoint': 2.1,
+            'Sun Duration': 15.0, 'Precipitation Height': 1.5, 'Wind Speed': 5.2, 'Wind Direction': 270.0,
+            'indoor_temperature': 23.5, 'temperature_difference': 18.0
+        })
+        self.assertIsInstance(features['number_of_people'], int)
+
+    def test_matrix_matches_rows(self):
+        evening = dict(READING, timestamp='2024-12-27T17:00:00', person_count=0)
+        matrix = self.builder.matrix([READING, evening])
+        self.assertEqual(matrix.shape, (2, len(FEATURE_COLUMNS)))
+        self.assertEqual(matrix[0].tolist(), self.builder.row(READING)[0].tolist())
+        self.assertEqual(matrix[1, :4].tolist(), [0, 5, 17, 0])
+
+        gap = dict(READING, ow_humidity=None)
+        self.assertEqual(np.isnan(self.builder.matrix([READING, gap])).any(axis=1).tolist(), [False, True])
+
+    def test_only_sklearn_feature_names_warning_is_ignored(self):
+        message = 'X does not have valid feature names, but SVR was fitted with feature names'
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            ignore_feature_names_warning()
+            warnings.warn_explicit(message, UserWarning, 'base.py', 1, module='sklearn.base')
+            warnings.warn_explicit(message, UserWarning, 'other.py', 1, module='other')
+            warnings.warn_explicit('something else', UserWarning, 'base.py', 2, module='sklearn.base')
+        self.assertEqual([str(w.message) for w in caught], [message, 'something else'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+# backend/test/test_heating_batch.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from flask import Flask
+from Database.storage import open_storage
+from Models.features import FEATURE_COLUMNS
+from Models.heating_prediction import HeatingPrediction
+from server.heating_api import heating_range_blueprint
+
+START = datetime(2024, 3, 20, 14, 0)
+
+
+def reading(minute, **fields):
+    record = {
+        'timestamp': START + timedelta(minutes=minute), 'temperature': 22.0, 'humidity': 40.0, 'light': 5.0,
+        'ow_temperature': 8.0, 'ow_humidity': 70.0, 'ow_dewpoint': 3.0, 'ow_sun_duration': 30.0,
+        'ow_precipitation': 0.0, 'ow_wind_speed': 2.0, 'ow_wind_direction': 90.0, 'person_count': 2,
+        'device_id': 'default'
+    }
+    record.update(fields)
+    return record
+
+
+class CountingModel:
+    """Stands in for the SVR: one row per input row, counts predict() calls"""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, matrix):
+        self.calls.append(matrix.shape)
+        return matrix[:, FEATURE_COLUMNS.index('number_of_people')] + 0.5
+
+
+class TestHeatingBatch(unittest.TestCase):
+    def setUp(self):
+        self.db = open_storage('sqlite', path=os.path.join(tempfile.mkdtemp(), 'sensor_data.db'))
+        self.predictor = HeatingPrediction(db=self.db)
+        self.model = self.predictor.model = CountingModel()
+
+    def tearDown(self):
+        self.predictor.close()
+        self.db.close()
+
+    def stored(self):
+        return self.db._conn().execute("SELECT COUNT(*) FROM heating_predictions").fetchone()[0]
+
+    def test_predict_batch_skips_incomplete_rows(self):
+        records = [reading(0), reading(15, ow_humidity=None), reading(30, person_count=4)]
+        predictions = self.predictor.predict_batch(records)
+        self.assertEqual(self.model.calls, [(2, len(FEATURE_COLUMNS))])
+        self.assertEqual([(p['timestamp'], p['prediction_value']) for p in predictions],
+                         [(START, 2.5), (START + timedelta(minutes=30), 4.5)])
+        self.assertEqual(predictions[1]['input_features']['number_of_people'], 4)
+        self.assertEqual(self.stored(), 0)  # store defaults to False
+
+    def test_predict_range_scores_slots_once(self):
+        for minute in range(0, 60, 5):
+            self.db.create(reading(minute, person_count=minute // 15))
+        for _ in range(2):
+            predictions = self.predictor.predict_range(START, START + timedelta(minutes=59), store=True)
+        self.assertEqual([p['prediction_value'] for p in predictions], [0.5, 1.5, 2.5, 3.5])
+        self.assertEqual({p['source'] for p in predictions}, {'range'})
+        self.assertEqual(self.model.calls, [(4, len(FEATURE_COLUMNS))] * 2)
+        # Rerunning the same range replaces its rows
+        self.assertEqual(self.stored(), 4)
+        self.assertEqual(self.db.get_recent_predictions(), [])
+
+    def test_endpoint(self):
+        for minute in range(0, 30, 5):
+            self.db.create(reading(minute))
+        app = Flask(__name__)
+        app.register_blueprint(heating_range_blueprint(self.predictor, cost_per_kwh=0.3, max_days=92))
+        client = app.test_client()
+
+        response = client.get('/data/heating-prediction/range',
+                              query_string={'start_time': START.isoformat(), 'end_time': (START + timedelta(minutes=29)).isoformat()})
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual((body['count'], body['stored'], body['total_usage'], body['estimated_cost']), (2, False, 5.0, 1.5))
+        self.assertEqual(body['predictions'][0], {'timestamp': START.isoformat(), 'prediction_value': 2.5})
+        self.assertEqual(self.stored(), 0)
+
+        for query in ({'start_time': 'yesterday'},
+                      {'start_time': START.isoformat(), 'end_time': (START + timedelta(days=93)).isoformat()},
+                      {'start_time': START.isoformat(), 'end_time': START.isoformat()}):
+            self.assertEqual(client.get('/data/heating-prediction/range', query_string=query).status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
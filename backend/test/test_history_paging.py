@@ -0,0 +1,74 @@
+# backend/test/test_history_paging.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from datetime import datetime, timedelta
+import mongomock
+from Database.db_operation import Database
+from server.request_args import format_cursor, parse_cursor
+
+START = datetime(2024, 5, 1, 12, 0, 0)
+DEVICES = ('room-3', None, 'room-2')
+
+
+def readings():
+    # Three boards report on the same ticks; legacy readings have no device_id
+    for minute in range(3):
+        for device_id in DEVICES:
+            reading = {'timestamp': START + timedelta(minutes=minute), 'light': float(minute)}
+            if device_id:
+                reading['device_id'] = device_id
+            yield reading
+
+
+def mongo_store(storage_mode):
+    db = Database.__new__(Database)
+    client = mongomock.MongoClient()
+    db.collection = client.test.readings
+    db.buckets = client.test.readings_buckets
+    db.storage_mode = storage_mode
+    if storage_mode == 'bucket':
+        buckets = {}
+        for reading in readings():
+            bucket = buckets.setdefault(reading.get('device_id'), {
+                'device_id': reading.get('device_id'), 'hour': START, 'first': reading['timestamp'], 'readings': []})
+            bucket['last'] = reading['timestamp']
+            bucket['readings'].append(reading)
+        db.buckets.insert_many(list(buckets.values()))
+    else:
+        db.collection.insert_many(list(readings()))
+    return db
+
+
+class TestHistoryPaging(unittest.TestCase):
+    def pages(self, db, limit, **options):
+        seen, after = [], None
+        while True:
+            page = list(db.iter_by_time_range(START, START + timedelta(hours=1), after=after, limit=limit,
+                                              raw_timestamps=True, **options))
+            seen += [(row['timestamp'].minute, row.get('device_id')) for row in page]
+            if len(page) < limit:
+                return seen
+            after = (page[-1]['timestamp'], page[-1].get('device_id'))
+
+    def test_compound_cursor_keeps_shared_timestamps(self):
+        expected = [(minute, device_id) for minute in range(3) for device_id in (None, 'room-2', 'room-3')]
+        for storage_mode in ('plain', 'bucket'):
+            with self.subTest(storage_mode=storage_mode):
+                db = mongo_store(storage_mode)
+                for limit in (1, 2, 4):
+                    self.assertEqual(self.pages(db, limit), expected)
+                self.assertEqual(self.pages(db, 2, device_id='room-2'), [(minute, 'room-2') for minute in range(3)])
+
+    def test_cursor_format(self):
+        timestamp = START + timedelta(milliseconds=250)
+        self.assertEqual(parse_cursor(format_cursor(timestamp, 'room-2')), (timestamp, 'room-2'))
+        self.assertEqual(parse_cursor(format_cursor(timestamp)), (timestamp, None))
+        # Downsampled pages and older clients use the bare timestamp
+        self.assertEqual(parse_cursor(format_cursor(timestamp, 'room-2', compound=False)), timestamp)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,24 @@
+# backend/test/test_json_stream.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import unittest
+from datetime import datetime
+from server.json_stream import stream_json_array
+
+class TestStreamJsonArray(unittest.TestCase):
+    def test_chunks_form_one_array(self):
+        records = ({'i': i, 'timestamp': datetime(2024, 3, 20, 14, 0, i)} for i in range(5))
+        chunks = list(stream_json_array(records, chunk_size=2))
+        self.assertEqual(len(chunks), 5)  # '[', three record chunks, ']'
+        data = json.loads(b''.join(chunks))
+        self.assertEqual([item['i'] for item in data], list(range(5)))
+        self.assertEqual(data[3]['timestamp'], datetime(2024, 3, 20, 14, 0, 3).isoformat())
+
+    def test_empty(self):
+        self.assertEqual(json.loads(b''.join(stream_json_array([]))), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# backend/test/test_migrations.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from collections import Counter
+from datetime import datetime, timedelta
+import mongomock
+from pymongo import UpdateOne
+from Database.migrations.base import Migration
+from Database.migrations.m0001_timestamp_strings import TimestampStrings
+from Database.migrations.runner import STATE_COLLECTION, MigrationRunner
+
+START = datetime(2024, 5, 1, 12, 0)
+
+
+class Interrupted(Exception):
+    pass
+
+
+class MockCollection:
+    """mongomock collection whose bulk_write applies the UpdateOnes one by one and fails after fail_after calls"""
+
+    def __init__(self, collection, fail_after=None):
+        self.collection = collection
+        self.fail_after = fail_after
+        self.calls = 0
+        self.converted = Counter()
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def bulk_write(self, ops, ordered=True):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise Interrupted()
+        modified = 0
+        for op in ops:
+            if self.collection.update_one(op._filter, op._doc).modified_count:
+                self.converted[op._filter['_id']] += 1
+                modified += 1
+        return type('BulkWriteResult', (), {'modified_count': modified})()
+
+
+class MockDatabase:
+    def __init__(self, db, readings):
+        self.db = db
+        self.readings = readings
+
+    def __getitem__(self, name):
+        return self.readings if name == 'readings' else self.db[name]
+
+class TestTimestampStrings(unittest.TestCase):
+    def test_operations(self):
+        ops = TimestampStrings().operations([
+            {'_id': 1, 'timestamp': '2024-05-01 12:30:00'},
+            {'_id': 2, 'timestamp': 'not a time'},
+        ])
+        self.assertEqual(ops, [UpdateOne({'_id': 1}, {'$set': {'timestamp': datetime(2024, 5, 1, 12, 30)}})])
+
+    def test_operation_is_abstract(self):
+        with self.assertRaises(TypeError):
+            type('NoOperation', (Migration,), {'version': 2})()
+
+class TestMigrationRunner(unittest.TestCase):
+    def test_resume_after_interruption(self):
+        db = mongomock.MongoClient().sensor_data
+        db.readings.insert_many([
+            {'_id': i, 'timestamp': (START + timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S')} for i in range(25)
+        ])
+        first = MockCollection(db.readings, fail_after=2)
+        with self.assertRaises(Interrupted):
+            MigrationRunner(MockDatabase(db, first), migrations=[TimestampStrings()], workers=1, batch_size=4).run()
+        state = db[STATE_COLLECTION].find_one({'_id': 1})
+        self.assertEqual((state['status'], state['checkpoint']), ('running', 7))
+
+        second = MockCollection(db.readings)
+        reports = MigrationRunner(MockDatabase(db, second), migrations=[TimestampStrings()], workers=1, batch_size=4).run()
+        self.assertEqual(len(reports), 1)
+        # Every document converted exactly once over both runs
+        self.assertEqual(first.converted + second.converted, Counter(range(25)))
+        self.assertEqual(db.readings.count_documents({'timestamp': {'$type': 'string'}}), 0)
+        self.assertEqual(db.readings.find_one({'_id': 24})['timestamp'], START + timedelta(minutes=24))
+        state = db[STATE_COLLECTION].find_one({'_id': 1})
+        self.assertEqual(state['status'], 'done')
+        self.assertNotIn('checkpoint', state)
+        # Nothing left to do
+        self.assertEqual(MigrationRunner(MockDatabase(db, second), migrations=[TimestampStrings()]).run(), [])
+
+if __name__ == '__main__':
+    unittest.main()
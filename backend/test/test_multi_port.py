@@ -0,0 +1,80 @@
+# backend/test/test_multi_port.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import unittest
+from unittest import mock
+from server import multi_port
+from server.multi_port import MultiPortIngest, SerialDevice, _SensorLineProtocol
+from server.serial_ingest import IngestStats
+
+DEVICE = SerialDevice('room-2', '/dev/ttyACM1')
+
+
+class FakeTransport:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestSensorLineProtocol(unittest.TestCase):
+    def feed(self, chunks):
+        readings = []
+        stats = IngestStats()
+
+        async def run():
+            protocol = _SensorLineProtocol(DEVICE, readings.append, stats)
+            protocol.connection_made(FakeTransport())
+            for chunk in chunks:
+                protocol.data_received(chunk)
+            protocol.connection_lost(None)
+            return await protocol.closed
+
+        self.assertIsNone(asyncio.run(run()))
+        return readings, stats.snapshot()
+
+    def test_partial_lines_and_parse_errors(self):
+        readings, stats = self.feed([b"22.5,40.0,1", b"20,0,1\r\n21.0,41", b".0,90,1,0\r\ngarbage\n"])
+        self.assertEqual([(r.temperature, r.light, r.light_status) for r in readings],
+                         [(22.5, 120.0, 'ON'), (21.0, 90.0, 'OFF')])
+        self.assertEqual({r.device_id for r in readings}, {'room-2'})
+        self.assertEqual((stats['lines'], stats['readings'], stats['parse_errors']), (3, 2, 1))
+
+
+class TestMultiPortIngest(unittest.TestCase):
+    def test_reconnects_after_connection_lost(self):
+        readings = []
+        ingest = MultiPortIngest([DEVICE], on_reading=readings.append, reconnect_delay=0)
+        connections = []
+
+        async def create_serial_connection(loop, protocol_factory, port, baudrate):
+            protocol = protocol_factory()
+            transport = FakeTransport()
+            connections.append(port)
+            protocol.connection_made(transport)
+            if len(connections) == 1:
+                # First connection: half a line, then the board is unplugged
+                loop.call_soon(protocol.data_received, b"20.0,40.0,5")
+                loop.call_soon(protocol.connection_lost, OSError("unplugged"))
+            elif len(connections) == 2:
+                raise OSError("port busy")
+            else:
+                # The partial line from the lost connection must not leak into the new one
+                loop.call_soon(protocol.data_received, b"0,0,1\n21.0,41.0,50,0,0\n")
+                loop.call_soon(ingest.stop)
+            return transport, protocol
+
+        with mock.patch.object(multi_port.serial_asyncio, 'create_serial_connection', create_serial_connection):
+            ingest.run()
+
+        self.assertEqual(connections, ['/dev/ttyACM1'] * 3)
+        self.assertEqual([r.temperature for r in readings], [21.0])
+        self.assertEqual(ingest.get_stats()['room-2']['parse_errors'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+# backend/test/test_prediction_cache.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from Database.storage import open_storage
+from Models.heating_prediction import HeatingPrediction
+
+READING = {
+    'timestamp': datetime(2024, 3, 20, 14, 30),
+    'temperature': 22.5,
+    'ow_temperature': 18.3,
+    'ow_humidity': 65,
+    'ow_dewpoint': 12.1,
+    'ow_sun_duration': 45,
+    'ow_precipitation': 0.0,
+    'ow_wind_speed': 3.5,
+    'ow_wind_direction': 180,
+    'person_count': 3
+}
+
+
+class TestPredictionCache(unittest.TestCase):
+    def setUp(self):
+        self.db = open_storage('sqlite', path=os.path.join(tempfile.mkdtemp(), 'sensor_data.db'))
+        # A day-long slot, so the test never straddles a slot boundary
+        self.predictor = HeatingPrediction(db=self.db, slot_seconds=86400)
+
+    def tearDown(self):
+        self.predictor.close()
+        self.db.close()
+
+    def stored(self):
+        return len(self.db.get_recent_predictions(100))
+
+    def test_repeat_requests_in_slot_hit_cache(self):
+        first = self.predictor.predict(READING)
+        self.assertIs(self.predictor.predict(dict(READING)), first)
+        self.assertEqual(self.stored(), 1)
+        self.assertEqual(self.predictor.cache_stats, {'hits': 1, 'misses': 1, 'invalidations': 0})
+
+
+    def test_minute_readings_in_one_slot_store_one_prediction(self):
+        for minute in range(5):
+            self.predictor.predict(dict(READING, timestamp=READING['timestamp'] + timedelta(minutes=minute),
+                                        person_count=minute))
+        self.assertEqual(self.stored(), 1)
+        self.assertEqual(self.predictor.cache_stats['misses'], 1)
+
+    def test_invalidate(self):
+        self.predictor.predict(READING)
+        self.predictor.invalidate_cache()
+        self.predictor.predict(READING)
+        self.assertEqual(self.stored(), 2)
+        self.assertEqual(self.predictor.cache_stats['invalidations'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
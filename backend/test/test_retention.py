@@ -0,0 +1,64 @@
+# backend/test/test_retention.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import gzip
+import json
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+from Database.sensor_data import SensorData
+from Database.storage import open_storage
+from server.retention import RetentionJob
+
+NOW = datetime(2024, 6, 10, 12, 30)
+
+class TestRetentionJob(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.db = open_storage('sqlite', path=os.path.join(self.dir, 'sensor_data.db'))
+        start = datetime(2024, 5, 1, 23, 0)
+        # Two hours of old readings around midnight, plus one recent reading
+        for minute in range(0, 120, 10):
+            self.db.create(SensorData(temperature=20.0 + minute / 10, humidity=50.0, light=100.0,
+                                      timestamp=start + timedelta(minutes=minute)).to_dict())
+        self.db.create(SensorData(temperature=25.0, humidity=50.0, light=100.0, timestamp=NOW).to_dict())
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_run_stops_when_store_cannot_delete(self):
+        def unsupported(operation):
+            raise RuntimeError(f"{operation} needs MongoDB 7.0+")
+        self.db.check_readings_rewritable = unsupported
+        job = RetentionJob(self.db, raw_days=30)
+        job.run(threading.Event())  # returns at once instead of failing every interval
+        self.assertEqual(job.stats['runs'], 0)
+        self.assertEqual(len(self.db.read_all()), 13)
+
+    def test_compacts_old_readings(self):
+        archive_dir = os.path.join(self.dir, 'archive')
+        job = RetentionJob(self.db, raw_days=30, archive_dir=archive_dir)
+        job.run_once(now=NOW)
+
+        self.assertEqual(len(self.db.read_all()), 1)
+        rollups = list(self.db.iter_hourly_rollups(datetime(2024, 5, 1), datetime(2024, 5, 3)))
+        self.assertEqual([(r['hour'], r['count']) for r in rollups],
+                         [(datetime(2024, 5, 1, 23), 6), (datetime(2024, 5, 2, 0), 6)])
+        self.assertAlmostEqual(rollups[0]['temperature'], 22.5)
+        self.assertEqual(rollups[1]['stats']['temperature']['max'], 31.0)
+
+        archived = []
+        for name in sorted(os.listdir(archive_dir)):
+            with gzip.open(os.path.join(archive_dir, name)) as segment:
+                archived += [json.loads(line) for line in segment]
+        self.assertEqual(len(archived), 12)
+
+        # Nothing left to do on a rerun
+        job.run_once(now=NOW)
+        self.assertEqual(job.stats['compacted'], 12)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+# backend/test/test_ring_buffer.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from server.ring_buffer import RingBuffer, LatestValue
+
+class TestRingBuffer(unittest.TestCase):
+    def test_fifo_drain(self):
+        buf = RingBuffer(4)
+        for i in range(3):
+            buf.put(i)
+        self.assertEqual(buf.latest(), 2)
+        self.assertEqual(buf.drain(), [0, 1, 2])
+        self.assertEqual(len(buf), 0)
+        self.assertIsNone(buf.latest())
+
+    def test_overwrites_oldest_when_full(self):
+        buf = RingBuffer(3)
+        for i in range(5):
+            buf.put(i)
+        self.assertEqual(buf.dropped, 2)
+        self.assertEqual(buf.latest(), 4)
+        self.assertEqual(buf.drain(), [2, 3, 4])
+
+    def test_partial_drain_wraps(self):
+        buf = RingBuffer(4)
+        for i in range(6):
+            buf.put(i)
+        self.assertEqual(buf.drain(3), [2, 3, 4])
+        buf.put(6)
+        buf.put(7)
+        self.assertEqual(buf.drain(), [5, 6, 7])
+
+class TestLatestValue(unittest.TestCase):
+    def test_overwrite(self):
+        value = LatestValue(0)
+        self.assertEqual(value.get(), 0)
+        value.set(3)
+        value.set(5)
+        self.assertEqual(value.get(), 5)
+        self.assertIsNotNone(value.updated_at)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+# backend/test/test_sensor_data.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from datetime import datetime, timezone
+from Database.sensor_data import SensorData, encode_sensor_data
+from Database.led_status import LEDStatus, encode_led_statuses
+
+class TestSensorData(unittest.TestCase):
+    def test_round_trip_ignores_unknown_keys(self):
+        data = SensorData(temperature=21.5, humidity=40.0, light=120.0,
+                          timestamp=datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc), device_id='room-2')
+        record = data.to_dict()
+        self.assertIsNone(record['timestamp'].tzinfo)
+        self.assertEqual(record['device_id'], 'room-2')
+        record.update({'_id': 'abc', 'stats': {}})
+        self.assertEqual(SensorData.from_dict(record).to_dict(), data.to_dict())
+
+    def test_slotted(self):
+        data = SensorData(temperature=21.5, humidity=40.0, light=120.0, timestamp=datetime(2024, 5, 1))
+        self.assertFalse(hasattr(data, '__dict__'))
+
+    def test_batch_encoders(self):
+        readings = [SensorData(temperature=t, humidity=40.0, light=1.0, timestamp=datetime(2024, 5, 1)) for t in (20.0, 21.0)]
+        self.assertEqual(encode_sensor_data(readings), [r.to_dict() for r in readings])
+        statuses = [LEDStatus(timestamp=datetime(2024, 5, 1), status='ON', duration=5.0)]
+        self.assertEqual(encode_led_statuses(statuses), [{'timestamp': datetime(2024, 5, 1), 'status': 'ON', 'duration': 5.0, 'device_id': 'default'}])
+
+if __name__ == '__main__':
+    unittest.main()
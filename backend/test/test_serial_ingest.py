@@ -0,0 +1,44 @@
+# backend/test/test_serial_ingest.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from server.serial_ingest import LineBuffer, IngestStats
+
+class TestLineBuffer(unittest.TestCase):
+    def test_lines_split_across_chunks(self):
+        buf = LineBuffer()
+        self.assertEqual(buf.feed(b"22.5,40.0,1"), [])
+        self.assertEqual(buf.feed(b"20,0,1,\r\n21.0,41"), ["22.5,40.0,120,0,1"])
+        self.assertEqual(buf.feed(b".0,90,1,0\r\n"), ["21.0,41.0,90,1,0"])
+
+    def test_multiple_lines_in_one_chunk(self):
+        buf = LineBuffer()
+        lines = buf.feed(b"1,2,3,0,0\n\n4,5,6,1,1\n7,8")
+        self.assertEqual(lines, ["1,2,3,0,0", "4,5,6,1,1"])
+        self.assertEqual(buf.feed(b",9,0,0\n"), ["7,8,9,0,0"])
+
+    def test_overflow_drops_partial_line(self):
+        buf = LineBuffer(max_line_length=8)
+        self.assertEqual(buf.feed(b"0123456789"), [])
+        self.assertEqual(buf.overflows, 1)
+        self.assertEqual(buf.feed(b"1,2\n"), ["1,2"])
+
+class TestIngestStats(unittest.TestCase):
+    def test_counters(self):
+        stats = IngestStats()
+        stats.record_bytes(10)
+        stats.record_line()
+        stats.record_parse_error()
+        stats.record_reading(0.002)
+        stats.record_reading(0.004)
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot['bytes_read'], 10)
+        self.assertEqual(snapshot['parse_errors'], 1)
+        self.assertEqual(snapshot['readings'], 2)
+        self.assertAlmostEqual(snapshot['latency_avg_ms'], 3.0)
+        self.assertAlmostEqual(snapshot['latency_max_ms'], 4.0)
+
+if __name__ == '__main__':
+    unittest.main()
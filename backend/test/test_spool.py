@@ -0,0 +1,170 @@
+# backend/test/test_spool.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import unittest
+from datetime import datetime
+import mongomock
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, ServerSelectionTimeoutError
+from Database.led_status import LEDStatus
+from Database.spool import WriteSpool
+from Database.db_operation import Database, WriteBehindBuffer, applied_once
+from server.energy_calculator import EnergyCalculator
+
+class FakeCollection:
+    def __init__(self):
+        self.available = True
+        self.written = []
+
+    def bulk_write(self, ops, ordered=True):
+        if not self.available:
+            raise ServerSelectionTimeoutError("down")
+        self.written.extend(ops)
+
+class MockCollection:
+    """mongomock collection behind a bulk_write that reports duplicate keys like the server does"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.available = True
+
+    def bulk_write(self, ops, ordered=True):
+        if not self.available:
+            raise ServerSelectionTimeoutError("down")
+        errors = []
+        for index, op in enumerate(ops):
+            try:
+                if isinstance(op, InsertOne):
+                    self.collection.insert_one(dict(op._doc))
+                else:
+                    self.collection.update_one(op._filter, op._doc, upsert=op._upsert)
+            except DuplicateKeyError:
+                errors.append({'index': index, 'code': 11000})
+        if errors:
+            raise BulkWriteError({'writeErrors': errors})
+
+class TestWriteSpool(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'spool.db')
+
+    def test_operations_survive_reopen(self):
+        spool = WriteSpool(self.path)
+        spool.append('led_status', [InsertOne({'timestamp': datetime(2024, 5, 1, 12), 'status': 'ON'})])
+        spool.append('stats', [UpdateOne({'_id': 'led_status'}, {'$inc': {'on_count': 1}}, upsert=True)])
+        spool.close()
+
+        spool = WriteSpool(self.path)
+        self.assertEqual(len(spool), 2)
+        (first_id, first_name, insert), (last_id, last_name, update) = spool.peek(10)
+        self.assertEqual((first_name, insert._doc), ('led_status', {'timestamp': datetime(2024, 5, 1, 12), 'status': 'ON'}))
+        self.assertEqual((last_name, update._filter, update._upsert), ('stats', {'_id': 'led_status'}, True))
+        spool.remove_through(last_id)
+        self.assertEqual(len(spool), 0)
+        spool.close()
+
+    def test_buffer_spools_while_down_and_replays(self):
+        collection = FakeCollection()
+        collection.available = False
+        buffer = WriteBehindBuffer({'readings': collection}, max_age=60, spool=WriteSpool(self.path), replay_interval=60)
+        buffer.submit('readings', InsertOne({'light': 1}))
+        buffer.flush()
+        self.assertEqual(buffer.snapshot()['spool_pending'], 1)
+
+        # Still degraded: new writes go straight to the spool, behind the older ones
+        buffer.submit('readings', InsertOne({'light': 2}))
+        buffer.flush()
+        self.assertEqual(buffer.snapshot()['spool_pending'], 2)
+
+        collection.available = True
+        buffer._replay()
+        self.assertEqual([op._doc['light'] for op in collection.written], [1, 2])
+        self.assertEqual(buffer.snapshot()['spool_pending'], 0)
+        buffer.submit('readings', InsertOne({'light': 3}))
+        buffer.close()
+        self.assertEqual(len(collection.written), 3)
+
+    def test_replaying_a_spool_twice_writes_once(self):
+        db = mongomock.MongoClient().db
+        collections = {name: MockCollection(db[name]) for name in ('led_status', 'stats')}
+        buffer = WriteBehindBuffer(collections, max_age=60, spool=WriteSpool(self.path), replay_interval=60)
+        collections['led_status'].available = False
+        buffer.submit('led_status', InsertOne({'status': 'ON', 'duration': 30}))
+        buffer.submit('stats', applied_once({'_id': 'led_status'}, {'$inc': {'on_count': 1, 'total_on_time': 30}}))
+        buffer.flush()
+        entries = buffer.spool.peek(10)
+        self.assertEqual(len(entries), 2)
+
+        collections['led_status'].available = True
+        buffer._replay()
+        # A replay whose acknowledgement was lost: the same spooled writes come back
+        buffer.spool.append('led_status', [entries[0][2]])
+        buffer.spool.append('stats', [entries[1][2]])
+        buffer._replay()
+        buffer.close()
+
+        self.assertEqual(db.led_status.count_documents({}), 1)
+        stats = db.stats.find_one({'_id': 'led_status'})
+        self.assertEqual((stats['on_count'], stats['total_on_time']), (1, 30))
+
+class TestWriteBehindBuffer(unittest.TestCase):
+    def test_rejected_write_does_not_drop_other_chunks(self):
+        db = mongomock.MongoClient().db
+        db.led_status.insert_one({'_id': 1, 'status': 'ON'})
+        buffer = WriteBehindBuffer({'led_status': MockCollection(db.led_status)}, max_age=60)
+        for i in range(1, 6):
+            buffer.submit('led_status', InsertOne({'_id': i, 'status': 'OFF'}))
+        buffer.max_batch = 2  # one flush of three bulk_write chunks
+        buffer.close()
+        # _id 1 is a duplicate key; the other write of its chunk and every later chunk are stored
+        self.assertEqual(sorted(doc['_id'] for doc in db.led_status.find({'status': 'OFF'})), [2, 3, 4, 5])
+        self.assertEqual((buffer.stats['written'], buffer.stats['errors']), (4, 1))
+
+
+def mongo_database(mongo):
+    """Database over mongomock without a server: only the LED, energy and stats collections"""
+    names = ('led_status', 'energy_consumption', 'energy_buckets', 'stats')
+    collections = {name: MockCollection(mongo[name]) for name in names}
+    db = Database.__new__(Database)
+    db.led_collection, db.energy_collection, db.energy_buckets, db.stats_collection = (mongo[name] for name in names)
+    db.energy_calculator = EnergyCalculator()
+    db.writer = WriteBehindBuffer(collections, max_age=60)
+    return db, collections
+
+
+class TestRebuildStats(unittest.TestCase):
+    def test_rebuild_with_queued_increments(self):
+        mongo = mongomock.MongoClient().db
+        db, collections = mongo_database(mongo)
+        status = {'status': 'ON', 'duration': 30}
+        # The raw record is already written, its $inc is still queued
+        db.writer.submit('led_status', InsertOne(status))
+        db.writer.flush()
+        increment = db._led_stats_update(status)
+        db.writer.submit('stats', increment)
+
+        self.assertEqual(db.rebuild_stats()['led_status'], {'total_on_time': 30, 'on_count': 1})
+        self.assertEqual(db.writer.pending(), 0)
+        # A replay of the same $inc after the rebuild is still recognised as applied
+        with self.assertRaises(BulkWriteError):
+            collections['stats'].bulk_write([increment])
+        db.writer.close()
+        stats = mongo.stats.find_one({'_id': 'led_status'})
+        self.assertEqual((stats['on_count'], stats['total_on_time']), (1, 30))
+
+    def test_upgraded_database_counts_existing_history(self):
+        mongo = mongomock.MongoClient().db
+        # History written before the materialized totals existed
+        mongo.led_status.insert_many([{'status': 'ON', 'duration': 100}, {'status': 'OFF', 'duration': 50}])
+        mongo.energy_consumption.insert_one({'energy_kwh': 0.5, 'cost': 0.25})
+        db, _ = mongo_database(mongo)
+        db._ensure_stats()
+        db.record_led_status(LEDStatus(timestamp=datetime(2024, 5, 1, 12), status='ON', duration=30))
+        db.writer.close()
+        self.assertEqual(db.get_led_stats(), {'total_on_time': 180, 'on_count': 2})
+        self.assertGreater(db.get_energy_stats()['total_energy'], 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
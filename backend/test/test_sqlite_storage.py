@@ -0,0 +1,120 @@
+# backend/test/test_sqlite_storage.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from Database.sensor_data import SensorData
+from Database.led_status import LEDStatus
+from Database.storage import open_storage
+from server.energy_calculator import EnergyCalculator, TariffSchedule
+
+START = datetime(2024, 5, 1, 12, 0, 0)
+
+class TestSQLiteStorage(unittest.TestCase):
+    def setUp(self):
+        self.db = open_storage('sqlite', path=os.path.join(tempfile.mkdtemp(), 'sensor_data.db'))
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_readings(self):
+        for minute in range(4):
+            record = SensorData(temperature=20.0, humidity=50.0, light=10.0 * minute,
+                                timestamp=START + timedelta(minutes=minute)).to_dict()
+            record['window_seconds'] = 60
+            self.db.create(record, wait=False)
+
+        latest = self.db.read_latest(as_json=False)
+        self.assertEqual(latest['timestamp'], START + timedelta(minutes=3))
+        self.assertEqual(latest['window_seconds'], 60)
+
+        rows = self.db.read_by_time_range(START, START + timedelta(minutes=2), fields=['light', 'bogus'])
+        self.assertEqual(rows, [{'timestamp': '2024-05-01T12:00:00.000', 'light': 0.0},
+                                {'timestamp': '2024-05-01T12:01:00.000', 'light': 10.0},
+                                {'timestamp': '2024-05-01T12:02:00.000', 'light': 20.0}])
+        page = self.db.read_by_time_range(START, START + timedelta(hours=1), fields=['light'], after=START + timedelta(minutes=2))
+        self.assertEqual([row['light'] for row in page], [30.0])
+
+        buckets = self.db.read_by_time_range(START, START + timedelta(hours=1), fields=['light'], resolution_seconds=120)
+        self.assertEqual(buckets, [{'count': 2, 'light': 5.0, 'timestamp': '2024-05-01T12:00:00.000'},
+                                   {'count': 2, 'light': 25.0, 'timestamp': '2024-05-01T12:02:00.000'}])
+
+    def test_paging_through_shared_timestamps(self):
+        # Three boards report on the same tick; pages of two must neither drop nor repeat any of them
+        for minute in range(3):
+            for device_id in ('room-3', None, 'room-2'):
+                self.db.create(SensorData(temperature=20.0, humidity=50.0, light=float(minute), device_id=device_id,
+                                          timestamp=START + timedelta(minutes=minute, microseconds=1500)).to_dict())
+        seen, after = [], None
+        while True:
+            page = self.db.read_by_time_range(START, START + timedelta(hours=1), fields=['device_id'],
+                                              after=after, limit=2, raw_timestamps=True)
+            seen += [(row['timestamp'].minute, row['device_id']) for row in page]
+            if len(page) < 2:
+                break
+            after = (page[-1]['timestamp'], page[-1]['device_id'])
+        self.assertEqual(seen, [(minute, device_id) for minute in range(3) for device_id in (None, 'room-2', 'room-3')])
+
+    def test_led_intervals_and_energy(self):
+        self.db.record_led_status(LEDStatus(timestamp=START + timedelta(minutes=30), status='ON', duration=3600))
+        self.db.record_led_status(LEDStatus(timestamp=START + timedelta(minutes=90), status='OFF', duration=600))
+        self.assertEqual(self.db.get_led_stats(), {'total_on_time': 4200, 'on_count': 1})
+        # The LED draws nothing while off
+        self.assertAlmostEqual(self.db.get_energy_stats()['total_energy'], 0.01)
+        hours = self.db.get_energy_rollups('hour', START, START + timedelta(hours=3))
+        self.assertEqual([(h['period_start'], h['on_seconds']) for h in hours],
+                         [('2024-05-01T12:00:00', 1800.0), ('2024-05-01T13:00:00', 1800.0)])
+        self.assertEqual([s.status for s in self.db.get_led_status_history()], ['OFF', 'ON'])
+
+    def test_materialized_stats(self):
+        self.db.record_led_status(LEDStatus(timestamp=START, status='ON', duration=3600))
+        self.db.create_led_status(LEDStatus(timestamp=START + timedelta(hours=1), status='OFF', duration=60).to_dict())
+        conn = self.db._conn()
+        with conn:
+            conn.execute("DELETE FROM led_status")
+        # Totals come from the stats row, not from summing the raw table
+        self.assertEqual(self.db.get_led_stats(), {'total_on_time': 3660, 'on_count': 1})
+        self.assertEqual(self.db.rebuild_stats()['led_status'], {'total_on_time': 0, 'on_count': 0})
+        self.assertAlmostEqual(self.db.get_energy_stats()['total_energy'], 0.01)
+
+        # A file from before the stats table gets its totals computed when opened
+        with conn:
+            conn.execute("INSERT INTO led_status (timestamp, status, duration) VALUES (?, 'ON', 30)", (START.isoformat(),))
+            conn.execute("DELETE FROM stats")
+        reopened = open_storage('sqlite', path=self.db.path)
+        self.assertEqual(reopened.get_led_stats(), {'total_on_time': 30, 'on_count': 1})
+        reopened.close()
+
+    def test_energy_totals_match_rollups(self):
+        tariff = TariffSchedule([(0, 13, 0.2)], default_price=0.5)
+        self.db.energy_calculator = EnergyCalculator(tariff=tariff, device_watts={'room-2': 20})
+        self.db.record_led_status(LEDStatus(timestamp=START + timedelta(minutes=30), status='ON', duration=3600,
+                                            device_id='room-2'))
+        hours = self.db.get_energy_rollups('hour', START, START + timedelta(hours=3), device_id='room-2')
+        stats = self.db.get_energy_stats()
+        self.assertAlmostEqual(stats['total_energy'], sum(h['energy_kwh'] for h in hours))
+        self.assertAlmostEqual(stats['total_cost'], sum(h['cost'] for h in hours))
+        self.assertAlmostEqual(stats['total_cost'], 0.01 * 0.2 + 0.01 * 0.5)
+
+    def test_predictions(self):
+        self.db.create_heating_prediction({'timestamp': START, 'prediction_value': 1.5, 'input_features': {'hour': 12}})
+        self.assertEqual(self.db.update_prediction_actual_value(START + timedelta(minutes=5), 2.0), 1)
+        self.assertEqual(self.db.get_recent_predictions(), [
+            {'timestamp': START.isoformat(), 'prediction_value': 1.5, 'input_features': {'hour': 12}, 'actual_value': 2.0}
+        ])
+        slots = [{'timestamp': START + timedelta(minutes=15 * i), 'source': 'range', 'prediction_value': float(i)}
+                 for i in (-1, 1)]
+        self.assertEqual(self.db.create_heating_predictions(slots), 2)
+        self.assertEqual(self.db.create_heating_predictions(slots), 2)  # replaces, no duplicates
+        rows = self.db._conn().execute("SELECT COUNT(*) FROM heating_predictions").fetchone()[0]
+        self.assertEqual(rows, 3)
+        # Batch rows stay out of the live history and actual value updates
+        self.assertEqual(self.db.update_prediction_actual_value(START + timedelta(minutes=20), 3.0), 1)
+        self.assertEqual([(p['prediction_value'], p['actual_value']) for p in self.db.get_recent_predictions()],
+                         [(1.5, 3.0)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+# backend/test/test_state_cache.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from server.state_cache import StateCache
+
+class TestStateCache(unittest.TestCase):
+    def test_versions(self):
+        cache = StateCache()
+        self.assertEqual(cache.get('led_status'), (None, 0))
+        self.assertEqual(cache.set('led_status', 'ON'), 1)
+        self.assertEqual(cache.set('led_status', 'OFF'), 2)
+        self.assertEqual(cache.get('led_status'), ('OFF', 2))
+
+    def test_get_or_load_only_loads_once(self):
+        cache = StateCache()
+        calls = []
+        def loader():
+            calls.append(1)
+            return {'ac_state': False}
+        self.assertEqual(cache.get_or_load('latest', loader), ({'ac_state': False}, 1))
+        self.assertEqual(cache.get_or_load('latest', loader), ({'ac_state': False}, 1))
+        self.assertEqual(len(calls), 1)
+
+    def test_get_or_load_missing(self):
+        cache = StateCache()
+        self.assertEqual(cache.get_or_load('latest', lambda: None), (None, 0))
+
+    def test_etags_differ_across_instances(self):
+        before_restart = StateCache()
+        before_restart.set('led_status', 'ON')
+        etag = before_restart.etag('led', before_restart.get('led_status')[1])
+        self.assertEqual(before_restart.etag('led', 1), etag)
+        after_restart = StateCache()
+        after_restart.set('led_status', 'OFF')
+        self.assertNotEqual(after_restart.etag('led', after_restart.get('led_status')[1]), etag)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+# backend/test/test_timeseries_store.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from datetime import datetime, timedelta
+from Database.sensor_data import SensorData
+from server.timeseries_store import RecentReadingsStore
+
+START = datetime(2024, 5, 1, 12, 0, 0)
+
+def reading(minute, light):
+    return SensorData(temperature=20.0 + minute, humidity=50.0, light=light,
+                      timestamp=START + timedelta(minutes=minute), person_count=minute).to_dict()
+
+class TestRecentReadingsStore(unittest.TestCase):
+    def test_raw_query_after_wraparound(self):
+        store = RecentReadingsStore(capacity=3)
+        for minute in range(5):
+            store.append(reading(minute, light=100.0))
+        self.assertEqual(len(store), 3)
+        self.assertFalse(store.covers(START))
+        self.assertTrue(store.covers(START + timedelta(minutes=2)))
+
+        rows = store.query(START + timedelta(minutes=2), START + timedelta(minutes=3), fields=['temperature', 'person_count'])
+        self.assertEqual(rows, [
+            {'timestamp': '2024-05-01T12:02:00.000', 'temperature': 22.0, 'person_count': 2},
+            {'timestamp': '2024-05-01T12:03:00.000', 'temperature': 23.0, 'person_count': 3},
+        ])
+
+    def test_after_and_limit(self):
+        store = RecentReadingsStore(capacity=10)
+        for minute in range(5):
+            store.append(reading(minute, light=100.0))
+        rows = store.query(START, START + timedelta(minutes=10), fields=['light'],
+                           after=START + timedelta(minutes=1), limit=2)
+        self.assertEqual([row['timestamp'] for row in rows], ['2024-05-01T12:02:00.000', '2024-05-01T12:03:00.000'])
+
+    def test_downsample(self):
+        store = RecentReadingsStore(capacity=10)
+        for minute, light in enumerate([10.0, 20.0, 30.0, 40.0, 50.0]):
+            store.append(reading(minute, light))
+        rows = store.query(START, START + timedelta(minutes=10), fields=['light'], resolution_seconds=120)
+        self.assertEqual(rows, [
+            {'count': 2, 'timestamp': '2024-05-01T12:00:00.000', 'light': 15.0},
+            {'count': 2, 'timestamp': '2024-05-01T12:02:00.000', 'light': 35.0},
+            {'count': 1, 'timestamp': '2024-05-01T12:04:00.000', 'light': 50.0},
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,9 +3,44 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import threading
+import time
 import unittest
 from open_weather.weather import OpenWeather
 
+SAMPLE_RESPONSE = {
+    'main': {'temp': 12.0, 'humidity': 80},
+    'weather': [{'description': 'light rain'}],
+    'wind': {'speed': 3.5, 'deg': 200},
+    'rain': {'1h': 0.4},
+    'sys': {'sunrise': 0, 'sunset': 0},
+}
+
+class FakeResponse:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return SAMPLE_RESPONSE
+
+class FakeSession:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        return FakeResponse()
+
+    def close(self):
+        pass
+
+class DownSession(FakeSession):
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        raise ConnectionError("api down")
+
 class TestOpenWeather(unittest.TestCase):
     def test_get_weather_data(self):
         api_key = "fa3005c77c9d4631ef729307d175661f"  # 请替换为你的实际 API 密钥
@@ -20,5 +55,58 @@ class TestOpenWeather(unittest.TestCase):
         self.assertIn('weather', data)
         self.assertIn('description', data['weather'][0])
 
+class TestOpenWeatherCache(unittest.TestCase):
+    def test_concurrent_callers_share_one_fetch(self):
+        session = FakeSession(delay=0.1)
+        weather = OpenWeather('key', 'Darmstadt', session=session)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(weather.get_weather_data())) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(session.calls, 1)
+        self.assertEqual([r['ow_temperature'] for r in results], [12.0] * 5)
+        weather.get_weather_data()
+        self.assertEqual(session.calls, 1)
+        weather.close()
+
+    def test_cached_read_never_blocks(self):
+        session = FakeSession(delay=0.2)
+        weather = OpenWeather('key', 'Darmstadt', ttl=0, max_stale=60, session=session)
+        self.assertIsNone(weather.get_cached_weather_data())
+        time.sleep(0.3)
+        started = time.monotonic()
+        # Stale: served from the cache while a refresh runs in the background
+        self.assertEqual(weather.get_cached_weather_data()['ow_precipitation'], 0.4)
+        self.assertLess(time.monotonic() - started, 0.1)
+        weather.close()
+
+    def test_failed_fetch_backs_off(self):
+        session = DownSession()
+        weather = OpenWeather('key', 'Darmstadt', session=session, retry_after=0.3)
+        for _ in range(20):
+            self.assertIsNone(weather.get_cached_weather_data())
+            time.sleep(0.01)
+        self.assertEqual(session.calls, 1)
+        time.sleep(0.3)
+        self.assertIsNone(weather.get_cached_weather_data())
+        time.sleep(0.05)
+        self.assertEqual(session.calls, 2)
+        self.assertEqual((weather.stats['fetches'], weather.stats['errors']), (2, 2))
+        weather.close()
+
+    def test_stats_counted_under_concurrency(self):
+        weather = OpenWeather('key', 'Darmstadt', session=FakeSession())
+        weather.get_weather_data()
+        threads = [threading.Thread(target=lambda: [weather.get_cached_weather_data() for _ in range(500)])
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(weather.stats['hits'], 4000)
+        weather.close()
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,103 @@
+# backend/test/test_weather_backfill.py
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+from Database.sensor_data import SensorData
+from Database.storage import open_storage
+from open_weather.backfill import backfill, dewpoint, sun_minutes
+from open_weather.weather import OpenWeather
+
+START = datetime(2024, 5, 1, 6, 30, 0)
+
+
+def observation(when, temp, humidity):
+    dt = int(when.timestamp())
+    return {'dt': dt, 'main': {'temp': temp, 'humidity': humidity}, 'weather': [{'description': 'clear sky'}],
+            'wind': {'speed': 3.5, 'deg': 180}, 'rain': {'1h': 0.2},
+            'sys': {'sunrise': int(START.replace(hour=6, minute=15).timestamp()),
+                    'sunset': int(START.replace(hour=20).timestamp())}}
+
+
+class LegacyStore:
+    """Wraps a store: adds a reading whose timestamp is still a string, optionally refuses rewrites"""
+
+    def __init__(self, db, rewritable=True):
+        self.db = db
+        self.rewritable = rewritable
+        self.reads = 0
+
+    def check_readings_rewritable(self, operation):
+        if not self.rewritable:
+            raise RuntimeError(f"{operation} needs MongoDB 7.0+")
+
+    def iter_by_time_range(self, *args, **kwargs):
+        self.reads += 1
+        yield {'timestamp': START.strftime('%Y-%m-%d %H:%M:%S'), 'device_id': 'dth111'}
+        yield from self.db.iter_by_time_range(*args, **kwargs)
+
+    def update_readings(self, updates):
+        return self.db.update_readings(updates)
+
+
+class TestWeatherBackfill(unittest.TestCase):
+    def setUp(self):
+        self.db = open_storage('sqlite', path=os.path.join(tempfile.mkdtemp(), 'sensor_data.db'))
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_matches_scalar_formulas(self):
+        weather = OpenWeather.__new__(OpenWeather)
+        temp = np.array([-5.0, 12.5, 30.0])
+        humidity = np.array([90.0, 55.0, 20.0])
+        np.testing.assert_allclose(dewpoint(temp, humidity),
+                                   [weather._calculate_dewpoint(t, h) for t, h in zip(temp, humidity)])
+        hour = START.replace(minute=0).timestamp()
+        sunrise = START.replace(hour=6, minute=15).timestamp()
+        self.assertEqual(sun_minutes(np.array([hour, hour + 3600, hour - 7200]), sunrise, sunrise + 36000).tolist(),
+                         [45.0, 60.0, 0.0])
+
+    def test_backfill_fills_only_missing_readings(self):
+        for minute in (0, 30, 60, 240):
+            record = SensorData(temperature=21.0, humidity=40.0, light=5.0, timestamp=START + timedelta(minutes=minute)).to_dict()
+            record['device_id'] = 'dth111'
+            if minute == 30:
+                record['ow_temperature'] = 9.0
+                record['ow_humidity'] = 70.0
+            self.db.create(record)
+        observations = [observation(START - timedelta(minutes=10), 11.0, 80.0),
+                        observation(START + timedelta(minutes=50), 13.0, 60.0)]
+
+        report = backfill(self.db, observations, START, START + timedelta(hours=5))
+        # The reading 4h in is more than max_gap past the last observation
+        self.assertEqual(report, {'readings': 4, 'legacy': 0, 'missing': 3, 'matched': 2, 'modified': 2})
+
+        rows = self.db.read_by_time_range(START, START + timedelta(hours=5),
+                                          fields=['ow_temperature', 'ow_humidity', 'ow_sun_duration', 'ow_weather_desc'])
+        self.assertEqual([row['ow_temperature'] for row in rows], [11.0, 9.0, 13.0, 0.0])
+        self.assertEqual(rows[0]['ow_sun_duration'], 45.0)
+        self.assertEqual(rows[2]['ow_sun_duration'], 60.0)
+        self.assertEqual(rows[2]['ow_weather_desc'], 'clear sky')
+
+    def test_legacy_timestamps_and_unwritable_store(self):
+        self.db.create(SensorData(temperature=21.0, humidity=40.0, light=5.0, timestamp=START).to_dict())
+        observations = [observation(START - timedelta(minutes=10), 11.0, 80.0)]
+        report = backfill(LegacyStore(self.db), observations, START, START + timedelta(hours=1))
+        self.assertEqual(report, {'readings': 2, 'legacy': 1, 'missing': 1, 'matched': 1, 'modified': 1})
+
+        store = LegacyStore(self.db, rewritable=False)
+        with self.assertRaises(RuntimeError):
+            backfill(store, observations, START, START + timedelta(hours=1))
+        self.assertEqual(store.reads, 0)
+        # A dry run writes nothing, so it still works (the reading was patched above)
+        report = backfill(store, observations, START, START + timedelta(hours=1), dry_run=True)
+        self.assertEqual(report, {'readings': 2, 'legacy': 1, 'missing': 0, 'matched': 0, 'modified': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
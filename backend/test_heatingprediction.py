@@ -6,7 +6,7 @@ from Models.heating_prediction import HeatingPrediction
 from datetime import datetime
 import pandas as pd
 import pytest
-from pymongo import MongoClient
+from Database.client_registry import get_client
 
 class TestHeatingPrediction:
     @classmethod
@@ -26,7 +26,7 @@ class TestHeatingPrediction:
         cls.collection_name = "readings"
         
         # 连接MongoDB
-        cls.client = MongoClient(cls.uri)
+        cls.client = get_client(cls.uri)
         cls.db = cls.client[cls.db_name]
         cls.collection = cls.db[cls.collection_name]
         
@@ -82,7 +82,6 @@ class TestHeatingPrediction:
         cls.collection.delete_many({
             "timestamp": {"$in": [data["timestamp"] for data in cls.test_data]}
         })
-        cls.client.close()
 
     def test_feature_preparation(self):
         """测试特征准备功能"""
@@ -4,16 +4,15 @@ import cv2
 import os
 from flask_socketio import SocketIO
 from yolo.video_detection import VideoDetection
-from queue import Queue
-from threading import Event, Lock
+from threading import Event
+from server.ring_buffer import LatestValue
 
 class VideoStream:
-    def __init__(self, socketio: SocketIO, video_detection: VideoDetection, data_queue: Queue, stop_event: Event, lock: Lock):
+    def __init__(self, socketio: SocketIO, video_detection: VideoDetection, occupancy: LatestValue, stop_event: Event):
         self.socketio = socketio
         self.video_detection = video_detection
-        self.data_queue = data_queue
+        self.occupancy = occupancy
         self.stop_event = stop_event
-        self.lock = lock
         self.frame_rate = 10
         self.prev = 0
 
@@ -63,12 +62,8 @@ class VideoStream:
                 'boxes': boxes  # Bounding boxes information
             })
 
-            # 将人数数据发送到队列中
-            with self.lock:
-                if not self.data_queue.empty():
-                    latest_data_point = self.data_queue.get()
-                    latest_data_point.person_count = person_count
-                    self.data_queue.put(latest_data_point)
+            # 发布最新人数，由数据库线程在聚合时合并
+            self.occupancy.set(person_count)
 
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break